@@ -0,0 +1,197 @@
+import os
+
+# Medir siempre lo mismo: sin cache de gráficas en disco ni almacén de agregados de corridas anteriores
+os.environ['NOTIF_DIR_CACHE_GRAFICOS'] = ''
+os.environ['NOTIF_RUTA_ALMACEN_AGREGADOS'] = ''
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generar_datos import generar_libro
+from servicios import graficos
+from servicios.fusion import fusionar_libros
+from servicios.graficos import LoteGraficos
+from servicios.ingesta import leer_libro, motor_excel
+from views.proceso1 import plan_informe_mes
+from views.proceso2 import leer_base, plan_estado_informe
+
+
+# ---------------------------------------------------------------------- BENCHMARK --------------------------------------
+# Tiempos por etapa (ingesta, agregación, tablas, gráficas, guardado) de Proceso 1 y Proceso 2
+# sobre libros sintéticos. Cada corrida agrega una línea JSON por (proceso, tamaño, repetición)
+# al archivo de resultados, para comparar entre versiones.
+#
+#   python -m benchmarks.bench --filas 10000 100000 --repeticiones 3
+ETAPAS = ('ingesta', 'agregacion', 'tablas', 'graficas', 'guardado')
+DIR_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+
+
+def libro_sintetico(filas, semilla=0):
+    # Los libros grandes tardan en generarse: se guardan y se reutilizan entre corridas
+    os.makedirs(DIR_DATOS, exist_ok=True)
+    ruta = os.path.join(DIR_DATOS, f"sintetico_{filas}_{semilla}.xlsx")
+    if not os.path.exists(ruta):
+        print(f"🛠️ Generando {ruta} ...")
+        generar_libro(ruta, filas, semilla)
+    return ruta
+
+
+def _repartir(tiempos, etapa_de):
+    # tiempos del plan → segundos por etapa
+    etapas = dict.fromkeys(ETAPAS, 0.0)
+    for clave, segundos in tiempos:
+        etapas[etapa_de(clave)] += segundos
+    return etapas
+
+
+def _etapa_proceso1(clave):
+    if clave[0] in ('hojas', 'meses'):
+        return 'ingesta'
+    if clave[0] == 'cubo':
+        return 'agregacion'
+    if clave[0] == 'gráficas':
+        return 'graficas'
+    return 'tablas'
+
+
+def _etapa_proceso2(clave):
+    if clave[0] == 'conteo':
+        return 'agregacion'
+    if clave == ('hoja', 'Distribución de Notificadores'):
+        return 'graficas'
+    return 'tablas'
+
+
+def medir_proceso1(datos, mes):
+    t0 = time.perf_counter()
+    df_total = leer_libro(datos)
+    ingesta = time.perf_counter() - t0
+
+    # Como en la app: informe en un libro nuevo y unido al original al guardar
+    libro = Workbook(write_only=True)
+    plan = plan_informe_mes(df_total, libro, mes, LoteGraficos())
+    plan.ejecutar()
+    etapas = _repartir(plan.tiempos, _etapa_proceso1)
+    etapas['ingesta'] += ingesta
+
+    t0 = time.perf_counter()
+    generado = BytesIO()
+    libro.save(generado)
+    fusionar_libros(datos, generado.getvalue())
+    etapas['guardado'] = time.perf_counter() - t0
+    return etapas, len(df_total)
+
+
+def medir_proceso2(datos):
+    t0 = time.perf_counter()
+    df_base = leer_base(BytesIO(datos), 'xlsx')
+    ingesta = time.perf_counter() - t0
+
+    libro = Workbook(write_only=True)
+    plan = plan_estado_informe(df_base, libro)
+    plan.ejecutar()
+    etapas = _repartir(plan.tiempos, _etapa_proceso2)
+    etapas['ingesta'] += ingesta
+
+    t0 = time.perf_counter()
+    libro.save(BytesIO())
+    etapas['guardado'] = time.perf_counter() - t0
+    return etapas, len(df_base)
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _entorno():
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'nucleos': os.cpu_count(),
+        'trabajadores_graficos': graficos.TRABAJADORES_GRAFICOS or os.cpu_count() or 1,
+        'motor_excel': motor_excel(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapas de Proceso 1 y Proceso 2.")
+    parser.add_argument('--filas', type=int, nargs='+', default=[10000, 100000],
+                        help="Tamaños de libro (filas totales DTO + PCL), p. ej. 10000 100000 1000000")
+    parser.add_argument('--proceso', choices=('1', '2', 'ambos'), default='ambos')
+    parser.add_argument('--mes', type=int, default=2, help="Mes para Proceso 1; 0 = todos los meses")
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados.jsonl'))
+    parser.add_argument('--detalle', action='store_true', help="Mostrar el log de cada paso del informe")
+    args = parser.parse_args(argv)
+
+    entorno = _entorno()
+    fecha = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    procesos = ('1', '2') if args.proceso == 'ambos' else (args.proceso,)
+    resultados = []
+
+    for filas in args.filas:
+        ruta = libro_sintetico(filas, args.semilla)
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+
+        for proceso in procesos:
+            for repeticion in range(1, args.repeticiones + 1):
+                # Sin cache de gráficas: se mide el render, no los aciertos de una repetición anterior
+                graficos._cache_memoria.limpiar()
+
+                inicio = time.perf_counter()
+                with open(os.devnull, 'w') as nulo, \
+                        (contextlib.nullcontext() if args.detalle else contextlib.redirect_stdout(nulo)):
+                    if proceso == '1':
+                        etapas, filas_leidas = medir_proceso1(datos, args.mes or None)
+                    else:
+                        etapas, filas_leidas = medir_proceso2(datos)
+                total = time.perf_counter() - inicio
+
+                resultado = {
+                    'fecha': fecha,
+                    'proceso': proceso,
+                    'filas': filas_leidas,
+                    'mes': (args.mes or 'todos') if proceso == '1' else None,
+                    'repeticion': repeticion,
+                    'segundos': {etapa: round(s, 4) for etapa, s in etapas.items()},
+                    'total': round(total, 4),
+                    **entorno,
+                }
+                resultados.append(resultado)
+                print(f"⏱️ proceso {proceso} · {filas_leidas} filas · rep {repeticion}: "
+                      + ", ".join(f"{e} {s:.2f}s" for e, s in etapas.items()) + f" · total {total:.2f}s")
+
+    directorio = os.path.dirname(args.salida)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(args.salida, 'a', encoding='utf-8') as f:
+        for resultado in resultados:
+            f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    print(f"✅ {len(resultados)} resultados agregados a {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
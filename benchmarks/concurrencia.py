@@ -0,0 +1,82 @@
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench import libro_sintetico
+from servicios import graficos
+from servicios.agregados import construir_cubo, rebanar
+from servicios.ingesta import leer_libro
+from views import proceso1, proceso2
+
+
+# ---------------------------------------------------------------------- GRÁFICAS DESDE VARIOS HILOS --------------------------------------
+# Las sesiones de Streamlit (y los informes en segundo plano) corren cada una en su hilo y renderizan
+# gráficas a la vez. Este chequeo dibuja todas las gráficas de un informe (Proceso 1 y 2, libro sintético)
+# primero en serie y después mezcladas desde varios hilos, varias veces cada una: todos los PNG tienen que
+# ser idénticos byte a byte a los de la corrida en serie. Sale con código 1 si alguno difiere.
+#
+#   python -m benchmarks.concurrencia --hilos 8 --repeticiones 4
+def especs_informe(df_total, mes):
+    # Las mismas especificaciones que arman las hojas del informe, sin pasar por ningún libro
+    cubo = construir_cubo(df_total)
+    especs = []
+    for tipo in ('DTO', 'PCL'):
+        cubo_tipo = rebanar(cubo, HOJA_ORIGEN=tipo)
+        nombre = f"{tipo} TABLA MES"
+        especs += [
+            proceso1.graficas_barras_tabla_mes(cubo_tipo, nombre),
+            proceso1.graficas_pastel_tabla_mes(cubo_tipo, nombre),
+            proceso1.grafica_pastel_tabla_mes_porproveedor(cubo_tipo, nombre),
+            proceso1.graficas_barras_tabla_mes_comparativa(cubo_tipo, nombre),
+            proceso1.graficapastel_comparativa_ano(cubo_tipo, nombre),
+            proceso1.graficas_barras_hojames(cubo_tipo, nombre, mes),
+            proceso1.graficas_pastel_hoja_mes(cubo_tipo, nombre, mes),
+        ]
+    especs.append(proceso2.espec_grafica_barras(proceso2.conteo_estado_notificador(df_total)))
+    return [espec for espec in especs if espec is not None]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gráficas idénticas al renderizarlas desde varios hilos a la vez.")
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--repeticiones', type=int, default=4, help="Veces que se dibuja cada gráfica en los hilos")
+    parser.add_argument('--filas', type=int, default=10000, help="Tamaño del libro sintético (DTO + PCL)")
+    parser.add_argument('--mes', type=int, default=2)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with open(libro_sintetico(args.filas, args.semilla), 'rb') as f, \
+            open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        especs = especs_informe(leer_libro(f.read()), args.mes)
+
+    # Sin cache: _dibujar siempre pasa por matplotlib
+    inicio = time.perf_counter()
+    referencia = [graficos._dibujar(espec) for espec in especs]
+    serie = time.perf_counter() - inicio
+
+    # Todas las gráficas mezcladas, para que hilos distintos dibujen tipos distintos al mismo tiempo
+    orden = [i for i in range(len(especs)) for _ in range(args.repeticiones)]
+    random.Random(args.semilla).shuffle(orden)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+        pngs = list(pool.map(lambda i: graficos._dibujar(especs[i]), orden))
+    hilos = time.perf_counter() - inicio
+
+    distintas = sorted({i for i, png in zip(orden, pngs) if png != referencia[i]})
+    print(f"⏱️ {len(especs)} gráficas en serie: {serie:.2f}s · {len(orden)} desde {args.hilos} hilos: {hilos:.2f}s")
+    if distintas:
+        for i in distintas:
+            print(f"❌ Gráfica {i} ({especs[i].tipo}): algún PNG distinto del de la corrida en serie")
+        return 1
+    print("✅ Todos los PNG idénticos byte a byte a los de la corrida en serie")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
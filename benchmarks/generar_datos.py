@@ -0,0 +1,77 @@
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+from openpyxl import Workbook
+
+
+# ---------------------------------------------------------------------- LIBROS SINTÉTICOS --------------------------------------
+# Libros con hojas DTO y PCL parecidos a los reales: pocos notificadores con reparto desigual,
+# una decena de estados, algunos nombres con espacios sobrantes y estados vacíos.
+NOTIFICADORES = {
+    'BELISARIO 397': 0.30,
+    'GESTAR INNOVACION': 0.25,
+    'UTMDL': 0.18,
+    'BELISARIO': 0.12,
+    'SERVIENTREGA': 0.08,
+    'INTERRAPIDISIMO': 0.05,
+    'OTROS': 0.02,
+}
+ESTADOS = {
+    'NOTIFICADO': 0.35,
+    'DEVUELTO': 0.12,
+    'EN PROCESO': 0.15,
+    'PENDIENTE': 0.10,
+    'ANULADO': 0.04,
+    'ENTREGADO': 0.10,
+    'DIRECCION ERRADA': 0.05,
+    'DESCONOCIDO': 0.03,
+    'REHUSADO': 0.03,
+    'CERRADO': 0.03,
+}
+ENCABEZADO = ['ID', 'FECHA_VISADO', 'NOTIFICADOR', 'ESTADO_INFORME', 'OBSERVACION']
+
+
+def generar_hoja(filas, rng, anio=2025, meses=12):
+    notificadores = rng.choice(list(NOTIFICADORES), size=filas, p=list(NOTIFICADORES.values())).astype(object)
+    estados = rng.choice(list(ESTADOS), size=filas, p=list(ESTADOS.values())).astype(object)
+
+    # Ruido de los archivos reales: espacios sobrantes y estados vacíos
+    sucios = rng.random(filas) < 0.005
+    notificadores[sucios] = [f" {n} " for n in notificadores[sucios]]
+    estados[rng.random(filas) < 0.01] = None
+
+    inicio = datetime(anio, 1, 1)
+    dias = rng.integers(0, min(365, meses * 31), size=filas)
+    return {
+        'ID': np.arange(1, filas + 1),
+        'FECHA_VISADO': [inicio + timedelta(days=int(d)) for d in dias],
+        'NOTIFICADOR': notificadores,
+        'ESTADO_INFORME': estados,
+        'OBSERVACION': rng.choice(['', 'SIN NOVEDAD', 'REVISAR DIRECCION', 'LLAMAR'], size=filas),
+    }
+
+
+def generar_libro(ruta, filas, semilla=0, meses=12):
+    # filas = total del libro, repartido entre DTO y PCL
+    rng = np.random.default_rng(semilla)
+    libro = Workbook(write_only=True)
+    for hoja, n in (('DTO', filas // 2), ('PCL', filas - filas // 2)):
+        columnas = generar_hoja(n, rng, meses=meses)
+        ws = libro.create_sheet(hoja)
+        ws.append(ENCABEZADO)
+        for fila in zip(*(columnas[c] for c in ENCABEZADO)):
+            ws.append([v.item() if hasattr(v, 'item') else v for v in fila])
+    libro.save(ruta)
+    return ruta
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera un libro sintético con hojas DTO y PCL.")
+    parser.add_argument('salida')
+    parser.add_argument('--filas', type=int, default=10000, help="Filas en total (DTO + PCL)")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--meses', type=int, default=12, help="Meses del año con datos (1-12)")
+    args = parser.parse_args()
+    generar_libro(args.salida, args.filas, args.semilla, args.meses)
+    print(f"✅ {args.salida}: {args.filas} filas")
@@ -0,0 +1,200 @@
+import os
+
+# Sin cache de gráficas en disco ni almacén de agregados, y las gráficas en este mismo proceso:
+# así una figura que quede viva se ve en el conteo (en el pool se perdería con el proceso hijo)
+os.environ['NOTIF_DIR_CACHE_GRAFICOS'] = ''
+os.environ['NOTIF_RUTA_ALMACEN_AGREGADOS'] = ''
+os.environ.setdefault('NOTIF_TRABAJADORES_GRAFICOS', '1')
+
+import argparse
+import contextlib
+import ctypes
+import gc
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+import pandas as pd
+from matplotlib.figure import Figure
+from openpyxl import Workbook
+from openpyxl.drawing.image import Image
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+from openpyxl.worksheet.worksheet import Worksheet
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench import _entorno, libro_sintetico
+from servicios import graficos
+from servicios.instrumentacion import rss_mb
+from views import proceso1, proceso2
+
+
+# ---------------------------------------------------------------------- MEMORIA EN CORRIDAS LARGAS --------------------------------------
+# Corre N informes seguidos de Proceso 1 y Proceso 2 en el mismo proceso, como el servidor de Streamlit
+# a lo largo del día, y después de cada uno mide la RSS y cuántas figuras de matplotlib, DataFrames,
+# libros, BytesIO, etc. siguen vivos. Falla (código 1) si algo crece más de lo permitido desde el final
+# del calentamiento, o si queda alguna Figure viva.
+#
+#   python -m benchmarks.memoria --corridas 20 --filas 10000 --max-mb 40
+#
+# Por defecto las caches (archivos, partes del informe, gráficas) se vacían después de cada corrida:
+# lo que crece es lo que nadie suelta. Con --con-caches se mide como en el servidor; las caches están
+# acotadas, así que la memoria debe estabilizarse una vez llenas.
+TIPOS_VIGILADOS = {
+    pd.DataFrame: 'DataFrame',
+    pd.Series: 'Series',
+    Workbook: 'Workbook',
+    Worksheet: 'Worksheet',
+    WriteOnlyWorksheet: 'Worksheet',
+    Image: 'Image',
+    Figure: 'Figure',
+    BytesIO: 'BytesIO',
+}
+
+
+# Lo que entrega st.file_uploader: bytes con nombre y tamaño
+class ArchivoSubido(BytesIO):
+    def __init__(self, datos, nombre):
+        super().__init__(datos)
+        self.name = nombre
+        self.size = len(datos)
+
+
+def _liberar_memoria():
+    gc.collect()
+    # glibc se queda con la memoria liberada; sin devolverla la RSS no baja aunque no haya fuga
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def contar_objetos():
+    # Solo el tipo exacto (ArchivoSubido no cuenta como BytesIO): los del propio arnés no ensucian el conteo
+    conteo = dict.fromkeys(TIPOS_VIGILADOS.values(), 0)
+    for objeto in gc.get_objects():
+        nombre = TIPOS_VIGILADOS.get(type(objeto))
+        if nombre is not None:
+            conteo[nombre] += 1
+    return conteo
+
+
+def medir():
+    _liberar_memoria()
+    objetos = contar_objetos()
+    # Las gráficas no pasan por pyplot (servicios/graficos.py): una figura que se filtra no queda en
+    # plt.get_fignums(), así que se cuentan las instancias de Figure que sobreviven al gc
+    return {'rss_mb': rss_mb(), 'figuras': objetos['Figure'], 'objetos': objetos}
+
+
+def limpiar_caches():
+    graficos._cache_memoria.limpiar()
+    proceso1._cache_archivos.limpiar()
+    proceso1._cache_partes.limpiar()
+    proceso2._cache_archivos.limpiar()
+
+
+def correr(proceso, datos, nombre, mes):
+    # El mismo camino que la app: lo que corre como trabajo en segundo plano, con el archivo "subido"
+    if proceso == '1':
+        return proceso1.generar_informe_subido(ArchivoSubido(datos, nombre), 'xlsx', mes)
+    return proceso2.generar_estado_informe_subido(ArchivoSubido(datos, nombre), 'xlsx')
+
+
+def revisar(base, final, max_mb, max_objetos):
+    # Lista de problemas (vacía si todo está dentro de los umbrales)
+    problemas = []
+    if final['figuras']:
+        problemas.append(f"{final['figuras']} figura(s) de matplotlib vivas")
+    if base['rss_mb'] is not None and final['rss_mb'] - base['rss_mb'] > max_mb:
+        problemas.append(f"la RSS creció {final['rss_mb'] - base['rss_mb']:.1f} MB (máximo {max_mb} MB)")
+    for tipo, cantidad in final['objetos'].items():
+        if cantidad - base['objetos'][tipo] > max_objetos:
+            problemas.append(f"{tipo}: {base['objetos'][tipo]} → {cantidad} vivos (máximo +{max_objetos})")
+    return problemas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crecimiento de memoria en informes seguidos (Proceso 1 y 2).")
+    parser.add_argument('--corridas', type=int, default=20, help="Informes de cada proceso")
+    parser.add_argument('--calentamiento', type=int, default=2,
+                        help="Corridas iniciales que no cuentan (imports, caches de pandas y matplotlib)")
+    parser.add_argument('--filas', type=int, default=10000, help="Tamaño del libro sintético (DTO + PCL)")
+    parser.add_argument('--proceso', choices=('1', '2', 'ambos'), default='ambos')
+    parser.add_argument('--max-mb', type=float, default=40.0, help="Crecimiento máximo de la RSS")
+    parser.add_argument('--max-objetos', type=int, default=0, help="Crecimiento máximo de cada tipo vigilado")
+    parser.add_argument('--con-caches', action='store_true', help="No vaciar las caches entre corridas")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--detalle', action='store_true', help="Mostrar el log de cada informe")
+    parser.add_argument('--salida', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'memoria.jsonl'))
+    args = parser.parse_args(argv)
+    if args.corridas <= args.calentamiento:
+        parser.error("--corridas debe ser mayor que --calentamiento")
+
+    ruta = libro_sintetico(args.filas, args.semilla)
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    nombre = os.path.basename(ruta)
+    procesos = ('1', '2') if args.proceso == 'ambos' else (args.proceso,)
+
+    entorno = _entorno()
+    fecha = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    registros = []
+    inicial = medir()
+    base = None
+
+    for corrida in range(1, args.corridas + 1):
+        # Un mes distinto en cada corrida de Proceso 1, como usuarios que van cambiando de mes
+        mes = (corrida - 1) % 12 + 1
+        inicio = time.perf_counter()
+        with open(os.devnull, 'w') as nulo, \
+                (contextlib.nullcontext() if args.detalle else contextlib.redirect_stdout(nulo)):
+            for proceso in procesos:
+                correr(proceso, datos, nombre, mes)
+        if not args.con_caches:
+            limpiar_caches()
+        segundos = time.perf_counter() - inicio
+
+        medicion = medir()
+        if corrida == args.calentamiento:
+            base = medicion
+        referencia = base or inicial
+        print(f"🧠 corrida {corrida}{' (calentamiento)' if base is None or corrida == args.calentamiento else ''}: "
+              f"RSS {medicion['rss_mb']:.0f} MB ({medicion['rss_mb'] - referencia['rss_mb']:+.1f}) · "
+              f"figuras {medicion['figuras']} · "
+              + ", ".join(f"{tipo} {n}" for tipo, n in medicion['objetos'].items() if n)
+              + f" · {segundos:.2f}s")
+        registros.append({
+            'fecha': fecha,
+            'corrida': corrida,
+            'procesos': list(procesos),
+            'mes': mes if '1' in procesos else None,
+            'filas': args.filas,
+            'con_caches': args.con_caches,
+            'segundos': round(segundos, 4),
+            **medicion,
+            **entorno,
+        })
+
+    problemas = revisar(base, medicion, args.max_mb, args.max_objetos)
+
+    directorio = os.path.dirname(args.salida)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(args.salida, 'a', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    print(f"✅ {len(registros)} mediciones agregadas a {args.salida}")
+
+    if problemas:
+        for problema in problemas:
+            print(f"❌ {problema}")
+        return 1
+    print(f"✅ Sin crecimiento fuera de los umbrales en {args.corridas - args.calentamiento} corridas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench import _entorno, libro_sintetico
+from servicios.ingesta import MOTORES_EXCEL, leer_libro, python_calamine
+
+
+# ---------------------------------------------------------------------- MOTORES DE LECTURA --------------------------------------
+# Compara los motores de lectura de .xlsx sobre libros sintéticos (y, si se pasan, libros reales):
+# tiempo de leer_libro con cada motor y que el DataFrame resultante sea el mismo, con FECHA_VISADO
+# idéntica. Los motores que no están instalados se saltan.
+#
+#   python -m benchmarks.motores --filas 10000 100000 --repeticiones 3 --archivos informe_real.xlsx
+def motores_disponibles():
+    # openpyxl (el motor de siempre) primero: es la referencia para comparar los DataFrames
+    disponibles = [m for m in MOTORES_EXCEL if m != 'calamine' or python_calamine is not None]
+    return sorted(disponibles, key=lambda m: m != 'openpyxl')
+
+
+def comparar(referencia, df, motor):
+    # None si son iguales; si no, la primera diferencia
+    if not referencia['FECHA_VISADO'].equals(df['FECHA_VISADO']):
+        distintas = (referencia['FECHA_VISADO'] != df['FECHA_VISADO']).to_numpy().nonzero()[0]
+        fila = distintas[0] if len(distintas) else None
+        return f"FECHA_VISADO distinta con {motor} (fila {fila})"
+    try:
+        pd.testing.assert_frame_equal(referencia, df)
+    except AssertionError as e:
+        return f"DataFrame distinto con {motor}: {str(e).splitlines()[0]}"
+    return None
+
+
+def medir_archivo(ruta, repeticiones):
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+
+    resultados = {}
+    referencia = None
+    for motor in motores_disponibles():
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+                df = leer_libro(datos, motor=motor)
+            tiempos.append(time.perf_counter() - t0)
+
+        if referencia is None:
+            referencia = df
+        resultados[motor] = {
+            'segundos': round(min(tiempos), 4),
+            'filas': len(df),
+            'diferencia': None if df is referencia else comparar(referencia, df, motor),
+        }
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara los motores de lectura de .xlsx.")
+    parser.add_argument('--filas', type=int, nargs='*', default=[10000, 100000],
+                        help="Tamaños de libro sintético (filas totales DTO + PCL)")
+    parser.add_argument('--archivos', nargs='*', default=[], help="Libros reales para medir además de los sintéticos")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Se informa la mejor de las repeticiones")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'motores.jsonl'))
+    args = parser.parse_args(argv)
+
+    motores = motores_disponibles()
+    if 'calamine' not in motores:
+        print("⚠️ python-calamine no está instalado: solo se mide openpyxl (pip install python-calamine)")
+
+    entorno = _entorno()
+    fecha = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    rutas = [libro_sintetico(filas, args.semilla) for filas in args.filas] + args.archivos
+    registros = []
+    diferencias = 0
+
+    for ruta in rutas:
+        resultados = medir_archivo(ruta, args.repeticiones)
+        base = resultados['openpyxl']['segundos']
+        for motor in motores:
+            r = resultados[motor]
+            diferencias += r['diferencia'] is not None
+            estado = f"❌ {r['diferencia']}" if r['diferencia'] else "✅ mismo DataFrame"
+            print(f"⏱️ {os.path.basename(ruta)} · {r['filas']} filas · {motor}: {r['segundos']:.2f}s "
+                  f"(x{base / r['segundos']:.1f} frente a openpyxl) {estado}")
+            registros.append({
+                'fecha': fecha,
+                'archivo': os.path.basename(ruta),
+                'filas': r['filas'],
+                'motor': motor,
+                'segundos': r['segundos'],
+                'igual_a_openpyxl': r['diferencia'] is None,
+                **entorno,
+            })
+
+    directorio = os.path.dirname(args.salida)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(args.salida, 'a', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    print(f"✅ {len(registros)} resultados agregados a {args.salida}")
+    return 1 if diferencias else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+import multiprocessing
+
+
+# ---------------------------------------------------------------------- LÍNEA DE COMANDOS --------------------------------------
+# Genera los informes de Proceso 1 y/o Proceso 2 para todos los archivos de una carpeta, sin Streamlit.
+#
+#   python cli.py ENTRADA SALIDA --mes Febrero --proceso ambos --trabajadores 4
+#
+# Cada archivo se procesa en su propio proceso; al final se imprime el tiempo de cada uno.
+
+PROCESOS = ('1', '2', 'ambos')
+
+
+def _nombre_mes(mes_num):
+    from views.proceso1 import meses_en_espanol
+    return 'todos' if mes_num is None else meses_en_espanol[mes_num]
+
+
+def interpretar_mes(texto):
+    from views.proceso1 import meses_en_espanol
+    texto = texto.strip().lower()
+    if texto in ('todos', 'todos los meses'):
+        return None
+    if texto.isdigit() and 1 <= int(texto) <= 12:
+        return int(texto)
+    for numero, nombre in meses_en_espanol.items():
+        if nombre.lower() == texto:
+            return numero
+    raise argparse.ArgumentTypeError(f"Mes no válido: '{texto}' (use 1-12, el nombre en español o 'todos')")
+
+
+# ---------------------------------------------------------------------- TRABAJOS --------------------------------------
+# trabajadores_graficos: procesos para las gráficas del informe (None = NOTIF_TRABAJADORES_GRAFICOS o uno por núcleo)
+# conjunto: con qué nombre acumula el archivo en el almacén de agregados (None = no se usa el almacén)
+# ruta: un archivo, o la tupla (NOMBRE_DTO.csv, NOMBRE_PCL.csv) de un par de CSV (ver buscar_archivos)
+def nombre_trabajo(ruta):
+    if isinstance(ruta, tuple):
+        return " + ".join(os.path.basename(r) for r in ruta)
+    return os.path.basename(ruta)
+
+
+def _proceso1(ruta, salida, mes_num, motor=None, solo_informe=False, nativos=False, trabajadores_graficos=None,
+              conjunto=None):
+    from openpyxl import Workbook
+    from servicios.graficos import LoteGraficos
+    from servicios.ingesta import leer_csv, leer_libro
+    from views.proceso1 import generar_informe, generar_informe_xlsx
+
+    rutas = ruta if isinstance(ruta, tuple) else (ruta,)
+    archivos = []
+    for r in rutas:
+        with open(r, 'rb') as f:
+            archivos.append((os.path.basename(r), f.read()))
+    datos = archivos[0][1]
+    es_csv = rutas[0].lower().endswith('.csv')
+    df_total = leer_csv(archivos) if es_csv else leer_libro(datos, motor=motor)
+    if conjunto:
+        df_total.attrs['CONJUNTO'] = conjunto
+
+    if es_csv:
+        # CSV con columna HOJA_ORIGEN: el informe se arma en un libro nuevo
+        output = generar_informe(df_total, Workbook(write_only=True), mes_num,
+                                 LoteGraficos(trabajadores_graficos, nativos),
+                                 hojas_base=not solo_informe)
+    else:
+        output = generar_informe_xlsx(df_total, datos, mes_num, LoteGraficos(trabajadores_graficos, nativos),
+                                      solo_informe=solo_informe)
+
+    # Un par NOMBRE_DTO.csv + NOMBRE_PCL.csv sale como NOMBRE_informe_...
+    base = os.path.commonprefix([os.path.splitext(os.path.basename(r))[0] for r in rutas]).rstrip('_') or 'csv'
+    destino = os.path.join(salida, f"{base}_informe_dto_pcl_{_nombre_mes(mes_num).lower()}.xlsx")
+    with open(destino, 'wb') as f:
+        f.write(output.getvalue())
+    return destino
+
+
+def _proceso2(ruta, salida, por_bloques=False, incluir_base=True, motor=None, nativos=False):
+    from views.proceso2 import generar_tablas_estado_informe, generar_tablas_estado_informe_por_bloques, leer_base
+
+    tipo = os.path.splitext(ruta)[1].lower().lstrip('.')
+    if por_bloques:
+        # Se lee directo del disco, por partes: ni los bytes ni las filas quedan enteros en memoria
+        output = generar_tablas_estado_informe_por_bloques(ruta, tipo, incluir_base, nativos=nativos)
+    else:
+        with open(ruta, 'rb') as f:
+            df_base = leer_base(BytesIO(f.read()), tipo, motor)
+        output = generar_tablas_estado_informe(df_base, nativos=nativos)
+
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    destino = os.path.join(salida, f"{base}_estado_informe.xlsx")
+    with open(destino, 'wb') as f:
+        f.write(output.getvalue())
+    return destino
+
+
+def procesar_archivo(ruta, salida, proceso, mes_num, por_bloques=False, incluir_base=True, motor=None,
+                     solo_informe=False, nativos=False, trabajadores_graficos=None, conjunto=None):
+    # Lo que corre en cada proceso del pool: nunca lanza, devuelve el resultado para el resumen
+    inicio = time.perf_counter()
+    try:
+        if proceso == '1':
+            destino = _proceso1(ruta, salida, mes_num, motor, solo_informe, nativos, trabajadores_graficos, conjunto)
+        else:
+            destino = _proceso2(ruta, salida, por_bloques, incluir_base, motor, nativos)
+        return {'archivo': ruta, 'proceso': proceso, 'ok': True, 'salida': destino,
+                'segundos': time.perf_counter() - inicio}
+    except Exception as e:
+        return {'archivo': ruta, 'proceso': proceso, 'ok': False, 'error': str(e).splitlines()[0] if str(e) else repr(e),
+                'detalle': traceback.format_exc(), 'segundos': time.perf_counter() - inicio}
+
+
+def buscar_archivos(entrada, proceso):
+    from servicios.ingesta import HOJAS
+
+    trabajos = []
+    parejas = {}  # NOMBRE → {'DTO': ruta de NOMBRE_DTO.csv, 'PCL': ruta de NOMBRE_PCL.csv}
+    for nombre in sorted(os.listdir(entrada)):
+        ruta = os.path.join(entrada, nombre)
+        raiz, extension = os.path.splitext(nombre)
+        extension = extension.lower()
+        if not os.path.isfile(ruta) or nombre.startswith('~$'):  # '~$' = archivo de bloqueo de Excel
+            continue
+        # Proceso 1: .xlsx con hojas DTO y PCL, .csv con columna HOJA_ORIGEN o el par NOMBRE_DTO.csv +
+        # NOMBRE_PCL.csv (se leen juntos, como al subir los dos en la página); Proceso 2: cada .xlsx o .csv
+        if proceso in ('1', 'ambos') and extension in ('.xlsx', '.csv'):
+            hoja = next((h for h in HOJAS if extension == '.csv' and raiz.upper().endswith(f'_{h}')), None)
+            if hoja is None:
+                trabajos.append((ruta, '1'))
+            else:
+                parejas.setdefault(raiz[:-len(hoja) - 1], {})[hoja] = ruta
+        if proceso in ('2', 'ambos') and extension in ('.xlsx', '.csv'):
+            trabajos.append((ruta, '2'))
+
+    for raiz, rutas in sorted(parejas.items()):
+        faltantes = [f"{raiz}_{hoja}.csv" for hoja in HOJAS if hoja not in rutas]
+        if faltantes:
+            presentes = ", ".join(os.path.basename(r) for r in rutas.values())
+            print(f"⚠️ {presentes}: falta {', '.join(faltantes)}; se omite en Proceso 1")
+        else:
+            trabajos.append((tuple(rutas[hoja] for hoja in HOJAS), '1'))
+    return trabajos
+
+
+# ---------------------------------------------------------------------- RESUMEN --------------------------------------
+def imprimir_resumen(resultados, total):
+    print()
+    print(f"{'ARCHIVO':<40} {'PROC':>4} {'SEGUNDOS':>9}  RESULTADO")
+    for r in sorted(resultados, key=lambda r: (nombre_trabajo(r['archivo']), r['proceso'])):
+        resultado = os.path.basename(r['salida']) if r['ok'] else f"❌ {r['error']}"
+        print(f"{nombre_trabajo(r['archivo'])[:40]:<40} {r['proceso']:>4} {r['segundos']:>9.2f}  {resultado}")
+    errores = sum(not r['ok'] for r in resultados)
+    print(f"\n✅ {len(resultados) - errores} informes generados, {errores} con error, {total:.2f} s en total")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los informes de notificaciones para una carpeta de archivos.")
+    parser.add_argument('entrada', help="Carpeta con los archivos .xlsx/.csv")
+    parser.add_argument('salida', help="Carpeta donde se escriben los informes")
+    parser.add_argument('--mes', type=interpretar_mes, default=None,
+                        help="Mes para Proceso 1: 1-12, nombre en español o 'todos' (por defecto: todos)")
+    parser.add_argument('--proceso', choices=PROCESOS, default='1', help="Qué informe generar (por defecto: 1)")
+    parser.add_argument('--trabajadores', type=int, default=0,
+                        help="Archivos en paralelo; 0 = uno por núcleo, 1 = en serie")
+    parser.add_argument('--solo-informe', action='store_true',
+                        help="Proceso 1: el archivo de salida lleva solo las hojas generadas, sin DTO ni PCL")
+    parser.add_argument('--por-bloques', action='store_true',
+                        help="Proceso 2: leer los archivos por bloques, sin cargarlos enteros en memoria")
+    parser.add_argument('--sin-base', action='store_true', help="Proceso 2: no copiar la hoja BASE al informe")
+    parser.add_argument('--graficos-nativos', action='store_true', default=None,
+                        help="Gráficas nativas de Excel en vez de imágenes PNG (por defecto: NOTIF_GRAFICOS_NATIVOS)")
+    parser.add_argument('--motor', choices=('auto', 'calamine', 'openpyxl'), default=None,
+                        help="Motor para leer los .xlsx (por defecto: NOTIF_MOTOR_EXCEL, o auto)")
+    parser.add_argument('--conjunto', default=None,
+                        help="Proceso 1: acumular las hojas anuales en el almacén de agregados (NOTIF_RUTA_ALMACEN_AGREGADOS) "
+                             "como CONJUNTO/nombre-del-archivo. El almacén es compartido: use un nombre propio")
+    parser.add_argument('--detalle', action='store_true', help="Mostrar el traceback de los archivos con error")
+    args = parser.parse_args(argv)
+    if args.graficos_nativos is None:
+        from servicios.config import GRAFICOS_NATIVOS
+        args.graficos_nativos = GRAFICOS_NATIVOS
+
+    if not os.path.isdir(args.entrada):
+        parser.error(f"No existe la carpeta de entrada: {args.entrada}")
+    os.makedirs(args.salida, exist_ok=True)
+
+    trabajos = buscar_archivos(args.entrada, args.proceso)
+    if not trabajos:
+        print("⚠️ No hay archivos para procesar.")
+        return 0
+
+    if args.conjunto:
+        from servicios.config import RUTA_ALMACEN_AGREGADOS
+        if not RUTA_ALMACEN_AGREGADOS:
+            print("⚠️ --conjunto sin NOTIF_RUTA_ALMACEN_AGREGADOS: no hay almacén, cada informe sale solo de su archivo")
+
+    def conjunto(ruta):
+        # Un conjunto por archivo dentro del nombre elegido: archivos distintos no se mezclan entre sí
+        return f"{args.conjunto}/{nombre_trabajo(ruta)}" if args.conjunto else None
+
+    trabajadores = min(args.trabajadores or os.cpu_count() or 1, len(trabajos))
+    inicio = time.perf_counter()
+    resultados = []
+
+    if trabajadores <= 1:
+        for ruta, proceso in trabajos:
+            resultados.append(procesar_archivo(ruta, args.salida, proceso, args.mes,
+                                               args.por_bloques, not args.sin_base, args.motor, args.solo_informe,
+                                               args.graficos_nativos, None, conjunto(ruta)))
+            print(f"{'✅' if resultados[-1]['ok'] else '❌'} {nombre_trabajo(ruta)} (proceso {proceso})")
+    else:
+        # Los archivos ya van en paralelo: cada proceso renderiza sus gráficas en serie para no
+        # lanzar un pool dentro de otro
+        with ProcessPoolExecutor(max_workers=trabajadores, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futuros = [pool.submit(procesar_archivo, ruta, args.salida, proceso, args.mes,
+                                   args.por_bloques, not args.sin_base, args.motor, args.solo_informe,
+                                   args.graficos_nativos, 1, conjunto(ruta))
+                       for ruta, proceso in trabajos]
+            for futuro in as_completed(futuros):
+                resultados.append(futuro.result())
+                r = resultados[-1]
+                print(f"{'✅' if r['ok'] else '❌'} {nombre_trabajo(r['archivo'])} (proceso {r['proceso']})")
+
+    if args.detalle:
+        for r in resultados:
+            if not r['ok']:
+                print(f"\n--- {nombre_trabajo(r['archivo'])} (proceso {r['proceso']})\n{r['detalle']}")
+
+    imprimir_resumen(resultados, time.perf_counter() - inicio)
+    return 1 if any(not r['ok'] for r in resultados) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
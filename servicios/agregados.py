@@ -0,0 +1,108 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+DIMENSIONES = ['HOJA_ORIGEN', 'ANIO', 'MES', 'NOTIFICADOR', 'ESTADO_INFORME']
+# Claves de texto que se agrupan sin espacios a los lados: ' BELISARIO ' y 'BELISARIO' cuentan juntos
+# en todas las tablas y gráficas (también en la Tabla Procesada de Proceso 2). Las hojas de datos
+# conservan los valores originales.
+CLAVES_TEXTO = ('NOTIFICADOR', 'ESTADO_INFORME')
+
+
+def clave_sin_espacios(valores):
+    # Los nulos se quedan nulos; el resto pasa a texto sin espacios a los lados, como category.
+    # Se trabaja sobre las categorías (pocas) y no sobre cada fila
+    if not isinstance(valores.dtype, pd.CategoricalDtype):
+        valores = valores.astype('category')
+    categorias = valores.cat.categories
+    if len(categorias) == 0:
+        return valores
+    limpias = pd.Index(categorias.astype(str).str.strip())
+    unicas = limpias.unique().sort_values()
+    codigos = unicas.get_indexer(limpias)
+    actuales = valores.cat.codes.to_numpy()
+    nuevos = np.where(actuales >= 0, codigos[actuales], -1)
+    return pd.Series(pd.Categorical.from_codes(nuevos, unicas), index=valores.index, name=valores.name)
+
+
+# ---------------------------------------------------------------------- CUBO DE CONTEOS --------------------------------------
+# Una sola pasada sobre todas las filas: conteo por HOJA_ORIGEN × año × mes × NOTIFICADOR × ESTADO_INFORME.
+# Todas las tablas y gráficas salen de rebanar y sumar este cubo (unos cientos de filas),
+# en vez de volver a filtrar y agrupar el DataFrame completo cada vez.
+# Las dimensiones que el archivo no trae (p. ej. FECHA_VISADO en Proceso 2) simplemente no se incluyen.
+def construir_cubo(df):
+    con_fecha = 'FECHA_VISADO' in df.columns and pd.api.types.is_datetime64_any_dtype(df['FECHA_VISADO'])
+
+    claves = {}
+    for dimension in DIMENSIONES:
+        if dimension in CLAVES_TEXTO and dimension in df.columns:
+            claves[dimension] = clave_sin_espacios(df[dimension])
+        elif dimension in df.columns:
+            claves[dimension] = df[dimension]
+        elif dimension == 'ANIO' and con_fecha:
+            claves[dimension] = df['FECHA_VISADO'].dt.year
+        elif dimension == 'MES' and con_fecha:
+            claves[dimension] = df['FECHA_VISADO'].dt.month
+
+    # dropna=False: las filas con claves vacías se conservan; cada roll-up decide si las descarta,
+    # igual que hacía el groupby original sobre sus propias columnas
+    return (
+        pd.DataFrame(claves)
+        .groupby(list(claves), dropna=False, observed=True)
+        .size()
+        .rename('TOTAL')
+    )
+
+
+def rebanar(cubo, **filtros):
+    # filtros: nivel=valor o nivel=[valores]
+    mascara = np.ones(len(cubo), dtype=bool)
+    for nivel, valor in filtros.items():
+        if not isinstance(valor, (list, tuple, set)):
+            valor = [valor]
+        # isin y no ==: con niveles enteros nullable o category, == puede devolver <NA>
+        mascara &= cubo.index.get_level_values(nivel).isin(list(valor))
+    return cubo[mascara]
+
+
+def sumar(cubo, niveles):
+    # Roll-up a los niveles pedidos; descarta claves vacías como un groupby sobre las columnas
+    return cubo.groupby(level=niveles, observed=True).sum()
+
+
+def huella_cubo(cubo):
+    # Identifica el contenido del cubo (claves y conteos): mismo cubo = mismas tablas y gráficas
+    h = hashlib.sha256()
+    h.update(repr(list(cubo.index.names)).encode())
+    # Sobre la tabla plana: el hash de un MultiIndex falla si algún nivel tiene claves vacías
+    h.update(pd.util.hash_pandas_object(cubo.reset_index(), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------- CONTEO POR BLOQUES --------------------------------------
+# Para las lecturas por bloques: cada bloque suma sus conteos a lo acumulado. En memoria queda
+# una fila por combinación de claves, nunca las filas del archivo.
+class ConteoPorBloques:
+    def __init__(self, niveles):
+        self.niveles = list(niveles)
+        self.filas = 0
+        self._total = None
+
+    def agregar(self, bloque):
+        self.filas += len(bloque)
+        # Como object: las categorías de cada bloque son distintas y no se pueden sumar entre sí.
+        # El groupby descarta las claves vacías, igual que sumar() sobre el cubo
+        claves = pd.DataFrame({
+            nivel: clave_sin_espacios(bloque[nivel]) if nivel in CLAVES_TEXTO else bloque[nivel]
+            for nivel in self.niveles
+        }).astype(object)
+        conteo = claves.groupby(self.niveles).size()
+        self._total = conteo if self._total is None else self._total.add(conteo, fill_value=0)
+
+    def resultado(self):
+        if self._total is None:
+            indice = pd.MultiIndex.from_arrays([[] for _ in self.niveles], names=self.niveles)
+            return pd.Series([], index=indice, dtype='int64', name='TOTAL')
+        return self._total.astype('int64').sort_index().rename('TOTAL')
@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from servicios.agregados import CLAVES_TEXTO, DIMENSIONES, clave_sin_espacios, construir_cubo
+
+
+# Una partición = hoja × año × mes. Cada carga manda sobre las particiones que trae:
+# las filas guardadas de esas particiones que ya no vienen en el archivo se descuentan;
+# las de meses que el archivo no trae se conservan.
+PARTICION = ['HOJA_ORIGEN', 'ANIO', 'MES']
+_TIPOS_CUBO = {'HOJA_ORIGEN': 'category', 'ANIO': 'Int16', 'MES': 'Int8',
+               'NOTIFICADOR': 'category', 'ESTADO_INFORME': 'category'}
+
+
+# ---------------------------------------------------------------------- HUELLAS --------------------------------------
+# Una huella por fila (contenido completo + hoja). Las filas repetidas llevan además su número
+# de aparición, para que dos filas idénticas cuenten dos veces.
+def huellas_filas(df):
+    columnas = [c for c in df.columns if c not in ('ANIO', 'MES')]  # derivadas de FECHA_VISADO
+    base = pd.util.hash_pandas_object(df[columnas], index=False)
+    aparicion = base.groupby(base).cumcount()
+    huellas = pd.util.hash_pandas_object(pd.DataFrame({'h': base.values, 'n': aparicion.values}), index=False)
+    return huellas.values.view(np.int64)  # SQLite guarda enteros con signo
+
+
+def _nativo(valor):
+    # sqlite3 solo acepta tipos de Python: nada de numpy ni pd.NA
+    if pd.isna(valor):
+        return None
+    if hasattr(valor, 'item'):
+        valor = valor.item()
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return valor
+
+
+def _llaves_particion(df):
+    # Hoja como texto y año/mes como float (NaN si falta) para comparar el archivo con lo guardado
+    return pd.DataFrame({
+        'HOJA_ORIGEN': df['HOJA_ORIGEN'].astype(object).values,
+        'ANIO': pd.to_numeric(df['ANIO']).astype('float64').values,
+        'MES': pd.to_numeric(df['MES']).astype('float64').values,
+    })
+
+
+def _clave(df, columna):
+    # Las claves de texto se guardan como las agrupa construir_cubo: sin espacios a los lados
+    return clave_sin_espacios(df[columna]) if columna in CLAVES_TEXTO else df[columna]
+
+
+def _particiones(llaves):
+    return {tuple(_nativo(v) for v in fila) for fila in llaves.drop_duplicates().itertuples(index=False, name=None)}
+
+
+# ---------------------------------------------------------------------- ALMACÉN --------------------------------------
+# Cada conjunto de datos acumula lo suyo: filas y cubo llevan la columna CONJUNTO y nada se mezcla entre
+# conjuntos distintos. El almacén es compartido (uno por servidor, para todos los usuarios): el nombre del
+# conjunto lo elige quien sube el archivo, a propósito, y dos cargas con el mismo nombre se tratan como
+# el mismo conjunto. Cada carga solo lee las huellas de las particiones que trae, así que el trabajo no
+# crece con lo acumulado.
+_ESQUEMA = {
+    'filas': ['CONJUNTO', 'huella', 'HOJA_ORIGEN', 'ANIO', 'MES', 'NOTIFICADOR', 'ESTADO_INFORME'],
+    'cubo': ['CONJUNTO', 'HOJA_ORIGEN', 'ANIO', 'MES', 'NOTIFICADOR', 'ESTADO_INFORME', 'TOTAL'],
+}
+_PARTICION_SQL = "CONJUNTO = ? AND HOJA_ORIGEN IS ? AND ANIO IS ? AND MES IS ?"  # "IS" compara también NULL
+
+
+class AlmacenAgregados:
+    def __init__(self, ruta):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        with self._conexion:
+            # Un almacén de una versión anterior (sin CONJUNTO) no se puede repartir: se vuelve a empezar
+            for tabla, columnas in _ESQUEMA.items():
+                actuales = [fila[1] for fila in self._conexion.execute(f"PRAGMA table_info({tabla})")]
+                if actuales and actuales != columnas:
+                    print(f"⚠️ Almacén de agregados con el formato anterior: se descarta la tabla {tabla}")
+                    self._conexion.execute(f"DROP TABLE {tabla}")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS filas ("
+                "CONJUNTO TEXT NOT NULL, huella INTEGER NOT NULL, HOJA_ORIGEN TEXT, ANIO INTEGER, MES INTEGER, "
+                "NOTIFICADOR TEXT, ESTADO_INFORME TEXT, PRIMARY KEY (CONJUNTO, huella))"
+            )
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS cubo ("
+                "CONJUNTO TEXT NOT NULL, HOJA_ORIGEN TEXT, ANIO INTEGER, MES INTEGER, NOTIFICADOR TEXT, "
+                "ESTADO_INFORME TEXT, TOTAL INTEGER)"
+            )
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS filas_particion ON filas (CONJUNTO, HOJA_ORIGEN, ANIO, MES)"
+            )
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS cubo_particion ON cubo (CONJUNTO, HOJA_ORIGEN, ANIO, MES)"
+            )
+
+    def _huellas_guardadas(self, conjunto, particiones):
+        # Solo las particiones del archivo (a lo sumo hoja × 12 meses por año que trae), con el índice
+        consultas = [
+            pd.read_sql_query(f"SELECT huella, HOJA_ORIGEN, ANIO, MES FROM filas WHERE {_PARTICION_SQL}",
+                              self._conexion, params=(conjunto,) + particion)
+            for particion in particiones
+        ]
+        if not consultas:
+            return pd.DataFrame(columns=['huella', 'HOJA_ORIGEN', 'ANIO', 'MES'])
+        return pd.concat(consultas, ignore_index=True)
+
+    def actualizar(self, df, conjunto):
+        huellas = huellas_filas(df)
+        llaves = _llaves_particion(df)
+        particiones = _particiones(llaves)
+
+        with self._lock:
+            guardadas = self._huellas_guardadas(conjunto, particiones)
+            huellas_guardadas = guardadas['huella'].to_numpy(dtype=np.int64)
+
+            # Filas nuevas: solo estas se agregan
+            es_nueva = ~np.isin(huellas, huellas_guardadas)
+            nuevas = df[es_nueva]
+
+            # Filas guardadas de las particiones que trae el archivo y que ya no vienen (corregidas o borradas)
+            eliminadas = ~np.isin(huellas_guardadas, huellas)
+
+            afectadas = _particiones(llaves[es_nueva]) | _particiones(_llaves_particion(guardadas[eliminadas]))
+
+            with self._conexion:
+                self._conexion.executemany(
+                    "DELETE FROM filas WHERE CONJUNTO = ? AND huella = ?",
+                    [(conjunto, int(h)) for h in huellas_guardadas[eliminadas]],
+                )
+                self._conexion.executemany(
+                    "INSERT INTO filas (CONJUNTO, huella, HOJA_ORIGEN, ANIO, MES, NOTIFICADOR, ESTADO_INFORME) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (conjunto,) + tuple(_nativo(v) for v in fila)
+                        for fila in zip(huellas[es_nueva], *[_clave(nuevas, c).astype(object) for c in DIMENSIONES])
+                    ],
+                )
+
+                # Recalcular el cubo solo en las particiones que cambiaron
+                for particion in afectadas:
+                    self._conexion.execute(f"DELETE FROM cubo WHERE {_PARTICION_SQL}", (conjunto,) + particion)
+                    self._conexion.execute(
+                        "INSERT INTO cubo SELECT CONJUNTO, HOJA_ORIGEN, ANIO, MES, NOTIFICADOR, ESTADO_INFORME, "
+                        f"COUNT(*) FROM filas WHERE {_PARTICION_SQL} "
+                        "GROUP BY HOJA_ORIGEN, ANIO, MES, NOTIFICADOR, ESTADO_INFORME",
+                        (conjunto,) + particion,
+                    )
+
+        resumen = {'nuevas': int(es_nueva.sum()), 'eliminadas': int(eliminadas.sum()), 'particiones': len(afectadas)}
+        print(f"🗄️ Almacén de agregados ({conjunto}): {resumen['nuevas']} filas nuevas, "
+              f"{resumen['eliminadas']} descontadas, {resumen['particiones']} meses recalculados")
+        return resumen
+
+    def cubo(self, conjunto, anios):
+        # Lo acumulado del conjunto, solo en los años pedidos (None = filas sin fecha)
+        anios = sorted({_nativo(a) for a in anios}, key=lambda a: (a is None, a))
+        condicion = " OR ".join(["ANIO IS ?"] * len(anios)) or "0"
+        with self._lock:
+            datos = pd.read_sql_query(
+                "SELECT HOJA_ORIGEN, ANIO, MES, NOTIFICADOR, ESTADO_INFORME, TOTAL FROM cubo "
+                f"WHERE CONJUNTO = ? AND ({condicion})",
+                self._conexion, params=[conjunto] + anios,
+            )
+        # Mismos tipos y forma que construir_cubo, para que el resto del informe no note la diferencia
+        datos = datos.astype(_TIPOS_CUBO)
+        return datos.set_index(DIMENSIONES)['TOTAL'].astype('int64').sort_index()
+
+    def limpiar(self, conjunto=None):
+        with self._lock, self._conexion:
+            if conjunto is None:
+                self._conexion.execute("DELETE FROM filas")
+                self._conexion.execute("DELETE FROM cubo")
+            else:
+                self._conexion.execute("DELETE FROM filas WHERE CONJUNTO = ?", (conjunto,))
+                self._conexion.execute("DELETE FROM cubo WHERE CONJUNTO = ?", (conjunto,))
+
+
+# El conjunto sale de df.attrs['CONJUNTO'], que solo se pone si el usuario eligió uno (opción de la app o
+# --conjunto del CLI). Sin conjunto, sin almacén (o sin las columnas del cubo completo) se agrega todo el
+# DataFrame, como siempre.
+def cubo_con_almacen(df, almacen=None):
+    conjunto = df.attrs.get('CONJUNTO')
+    if almacen is None or conjunto is None or not set(DIMENSIONES).issubset(df.columns):
+        return construir_cubo(df)
+    almacen.actualizar(df, conjunto)
+    return almacen.cubo(conjunto, df['ANIO'].unique())
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def hash_bytes(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+
+# ---------------------------------------------------------------------- CACHE LRU --------------------------------------
+# Compartida entre sesiones de Streamlit: el módulo se importa una sola vez por proceso,
+# por eso todos los accesos van protegidos con un lock.
+# Se limita por cantidad de entradas, por bytes o por ambos. Los bytes son los de los valores tipo bytes,
+# o lo que diga tamano(valor) para otros valores; se miden una vez, al guardar.
+class CacheLRU:
+    def __init__(self, max_entradas=None, max_bytes=None, tamano=None):
+        self.max_entradas = max(1, int(max_entradas)) if max_entradas else None
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.tamano = tamano
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()
+        self._tamanos = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave not in self._datos:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            if clave in self._datos:
+                self._bytes -= self._tamanos[clave]
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            self._tamanos[clave] = self._tamano(valor)
+            self._bytes += self._tamanos[clave]
+            # Sacar las entradas menos usadas hasta respetar los límites (la recién guardada se queda)
+            while len(self._datos) > 1 and self._excedida():
+                viejo, _ = self._datos.popitem(last=False)
+                self._bytes -= self._tamanos.pop(viejo)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._tamanos.clear()
+            self._bytes = 0
+
+    def quitar_si(self, condicion):
+        # Saca las entradas cuyo valor cumple la condición (p. ej. las vencidas); devuelve cuántas
+        with self._lock:
+            claves = [clave for clave, valor in self._datos.items() if condicion(valor)]
+            for clave in claves:
+                del self._datos[clave]
+                self._bytes -= self._tamanos.pop(clave)
+            return len(claves)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'entradas': len(self._datos),
+                'bytes': self._bytes,
+            }
+
+    def _tamano(self, valor):
+        # Solo se mide si hay límite de bytes
+        if not self.max_bytes:
+            return 0
+        if self.tamano is not None:
+            return self.tamano(valor)
+        return len(valor) if isinstance(valor, (bytes, bytearray)) else 0
+
+    def _excedida(self):
+        if self.max_entradas and len(self._datos) > self.max_entradas:
+            return True
+        return bool(self.max_bytes) and self._bytes > self.max_bytes
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._datos
+
+    def __len__(self):
+        with self._lock:
+            return len(self._datos)
+
+
+# Para CacheLRU(tamano=...) con DataFrames: memoria real, contando el texto de las columnas object
+def tamano_dataframe(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+# ---------------------------------------------------------------------- CACHE EN DISCO --------------------------------------
+# Un archivo por clave; el mtime hace de "último uso" para desalojar los más viejos.
+class CacheDisco:
+    def __init__(self, directorio, max_bytes, extension='.bin'):
+        self.directorio = directorio
+        self.max_bytes = int(max_bytes)
+        self.extension = extension
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}{self.extension}")
+
+    def obtener(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+            os.utime(ruta)
+        except OSError:
+            with self._lock:
+                self.fallos += 1
+            return None
+        with self._lock:
+            self.aciertos += 1
+        return datos
+
+    def guardar(self, clave, datos):
+        ruta = self._ruta(clave)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, ruta)  # atómico: otro proceso nunca lee un archivo a medias
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar en la cache de disco: {e}")
+            return
+        with self._lock:
+            self._desalojar()
+
+    def _desalojar(self):
+        archivos = []
+        for entrada in os.scandir(self.directorio):
+            if entrada.is_file() and entrada.name.endswith(self.extension):
+                info = entrada.stat()
+                archivos.append((info.st_mtime, info.st_size, entrada.path))
+
+        total = sum(tamano for _, tamano, _ in archivos)
+        for _, tamano, ruta in sorted(archivos):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamano
+            except OSError:
+                pass
+
+    def estadisticas(self):
+        with self._lock:
+            return {'aciertos': self.aciertos, 'fallos': self.fallos}
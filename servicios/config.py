@@ -0,0 +1,46 @@
+import os
+
+# ---------------------------------------------------------------------- CONFIGURACIÓN --------------------------------------
+# Todos los valores se pueden sobreescribir con variables de entorno al lanzar la app.
+
+# Archivos subidos que se mantienen parseados en memoria entre reruns de Streamlit: a lo sumo
+# MAX_ARCHIVOS_CACHE DataFrames y MB_ARCHIVOS_CACHE MB entre todos (por proceso de la app: 1 y 2)
+MAX_ARCHIVOS_CACHE = int(os.environ.get("NOTIF_MAX_ARCHIVOS_CACHE", "4"))
+MB_ARCHIVOS_CACHE = float(os.environ.get("NOTIF_MB_ARCHIVOS_CACHE", "256"))
+
+# Procesos para renderizar gráficas en paralelo; 0 = uno por núcleo (con un solo núcleo se renderiza en serie)
+TRABAJADORES_GRAFICOS = int(os.environ.get("NOTIF_TRABAJADORES_GRAFICOS", "0"))
+
+# Cache de gráficas ya renderizadas (PNG) por contenido: límite en memoria y cache opcional en disco
+MAX_MB_CACHE_GRAFICOS = float(os.environ.get("NOTIF_MAX_MB_CACHE_GRAFICOS", "64"))
+DIR_CACHE_GRAFICOS = os.environ.get("NOTIF_DIR_CACHE_GRAFICOS", "")  # vacío = sin cache en disco
+MAX_MB_CACHE_GRAFICOS_DISCO = float(os.environ.get("NOTIF_MAX_MB_CACHE_GRAFICOS_DISCO", "256"))
+
+# Gráficas nativas de Excel en lugar de imágenes PNG (1 = sí): valor inicial de la opción en la app y en cli.py
+GRAFICOS_NATIVOS = os.environ.get("NOTIF_GRAFICOS_NATIVOS", "0") == "1"
+
+# Almacén local (SQLite) de agregados por mes y huellas de filas ya procesadas: con él, cada carga
+# solo agrega las filas nuevas y las hojas anuales salen de lo acumulado. Vacío = sin almacén.
+# Es uno por servidor y compartido entre usuarios; solo lo usan las cargas a las que se les da un nombre
+# de conjunto (opción en Proceso 1, --conjunto en el CLI), y las que usan el mismo nombre se acumulan juntas.
+RUTA_ALMACEN_AGREGADOS = os.environ.get("NOTIF_RUTA_ALMACEN_AGREGADOS", "")
+
+# Lectura por bloques de Proceso 2 (archivos muy grandes): filas por bloque, y tamaño de archivo
+# desde el cual la app propone ese modo en vez de cargar todo el archivo en un DataFrame
+FILAS_POR_BLOQUE = int(os.environ.get("NOTIF_FILAS_POR_BLOQUE", "50000"))
+MB_LECTURA_POR_BLOQUES = float(os.environ.get("NOTIF_MB_LECTURA_POR_BLOQUES", "50"))
+
+# Motor para leer los .xlsx: auto (calamine si está instalado, si no openpyxl), calamine u openpyxl
+MOTOR_EXCEL = os.environ.get("NOTIF_MOTOR_EXCEL", "auto")
+
+# Informes en segundo plano (app): cuántos se generan a la vez en todo el servidor (el resto espera en
+# cola) y cuánto se guardan los informes terminados para entregarlos sin recalcular (p. ej. al recargar):
+# a lo sumo TTL_RESULTADOS minutos, MAX_RESULTADOS informes y MAX_MB_RESULTADOS MB entre todos
+MAX_TRABAJOS = int(os.environ.get("NOTIF_MAX_TRABAJOS", "2"))
+TTL_RESULTADOS = float(os.environ.get("NOTIF_TTL_RESULTADOS", "30"))
+MAX_RESULTADOS = int(os.environ.get("NOTIF_MAX_RESULTADOS", "20"))
+MAX_MB_RESULTADOS = float(os.environ.get("NOTIF_MAX_MB_RESULTADOS", "256"))
+
+# TABLA MES: la distribución por notificador es una sola imagen con una torta por notificador.
+# Máximo de tortas: con más notificadores se grafican los que tienen más casos; 0 = todos
+MAX_PANELES_NOTIFICADOR = int(os.environ.get("NOTIF_MAX_PANELES_NOTIFICADOR", "0"))
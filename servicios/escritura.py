@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_to_tuple
+from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+
+# ---------------------------------------------------------------------- VOLCADO DE DATOS --------------------------------------
+# Filas completas con append en lugar de una llamada a hoja.cell() por valor.
+# En una hoja write-only (Workbook(write_only=True)) las filas van directo al archivo temporal
+# de la hoja, así la memoria no crece con la cantidad de filas.
+def volcar_dataframe(hoja, df, encabezado=True):
+    for fila in dataframe_to_rows(df, index=False, header=encabezado):
+        hoja.append(fila)
+
+
+# ---------------------------------------------------------------------- TABLAS CON ESTILO --------------------------------------
+# Cada parte de la tabla (encabezado, cuerpo, fila de total) es un NamedStyle que se registra una
+# sola vez por libro; las celdas solo guardan el nombre en vez de un Border/Fill/Font propio.
+# Las partes se describen con los argumentos de NamedStyle (border, fill, font, alignment, ...).
+@dataclass
+class EstiloTabla:
+    nombre: str
+    encabezado: dict
+    cuerpo: dict
+    total: dict = None
+
+    def nombre_parte(self, parte):
+        return f"{self.nombre} - {parte}"
+
+
+def registrar_estilos(libro, estilo):
+    existentes = set(libro.named_styles)
+    for parte in ('encabezado', 'cuerpo', 'total'):
+        atributos = getattr(estilo, parte)
+        nombre = estilo.nombre_parte(parte)
+        if atributos is not None and nombre not in existentes:
+            libro.add_named_style(NamedStyle(name=nombre, **atributos))
+
+
+def escribir_tabla(hoja, df, estilo, celda='A1', fila_total=False, ajustar_anchos=False):
+    # fila_total=True: la última fila del DataFrame usa el estilo 'total'
+    registrar_estilos(hoja.parent, estilo)
+    fila_inicio, col_inicio = coordinate_to_tuple(celda)
+
+    filas = list(dataframe_to_rows(df, index=False, header=True))
+    estilos = [estilo.nombre_parte('encabezado')] + [estilo.nombre_parte('cuerpo')] * (len(filas) - 1)
+    if fila_total and estilo.total is not None and len(filas) > 1:
+        estilos[-1] = estilo.nombre_parte('total')
+
+    if ajustar_anchos:
+        for offset, valores_col in enumerate(zip(*filas)):
+            max_length = max((len(str(v)) for v in valores_col if v), default=0)
+            hoja.column_dimensions[get_column_letter(col_inicio + offset)].width = max_length + 2
+
+    # append escribe la fila entera de una vez; sirve para hojas write-only (donde la tabla tiene que
+    # ser lo primero que se escribe) y para hojas normales mientras la tabla quede debajo de lo escrito
+    solo_escritura = isinstance(hoja, WriteOnlyWorksheet)
+    filas_escritas = 0 if solo_escritura else _filas_escritas(hoja)
+    if solo_escritura or filas_escritas < fila_inicio:
+        for _ in range(fila_inicio - 1 - filas_escritas):
+            hoja.append([])
+        relleno = [None] * (col_inicio - 1)
+        for valores, nombre in zip(filas, estilos):
+            hoja.append(relleno + [_celda(hoja, v, nombre) for v in valores])
+    else:
+        for r_idx, (valores, nombre) in enumerate(zip(filas, estilos), start=fila_inicio):
+            for c_idx, valor in enumerate(valores, start=col_inicio):
+                hoja.cell(row=r_idx, column=c_idx, value=valor).style = nombre
+
+    return fila_inicio + len(filas) - 1
+
+
+def _filas_escritas(hoja):
+    # max_row vale 1 también con la hoja vacía; values no crea celdas si no hay ninguna
+    if hoja.max_row == 1 and next(hoja.values, None) is None:
+        return 0
+    return hoja.max_row
+
+
+def _celda(hoja, valor, nombre_estilo):
+    celda = WriteOnlyCell(hoja, value=valor)
+    celda.style = nombre_estilo
+    return celda
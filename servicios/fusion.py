@@ -0,0 +1,459 @@
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from io import BytesIO
+from xml.sax.saxutils import escape, quoteattr
+
+
+# ---------------------------------------------------------------------- FUSIÓN DE LIBROS --------------------------------------
+# Une el xlsx subido con un libro que solo trae las hojas generadas, a nivel de partes del zip:
+# las hojas originales se copian tal cual (sin que openpyxl las lea ni las vuelva a escribir) y las
+# generadas se agregan al final con otro nombre de parte. Del original solo se tocan cinco partes
+# pequeñas: workbook.xml, sus relaciones, [Content_Types].xml, styles.xml y la lista de hojas de
+# docProps/app.xml. Los estilos de las hojas generadas se agregan a los del original y sus índices se
+# renumeran. De cada libro generado se copian solo las hojas y lo que cuelga de sus relaciones.
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PAQUETE_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+NS_TIPOS = "http://schemas.openxmlformats.org/package/2006/content-types"
+NS_APP = "http://schemas.openxmlformats.org/officeDocument/2006/extended-properties"
+NS_VT = "http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes"
+TIPO_DOCUMENTO = NS_REL + "/officeDocument"
+TIPO_HOJA = NS_REL + "/worksheet"
+TIPO_ESTILOS = NS_REL + "/styles"
+TIPO_APP = NS_REL + "/extended-properties"
+
+# Orden de las colecciones dentro de styles.xml (el esquema lo exige)
+COLECCIONES_ESTILO = ('numFmts', 'fonts', 'fills', 'borders', 'cellStyleXfs', 'cellXfs', 'cellStyles',
+                      'dxfs', 'tableStyles', 'colors', 'extLst')
+
+ET.register_namespace('', NS_MAIN)
+
+
+# Las hojas generadas no se pueden pegar al original a nivel de zip: quien llama arma el informe con openpyxl
+class LibroNoFusionable(ValueError):
+    pass
+
+
+class HojasRepetidas(LibroNoFusionable):
+    # El original ya tiene hojas con el nombre de alguna generada (p. ej. un informe vuelto a subir)
+    def __init__(self, nombres):
+        super().__init__(f"El libro ya tiene las hojas: {', '.join(nombres)}")
+        self.nombres = nombres
+
+
+class FechasIncompatibles(LibroNoFusionable):
+    # Un libro cuenta las fechas desde 1900 y el otro desde 1904 (workbookPr date1904): copiadas tal cual,
+    # las fechas de las hojas generadas se correrían cuatro años
+    def __init__(self):
+        super().__init__("El libro usa otro sistema de fechas (1900/1904)")
+
+
+class TextosCompartidos(LibroNoFusionable):
+    # Una hoja generada apunta a sharedStrings.xml por índice: esos índices no valen en el original
+    def __init__(self):
+        super().__init__("Las hojas generadas usan la tabla de textos compartidos")
+
+
+def _q(espacio, nombre):
+    return f"{{{espacio}}}{nombre}"
+
+
+def _ruta_rels(parte):
+    return posixpath.join(posixpath.dirname(parte), '_rels', posixpath.basename(parte) + '.rels')
+
+
+def _destino(parte, destino):
+    # Destino de una relación, como nombre de parte dentro del zip
+    if destino.startswith('/'):
+        return destino.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(parte), destino))
+
+
+def _relaciones(zip_, parte):
+    ruta = _ruta_rels(parte)
+    if ruta not in zip_.namelist():
+        return []
+    raiz = ET.fromstring(zip_.read(ruta))
+    return [r.attrib for r in raiz.iter(_q(NS_PAQUETE_REL, 'Relationship'))]
+
+
+def _parte_libro(zip_):
+    for relacion in _relaciones(zip_, ''):
+        if relacion['Type'] == TIPO_DOCUMENTO:
+            return _destino('', relacion['Target'])
+    raise ValueError("El archivo no es un libro de Excel válido (falta el workbook).")
+
+
+def _insertar_antes_del_cierre(texto, etiqueta, contenido):
+    # Inserta contenido antes de </etiqueta> (con o sin prefijo de espacio de nombres)
+    cierre = re.search(rf'</(\w+:)?{etiqueta}>', texto)
+    if cierre is None:
+        raise ValueError(f"No se encontró </{etiqueta}>")
+    return texto[:cierre.start()] + contenido + texto[cierre.start():]
+
+
+# ---------------------------------------------------------------------- ESTILOS --------------------------------------
+def _hijos(raiz, coleccion, hijo):
+    nodo = raiz.find(_q(NS_MAIN, coleccion))
+    return [] if nodo is None else nodo.findall(_q(NS_MAIN, hijo))
+
+
+def _serializar(elemento, sin_espacio):
+    texto = ET.tostring(elemento, encoding='unicode', short_empty_elements=True)
+    # En el elemento suelto ET repite xmlns; sobra si el original ya usa el mismo espacio por defecto
+    return texto.replace(f' xmlns="{NS_MAIN}"', '', 1) if sin_espacio else texto
+
+
+def _agregar_a_coleccion(texto, coleccion, elementos, total):
+    # Agrega elementos (texto) a una colección de styles.xml y actualiza su count
+    if not elementos:
+        return texto
+    contenido = ''.join(elementos)
+
+    vacia = re.search(rf'<((?:\w+:)?){coleccion}\b([^>]*)/>', texto)
+    if vacia:
+        prefijo = vacia.group(1)
+        texto = texto[:vacia.start()] + f'<{prefijo}{coleccion}{vacia.group(2)}></{prefijo}{coleccion}>' + texto[vacia.end():]
+
+    apertura = re.search(rf'<((?:\w+:)?){coleccion}\b([^>]*)>', texto)
+    if apertura is None:
+        # La colección no existe: se crea antes de la primera que va después en el esquema
+        prefijo = re.search(r'<((?:\w+:)?)styleSheet\b', texto).group(1)
+        nueva = f'<{prefijo}{coleccion} count="{total}">{contenido}</{prefijo}{coleccion}>'
+        siguientes = COLECCIONES_ESTILO[COLECCIONES_ESTILO.index(coleccion) + 1:]
+        for siguiente in siguientes:
+            posicion = re.search(rf'<(\w+:)?{siguiente}\b', texto)
+            if posicion:
+                return texto[:posicion.start()] + nueva + texto[posicion.start():]
+        return _insertar_antes_del_cierre(texto, 'styleSheet', nueva)
+
+    atributos = re.sub(r'\s*\bcount="\d*"', '', apertura.group(2))
+    texto = texto[:apertura.start()] + f'<{apertura.group(1)}{coleccion} count="{total}"{atributos}>' + texto[apertura.end():]
+    return _insertar_antes_del_cierre(texto, coleccion, contenido)
+
+
+def fusionar_estilos(texto_original, texto_generado):
+    # Devuelve (styles.xml del original con los estilos generados agregados, índice generado → índice final de cellXfs)
+    original = ET.fromstring(texto_original)
+    generado = ET.fromstring(texto_generado)
+    raiz = re.search(r'<(?:\w+:)?styleSheet\b[^>]*>', texto_original).group(0)
+    sin_espacio = f'xmlns="{NS_MAIN}"' in raiz
+
+    # Formatos de número propios (id >= 164): se reusa el del original si tiene el mismo código
+    formatos_original = {f.get('formatCode'): int(f.get('numFmtId')) for f in _hijos(original, 'numFmts', 'numFmt')}
+    siguiente_formato = max([163] + list(formatos_original.values())) + 1
+    mapa_formatos, nuevos_formatos = {}, []
+    for formato in _hijos(generado, 'numFmts', 'numFmt'):
+        codigo = formato.get('formatCode')
+        if codigo in formatos_original:
+            mapa_formatos[formato.get('numFmtId')] = str(formatos_original[codigo])
+        else:
+            mapa_formatos[formato.get('numFmtId')] = str(siguiente_formato)
+            formato.set('numFmtId', str(siguiente_formato))
+            nuevos_formatos.append(formato)
+            siguiente_formato += 1
+
+    # Fuentes, rellenos y bordes se agregan al final: su índice se corre en lo que ya tenía el original
+    desplazamiento = {}
+    nuevos = {}
+    for coleccion, hijo in (('fonts', 'font'), ('fills', 'fill'), ('borders', 'border')):
+        desplazamiento[coleccion] = len(_hijos(original, coleccion, hijo))
+        nuevos[coleccion] = _hijos(generado, coleccion, hijo)
+
+    def renumerar(xf):
+        for atributo, coleccion in (('fontId', 'fonts'), ('fillId', 'fills'), ('borderId', 'borders')):
+            if xf.get(atributo) is not None:
+                xf.set(atributo, str(int(xf.get(atributo)) + desplazamiento[coleccion]))
+        if xf.get('numFmtId') in mapa_formatos:
+            xf.set('numFmtId', mapa_formatos[xf.get('numFmtId')])
+
+    # Estilos con nombre: si el original ya tiene uno con el mismo nombre (siempre "Normal") se usa el suyo
+    nombres_original = {c.get('name'): int(c.get('xfId')) for c in _hijos(original, 'cellStyles', 'cellStyle')}
+    estilos_generado = {int(c.get('xfId')): c for c in _hijos(generado, 'cellStyles', 'cellStyle')}
+    total_xf_estilo = len(_hijos(original, 'cellStyleXfs', 'xf'))
+    mapa_xf_estilo, nuevos_xf_estilo, nuevos_nombres = {}, [], []
+    for indice, xf in enumerate(_hijos(generado, 'cellStyleXfs', 'xf')):
+        estilo = estilos_generado.get(indice)
+        if estilo is not None and estilo.get('name') in nombres_original:
+            mapa_xf_estilo[indice] = nombres_original[estilo.get('name')]
+            continue
+        mapa_xf_estilo[indice] = total_xf_estilo + len(nuevos_xf_estilo)
+        renumerar(xf)
+        nuevos_xf_estilo.append(xf)
+        if estilo is not None:
+            estilo.set('xfId', str(mapa_xf_estilo[indice]))
+            estilo.attrib.pop('builtinId', None)
+            nuevos_nombres.append(estilo)
+
+    # Formatos de celda: el 0 (celdas sin estilo) es el 0 del original, como cuando openpyxl agregaba
+    # las hojas al libro cargado; el resto se agrega al final
+    total_xf = len(_hijos(original, 'cellXfs', 'xf'))
+    mapa_xf, nuevos_xf = {0: 0}, []
+    for indice, xf in enumerate(_hijos(generado, 'cellXfs', 'xf')):
+        if indice == 0:
+            continue
+        renumerar(xf)
+        if xf.get('xfId') is not None:
+            xf.set('xfId', str(mapa_xf_estilo.get(int(xf.get('xfId')), 0)))
+        mapa_xf[indice] = total_xf + len(nuevos_xf)
+        nuevos_xf.append(xf)
+
+    texto = texto_original
+    agregar = [
+        ('numFmts', nuevos_formatos, len(formatos_original)),
+        ('fonts', nuevos['fonts'], desplazamiento['fonts']),
+        ('fills', nuevos['fills'], desplazamiento['fills']),
+        ('borders', nuevos['borders'], desplazamiento['borders']),
+        ('cellStyleXfs', nuevos_xf_estilo, total_xf_estilo),
+        ('cellXfs', nuevos_xf, total_xf),
+        ('cellStyles', nuevos_nombres, len(nombres_original)),
+    ]
+    for coleccion, elementos, antes in agregar:
+        texto = _agregar_a_coleccion(texto, coleccion, [_serializar(e, sin_espacio) for e in elementos],
+                                     antes + len(elementos))
+    return texto, mapa_xf
+
+
+def renumerar_estilos_hoja(xml, mapa_xf):
+    # s="N" de celdas y filas y style="N" de columnas, con los índices de cellXfs ya fusionados
+    def reemplazar(m):
+        return m.group(1) + str(mapa_xf.get(int(m.group(2)), 0)).encode() + b'"'
+    xml = re.sub(rb'(<(?:\w+:)?(?:c|row)\b[^>]*?\bs=")(\d+)"', reemplazar, xml)
+    return re.sub(rb'(<(?:\w+:)?col\b[^>]*?\bstyle=")(\d+)"', reemplazar, xml)
+
+
+# ---------------------------------------------------------------------- PAQUETE --------------------------------------
+def _prefijo_libre(nombres):
+    # Prefijo para los nombres de parte de las hojas generadas que no choque con ninguna del original
+    usados = {posixpath.basename(n) for n in nombres}
+    numero = 1
+    while True:
+        prefijo = 'informe_' if numero == 1 else f'informe{numero}_'
+        if not any(n.startswith(prefijo) for n in usados):
+            return prefijo
+        numero += 1
+
+
+def _hojas(zip_, parte_libro):
+    # [(nombre, parte de la hoja, elemento <sheet>)] en el orden del libro
+    destinos = {r['Id']: _destino(parte_libro, r['Target']) for r in _relaciones(zip_, parte_libro)}
+    raiz = ET.fromstring(zip_.read(parte_libro))
+    return [(h.get('name'), destinos.get(h.get(_q(NS_REL, 'id'))), h)
+            for h in raiz.iter(_q(NS_MAIN, 'sheet'))]
+
+
+def _fechas_1904(texto_libro):
+    return re.search(r'<(?:\w+:)?workbookPr\b[^>]*\bdate1904="(?:1|true)"', texto_libro) is not None
+
+
+def _partes_alcanzables(zip_, hojas):
+    # Las hojas y todo lo que cuelga de sus relaciones (dibujos, imágenes, gráficas), con sus .rels, en el
+    # orden del zip. Lo que solo referencia el workbook del generado (sharedStrings, tema) no se copia.
+    nombres = set(zip_.namelist())
+    vistas, pendientes = set(), list(hojas)
+    while pendientes:
+        parte = pendientes.pop()
+        if parte in vistas or parte not in nombres:
+            continue
+        vistas.add(parte)
+        if _ruta_rels(parte) in nombres:
+            vistas.add(_ruta_rels(parte))
+            pendientes += [_destino(parte, r['Target']) for r in _relaciones(zip_, parte)
+                           if r.get('TargetMode') != 'External']
+    return [n for n in zip_.namelist() if n in vistas]
+
+
+# ---------------------------------------------------------------------- docProps/app.xml --------------------------------------
+# app.xml repite la lista de hojas: TitlesOfParts trae los nombres y HeadingPairs cuántos son de cada
+# grupo ("Worksheets" o "Hojas de cálculo", "Named Ranges", ...). Las hojas nuevas se agregan al grupo de
+# las hojas del original; si ese grupo no se puede ubicar sin ambigüedad, se quitan las dos listas
+# (son opcionales y Excel las vuelve a escribir al guardar).
+def _grupos_app(raiz):
+    # [(nombre del grupo, [títulos])] o None si falta alguna lista o no cuadran
+    pares = raiz.find(_q(NS_APP, 'HeadingPairs'))
+    titulos = raiz.find(_q(NS_APP, 'TitlesOfParts'))
+    if pares is None or titulos is None:
+        return None
+    variantes = [list(v)[0].text or '' for v in pares.iter(_q(NS_VT, 'variant')) if len(v)]
+    vector = titulos.find(_q(NS_VT, 'vector'))
+    textos = [t.text or '' for t in (vector if vector is not None else [])]
+    grupos, inicio = [], 0
+    for nombre, cantidad in zip(variantes[::2], variantes[1::2]):
+        if not cantidad.strip().isdigit():
+            return None
+        grupos.append((nombre, textos[inicio:inicio + int(cantidad)]))
+        inicio += int(cantidad)
+    return grupos if inicio == len(textos) and len(variantes) % 2 == 0 else None
+
+
+def actualizar_app(texto, hojas_original, hojas_nuevas):
+    raiz = ET.fromstring(texto)
+    grupos = _grupos_app(raiz)
+    listas = rf'<((?:\w+:)?)(HeadingPairs|TitlesOfParts)\b[^>]*?(?:/>|>.*?</\1\2>)'
+    if raiz.find(_q(NS_APP, 'HeadingPairs')) is None and raiz.find(_q(NS_APP, 'TitlesOfParts')) is None:
+        return texto
+    prefijo_vt = re.search(rf'xmlns:(\w+)="{re.escape(NS_VT)}"', texto)
+    originales = set(hojas_original)
+    candidatos = [i for i, (_, titulos) in enumerate(grupos or []) if titulos and set(titulos) <= originales]
+    if prefijo_vt is None or len(candidatos) != 1:
+        return re.sub(listas, '', texto, flags=re.S)
+
+    nombre, titulos = grupos[candidatos[0]]
+    grupos[candidatos[0]] = (nombre, titulos + list(hojas_nuevas))
+    vt = prefijo_vt.group(1)
+    prefijo = re.search(r'<((?:\w+:)?)Properties\b', texto).group(1)
+    pares = ''.join(f'<{vt}:variant><{vt}:lpstr>{escape(nombre)}</{vt}:lpstr></{vt}:variant>'
+                    f'<{vt}:variant><{vt}:i4>{len(titulos)}</{vt}:i4></{vt}:variant>' for nombre, titulos in grupos)
+    todos = [titulo for _, titulos in grupos for titulo in titulos]
+    nuevas = {
+        'HeadingPairs': f'<{prefijo}HeadingPairs><{vt}:vector size="{2 * len(grupos)}" baseType="variant">'
+                        f'{pares}</{vt}:vector></{prefijo}HeadingPairs>',
+        'TitlesOfParts': f'<{prefijo}TitlesOfParts><{vt}:vector size="{len(todos)}" baseType="lpstr">'
+                         + ''.join(f'<{vt}:lpstr>{escape(titulo)}</{vt}:lpstr>' for titulo in todos)
+                         + f'</{vt}:vector></{prefijo}TitlesOfParts>',
+    }
+    return re.sub(listas, lambda m: nuevas[m.group(2)], texto, flags=re.S)
+
+
+def fusionar_libros(original, *generados):
+    # original, generados: bytes de .xlsx. Las hojas de cada generado se agregan al final, en el orden
+    # en que vienen los libros. Devuelve los bytes del libro unido.
+    zips_generados = [zipfile.ZipFile(BytesIO(generado)) for generado in generados]
+    try:
+        with zipfile.ZipFile(BytesIO(original)) as zip_original:
+            return _fusionar(zip_original, zips_generados)
+    finally:
+        for zip_generado in zips_generados:
+            zip_generado.close()
+
+
+def _fusionar(zip_original, zips_generados):
+    libro_original = _parte_libro(zip_original)
+    hojas_original = _hojas(zip_original, libro_original)
+    relaciones_libro = _relaciones(zip_original, libro_original)
+
+    estilos_original = next((_destino(libro_original, r['Target']) for r in relaciones_libro
+                             if r['Type'] == TIPO_ESTILOS), None)
+    if estilos_original is None:
+        raise ValueError("El libro original no tiene estilos (styles.xml).")
+    texto_estilos = zip_original.read(estilos_original).decode('utf-8')
+
+    texto_libro = zip_original.read(libro_original).decode('utf-8')
+    raiz_libro = re.search(r'<(\w+:)?workbook\b[^>]*>', texto_libro)
+    prefijo_r = re.search(rf'xmlns:(\w+)="{re.escape(NS_REL)}"', raiz_libro.group(0))
+    prefijo_sheet = re.search(r'<(\w+:)?sheet\b', texto_libro).group(1) or ''
+    ids_usados = {r['Id'] for r in relaciones_libro}
+    siguiente_id = max([0] + [int(h.get('sheetId', 0)) for _, _, h in hojas_original]) + 1
+    fechas_1904 = _fechas_1904(texto_libro)
+
+    tipos_original = ET.fromstring(zip_original.read('[Content_Types].xml'))
+    extensiones = {d.get('Extension').lower() for d in tipos_original.iter(_q(NS_TIPOS, 'Default'))}
+
+    # Excel no distingue mayúsculas en los nombres de hoja
+    existentes = {nombre.lower() for nombre, _, _ in hojas_original}
+    nombres_partes = list(zip_original.namelist())
+    hojas_nuevas, relaciones_nuevas, tipos_nuevos, nombres_nuevos = [], [], [], []
+    aportes = []  # por libro generado: (zip, partes, renombre, hojas, mapa_xf)
+
+    for zip_generado in zips_generados:
+        libro_generado = _parte_libro(zip_generado)
+        hojas_generado = _hojas(zip_generado, libro_generado)
+        repetidas = [nombre for nombre, _, _ in hojas_generado if nombre.lower() in existentes]
+        if repetidas:
+            raise HojasRepetidas(repetidas)
+        if _fechas_1904(zip_generado.read(libro_generado).decode('utf-8')) != fechas_1904:
+            raise FechasIncompatibles()
+        if any(re.search(rb'<(?:\w+:)?c\b[^>]*?\bt="s"', zip_generado.read(parte)) for _, parte, _ in hojas_generado):
+            raise TextosCompartidos()
+        existentes |= {nombre.lower() for nombre, _, _ in hojas_generado}
+        nombres_nuevos += [nombre for nombre, _, _ in hojas_generado]
+
+        partes = _partes_alcanzables(zip_generado, [parte for _, parte, _ in hojas_generado])
+        prefijo = _prefijo_libre(nombres_partes)
+        renombre = {n: posixpath.join(posixpath.dirname(n), prefijo + posixpath.basename(n)) for n in partes}
+        nombres_partes += renombre.values()
+
+        # Estilos: se agregan a los que ya se juntaron (los del original y los de los generados anteriores)
+        estilos_generado = next(_destino(libro_generado, r['Target'])
+                                for r in _relaciones(zip_generado, libro_generado) if r['Type'] == TIPO_ESTILOS)
+        texto_estilos, mapa_xf = fusionar_estilos(texto_estilos, zip_generado.read(estilos_generado).decode('utf-8'))
+
+        # workbook.xml: las hojas nuevas al final, con sheetId y r:id que no choquen
+        for numero, (nombre, parte, elemento) in enumerate(hojas_generado, start=1):
+            id_relacion = f'rId{prefijo}{numero}'
+            while id_relacion in ids_usados:
+                id_relacion += '_'
+            atributo_r = (f'{prefijo_r.group(1)}:id={quoteattr(id_relacion)}' if prefijo_r
+                          else f'xmlns:r="{NS_REL}" r:id={quoteattr(id_relacion)}')
+            estado = elemento.get('state')
+            hojas_nuevas.append(
+                f'<{prefijo_sheet}sheet name={quoteattr(nombre)} sheetId="{siguiente_id}"'
+                + (f' state={quoteattr(estado)}' if estado else '') + f' {atributo_r}/>'
+            )
+            relaciones_nuevas.append(
+                f'<Relationship Id={quoteattr(id_relacion)} Type="{TIPO_HOJA}" Target={quoteattr("/" + renombre[parte])}/>'
+            )
+            siguiente_id += 1
+
+        # [Content_Types].xml: los tipos de las partes nuevas y las extensiones que el original no tenía
+        for tipo in ET.fromstring(zip_generado.read('[Content_Types].xml')):
+            if tipo.tag == _q(NS_TIPOS, 'Default') and tipo.get('Extension').lower() not in extensiones:
+                extensiones.add(tipo.get('Extension').lower())
+                tipos_nuevos.append(f'<Default Extension={quoteattr(tipo.get("Extension"))} '
+                                    f'ContentType={quoteattr(tipo.get("ContentType"))}/>')
+            elif tipo.tag == _q(NS_TIPOS, 'Override') and tipo.get('PartName').lstrip('/') in renombre:
+                tipos_nuevos.append(f'<Override PartName={quoteattr("/" + renombre[tipo.get("PartName").lstrip("/")])} '
+                                    f'ContentType={quoteattr(tipo.get("ContentType"))}/>')
+
+        aportes.append((zip_generado, partes, renombre, {parte for _, parte, _ in hojas_generado}, mapa_xf))
+
+    texto_libro = _insertar_antes_del_cierre(texto_libro, 'sheets', ''.join(hojas_nuevas))
+    texto_relaciones = _insertar_antes_del_cierre(zip_original.read(_ruta_rels(libro_original)).decode('utf-8'),
+                                                  'Relationships', ''.join(relaciones_nuevas))
+    texto_tipos = _insertar_antes_del_cierre(zip_original.read('[Content_Types].xml').decode('utf-8'),
+                                             'Types', ''.join(tipos_nuevos))
+
+    reemplazos = {
+        '[Content_Types].xml': texto_tipos.encode('utf-8'),
+        libro_original: texto_libro.encode('utf-8'),
+        _ruta_rels(libro_original): texto_relaciones.encode('utf-8'),
+        estilos_original: texto_estilos.encode('utf-8'),
+    }
+    app = next((_destino('', r['Target']) for r in _relaciones(zip_original, '') if r['Type'] == TIPO_APP), None)
+    if app in zip_original.namelist():
+        reemplazos[app] = actualizar_app(zip_original.read(app).decode('utf-8'),
+                                         [nombre for nombre, _, _ in hojas_original], nombres_nuevos).encode('utf-8')
+
+    salida = BytesIO()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zip_salida:
+        # Las partes del original, en su orden y con su contenido intacto salvo las de arriba
+        for info in zip_original.infolist():
+            datos = reemplazos.get(info.filename)
+            zip_salida.writestr(info.filename, zip_original.read(info) if datos is None else datos)
+
+        for zip_generado, partes, renombre, hojas, mapa_xf in aportes:
+            for parte in partes:
+                datos = zip_generado.read(parte)
+                if parte in hojas:
+                    datos = renumerar_estilos_hoja(datos, mapa_xf)
+                elif parte.endswith('.rels'):
+                    datos = _renombrar_destinos(datos, parte, renombre)
+                zip_salida.writestr(renombre[parte], datos)
+
+    return salida.getvalue()
+
+
+def _renombrar_destinos(datos, parte_rels, renombre):
+    # Las relaciones de una parte renombrada apuntan a las partes renombradas (siempre con ruta absoluta)
+    parte = posixpath.join(posixpath.dirname(posixpath.dirname(parte_rels)), posixpath.basename(parte_rels)[:-5])
+
+    def reemplazar(m):
+        destino = _destino(parte, m.group(2).decode('utf-8'))
+        if destino not in renombre:
+            return m.group(0)
+        return m.group(1) + ('/' + renombre[destino]).encode('utf-8') + b'"'
+
+    # Los destinos externos (TargetMode="External", p. ej. hipervínculos) no son partes del paquete
+    return re.sub(rb'(<Relationship\b(?![^>]*TargetMode="External")[^>]*?\bTarget=")([^"]*)"', reemplazar, datos)
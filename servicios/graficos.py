@@ -0,0 +1,516 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from io import BytesIO
+from itertools import cycle, islice
+import multiprocessing
+
+import matplotlib
+matplotlib.use("Agg")  # pandas importa pyplot al graficar: que nunca elija un backend con ventanas
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_hex
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+from openpyxl.chart import BarChart, PieChart, Reference
+from openpyxl.chart.data_source import AxDataSource, MultiLevelStrRef, StrRef
+from openpyxl.chart.label import DataLabelList
+from openpyxl.chart.series import DataPoint
+from openpyxl.drawing.image import Image
+from openpyxl.utils import get_column_letter, quote_sheetname
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+from servicios.cache import CacheDisco, CacheLRU
+from servicios.config import (
+    DIR_CACHE_GRAFICOS,
+    GRAFICOS_NATIVOS,
+    MAX_MB_CACHE_GRAFICOS,
+    MAX_MB_CACHE_GRAFICOS_DISCO,
+    TRABAJADORES_GRAFICOS,
+)
+
+
+# ---------------------------------------------------------------------- RENDER EN MEMORIA --------------------------------------
+# Sin pyplot: cada gráfica es una Figure propia con su lienzo Agg, sin figura "actual" ni registro global
+# de figuras, así que varios hilos (sesiones de Streamlit, informes en segundo plano) dibujan a la vez
+# sin pisarse y no queda nada abierto que cerrar.
+def nueva_figura(figsize):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+# Todas las gráficas terminan aquí: PNG en un BytesIO, nunca en disco.
+def figura_a_png(fig, dpi=None, bbox_inches="tight"):
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, transparent=True, bbox_inches=bbox_inches)
+    buffer.seek(0)
+    return buffer
+
+
+def imagen_excel(buffer):
+    if isinstance(buffer, bytes):
+        buffer = BytesIO(buffer)
+    return Image(buffer)
+
+
+# Equivalente a plt.cm.get_cmap(nombre, n), que ya no existe en matplotlib >= 3.9
+def colores_mapa(nombre, n):
+    cmap = matplotlib.colormaps[nombre].resampled(max(n, 1))
+    return [cmap(i) for i in range(n)]
+
+
+# ---------------------------------------------------------------------- ESPECIFICACIONES --------------------------------------
+# Dónde están ya escritos en el libro los datos de una gráfica: encabezado en (fila, columna), luego
+# `filas` filas de datos; primero las columnas de categorías y a su derecha las de valores (una serie por columna).
+@dataclass
+class OrigenDatos:
+    hoja: str
+    fila: int
+    columna: int
+    filas: int
+    columnas_categoria: int = 1
+    columnas_valor: int = 1
+
+    def _rango(self, primera_col, ultima_col, primera_fila):
+        return (f"{quote_sheetname(self.hoja)}!${get_column_letter(primera_col)}${primera_fila}"
+                f":${get_column_letter(ultima_col)}${self.fila + self.filas}")
+
+    def categorias(self):
+        return self._rango(self.columna, self.columna + self.columnas_categoria - 1, self.fila + 1)
+
+    def valores(self):
+        # Con el encabezado: de ahí salen los nombres de las series
+        primera = self.columna + self.columnas_categoria
+        return self._rango(primera, primera + self.columnas_valor - 1, self.fila)
+
+
+# Una gráfica = tipo + datos ya agregados (tabla chica) + opciones de dibujo.
+# Es picklable para poder mandarla a los procesos del pool.
+# origen: dónde están esos datos en el libro, si ya se escribieron; solo lo usan las gráficas nativas
+# (no es parte de la clave del PNG).
+@dataclass
+class EspecGrafico:
+    tipo: str
+    datos: object
+    opciones: dict = field(default_factory=dict)
+    origen: OrigenDatos = None
+
+
+def _barras(conteo, figsize, colores, xlabel, ylabel, leyenda, etiquetas, rotacion_x=None):
+    fig = nueva_figura(figsize)
+    ax = fig.subplots()
+    conteo.plot(kind='bar', ax=ax, color=colores)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.legend(loc='upper left', **leyenda)
+
+    for p in ax.patches:
+        altura = p.get_height()
+        if etiquetas.get('omitir_ceros') and altura <= 0:
+            continue
+        texto = int(altura) if etiquetas.get('enteros') else altura
+        if etiquetas.get('desplazamiento'):
+            ax.annotate(f'{texto}',
+                        (p.get_x() + p.get_width() / 2., altura),
+                        xytext=(0, etiquetas['desplazamiento']),
+                        textcoords='offset points',
+                        ha='center', va='bottom', fontsize=etiquetas['fontsize'], color='black')
+        else:
+            ax.text(p.get_x() + p.get_width() / 2, altura, texto,
+                    ha='center', va='bottom', fontsize=etiquetas['fontsize'])
+
+    if rotacion_x is not None:
+        for etiqueta in ax.get_xticklabels():
+            etiqueta.set(rotation=rotacion_x, ha='right')
+    fig.tight_layout()
+    return fig
+
+
+def _pastel(conteo, figsize, leyenda, colores=None, mapa=None, startangle=90, titulo=None, eje_igual=False):
+    fig = nueva_figura(figsize)
+    ax = fig.subplots()
+    if mapa is not None:
+        colores = colores_mapa(mapa, len(conteo))
+
+    wedges, _, _ = ax.pie(conteo, labels=None, autopct='%1.1f%%', startangle=startangle, colors=colores)
+    if eje_igual:
+        ax.axis('equal')
+    if titulo is not None:
+        ax.set_title(titulo, fontsize=12)
+    ax.legend(wedges, conteo.index, loc='center left', **leyenda)
+
+    fig.tight_layout()
+    return fig
+
+
+def _barras_agrupadas(conteo, colores, titulo, xlabel, ylabel, leyenda_titulo):
+    estados = conteo.index
+    notificadores = conteo.columns
+    x = np.arange(len(estados))
+
+    colores_usar = list(islice(cycle(colores), len(notificadores)))
+    total_width = 0.8
+    bar_width = total_width / len(notificadores)
+
+    fig = nueva_figura((max(15, len(estados) * 0.4), 6))
+    ax = fig.subplots()
+
+    for i, notificador in enumerate(notificadores):
+        bars = ax.bar(x + i * bar_width, conteo[notificador], width=bar_width, label=notificador, color=colores_usar[i])
+        for bar in bars:
+            yval = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width() / 2, yval, int(yval), ha='center', va='bottom', fontsize=8)
+
+    ax.set_xticks(x + total_width / 2 - bar_width / 2)
+    ax.set_xticklabels(estados, rotation=90, ha='center', fontsize=7)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(titulo)
+    ax.legend(title=leyenda_titulo, bbox_to_anchor=(1.02, 1), loc='upper left')
+    fig.tight_layout()
+    return fig
+
+
+# Una torta por fila de la tabla (p. ej. notificador × estado) en una grilla, con una sola leyenda:
+# cada columna tiene el mismo color en todas las tortas
+def _pasteles(tabla, mapa, leyenda, columnas=3, lado=4, titulo=None):
+    n = len(tabla)
+    columnas = max(1, min(columnas, n))
+    filas = -(-n // columnas)
+    colores = colores_mapa(mapa, tabla.shape[1])
+
+    fig = nueva_figura((lado * columnas, lado * filas))
+    ejes = fig.subplots(filas, columnas, squeeze=False)
+    for ax, (nombre, conteo) in zip(ejes.flat, tabla.iterrows()):
+        # Los estados que no tiene el notificador quedan en cero: sin rótulo
+        ax.pie(conteo, labels=None, colors=colores, startangle=90,
+               autopct=lambda p: f'{p:1.1f}%' if p > 0 else '', textprops={'fontsize': 8})
+        ax.set_title(str(nombre), fontsize=12)
+    for ax in ejes.flat[n:]:
+        ax.axis('off')
+
+    if titulo is not None:
+        fig.suptitle(titulo, fontsize=12)
+    fig.tight_layout()
+    fig.legend([Patch(facecolor=c) for c in colores], tabla.columns, loc='center left', bbox_to_anchor=(1.0, 0.5),
+               **leyenda)
+    return fig
+
+
+RENDERIZADORES = {
+    'barras': _barras,
+    'pastel': _pastel,
+    'pasteles': _pasteles,
+    'barras_agrupadas': _barras_agrupadas,
+}
+
+
+# Lo que corre en los procesos del pool: sin cache, solo matplotlib
+def _dibujar(espec):
+    opciones = dict(espec.opciones)
+    dpi = opciones.pop('dpi', None)
+    bbox_inches = opciones.pop('bbox_inches', 'tight')
+    fig = RENDERIZADORES[espec.tipo](espec.datos, **opciones)
+    return figura_a_png(fig, dpi=dpi, bbox_inches=bbox_inches).getvalue()
+
+
+def renderizar(espec):
+    return renderizar_lote([espec])[0]
+
+
+# ---------------------------------------------------------------------- CACHE DE GRÁFICAS --------------------------------------
+# La clave es el contenido de la tabla agregada (valores, índice, columnas y tipos) más el tipo
+# y las opciones de dibujo: si nada de eso cambia, el PNG es el mismo.
+_cache_memoria = CacheLRU(max_bytes=MAX_MB_CACHE_GRAFICOS * 1024 * 1024)
+_cache_disco = (
+    CacheDisco(DIR_CACHE_GRAFICOS, MAX_MB_CACHE_GRAFICOS_DISCO * 1024 * 1024, extension='.png')
+    if DIR_CACHE_GRAFICOS else None
+)
+
+
+def clave_grafico(espec):
+    h = hashlib.sha256()
+    h.update(espec.tipo.encode())
+    datos = espec.datos
+    h.update(pd.util.hash_pandas_object(datos, index=True).values.tobytes())
+    h.update(repr(list(datos.index)).encode())
+    if isinstance(datos, pd.DataFrame):
+        h.update(repr(list(datos.columns)).encode())
+        h.update(repr(list(datos.dtypes)).encode())
+    else:
+        h.update(repr((datos.name, datos.dtype)).encode())
+    h.update(repr(sorted(espec.opciones.items())).encode())
+    return h.hexdigest()
+
+
+def _buscar_en_cache(clave):
+    png = _cache_memoria.obtener(clave)
+    if png is None and _cache_disco is not None:
+        png = _cache_disco.obtener(clave)
+        if png is not None:
+            _cache_memoria.guardar(clave, png)
+    return png
+
+
+def _guardar_en_cache(clave, png):
+    _cache_memoria.guardar(clave, png)
+    if _cache_disco is not None:
+        _cache_disco.guardar(clave, png)
+
+
+# Contadores del proceso (todas las sesiones). Con desde (unas estadísticas anteriores), los aciertos y
+# fallos son solo los de ese intervalo, p. ej. los de un informe
+def estadisticas_cache_graficos(desde=None):
+    estadisticas = {'memoria': _cache_memoria.estadisticas()}
+    if _cache_disco is not None:
+        estadisticas['disco'] = _cache_disco.estadisticas()
+    if desde is not None:
+        for nivel, valores in estadisticas.items():
+            for contador in ('aciertos', 'fallos'):
+                valores[contador] -= desde.get(nivel, {}).get(contador, 0)
+    return estadisticas
+
+
+# ---------------------------------------------------------------------- RENDER EN PARALELO --------------------------------------
+# El pool vive mientras viva el servidor: levantar procesos nuevos en cada rerun costaría más que renderizar.
+# Se usa 'spawn' porque Streamlit corre con varios hilos y hacer fork ahí no es seguro.
+# Varios informes (hilos) pueden renderizar a la vez: cada uno toma el pool y lo suelta al terminar. Un
+# pool que se reemplaza (cambió la cantidad de procesos o se rompió) se apaga recién cuando lo suelta
+# el último que lo estaba usando.
+class _PoolGraficos:
+    def __init__(self, trabajadores):
+        self.ejecutor = ProcessPoolExecutor(max_workers=trabajadores, mp_context=multiprocessing.get_context('spawn'))
+        self.trabajadores = trabajadores
+        self.usos = 0
+        self.retirado = False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _retirar(pool):
+    # Con _pool_lock tomado
+    pool.retirado = True
+    if pool.usos == 0:
+        pool.ejecutor.shutdown(wait=False)
+
+
+def _tomar_pool(trabajadores):
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.trabajadores != trabajadores:
+            if _pool is not None:
+                _retirar(_pool)
+            _pool = _PoolGraficos(trabajadores)
+        _pool.usos += 1
+        return _pool
+
+
+def _soltar_pool(pool):
+    with _pool_lock:
+        pool.usos -= 1
+        if pool.retirado and pool.usos == 0:
+            pool.ejecutor.shutdown(wait=False)
+
+
+def _descartar_pool(pool):
+    # Solo si sigue siendo el vigente: otro hilo ya pudo haberlo reemplazado por uno nuevo
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+        _retirar(pool)
+
+
+def _dibujar_varias(especs, trabajadores):
+    # Con un solo núcleo (o una sola gráfica) el pool solo agrega costo
+    if trabajadores <= 1 or len(especs) <= 1:
+        return [_dibujar(e) for e in especs]
+
+    pool = _tomar_pool(trabajadores)
+    try:
+        return list(pool.ejecutor.map(_dibujar, especs))
+    except BrokenProcessPool:
+        print("⚠️ El pool de gráficas falló, se renderiza en serie.")
+        _descartar_pool(pool)
+        return [_dibujar(e) for e in especs]
+    finally:
+        _soltar_pool(pool)
+
+
+def renderizar_lote(especs, trabajadores=None):
+    especs = list(especs)
+    if trabajadores is None:
+        trabajadores = TRABAJADORES_GRAFICOS or os.cpu_count() or 1
+
+    claves = [clave_grafico(e) for e in especs]
+    pngs = {}
+    faltantes = {}  # clave → espec; las gráficas repetidas en el mismo lote se dibujan una vez
+    for clave, espec in zip(claves, especs):
+        if clave in pngs or clave in faltantes:
+            continue
+        png = _buscar_en_cache(clave)
+        if png is None:
+            faltantes[clave] = espec
+        else:
+            pngs[clave] = png
+
+    nuevos = _dibujar_varias(list(faltantes.values()), trabajadores)
+    for clave, png in zip(faltantes, nuevos):
+        _guardar_en_cache(clave, png)
+        pngs[clave] = png
+
+    return [pngs[clave] for clave in claves]
+
+
+# ---------------------------------------------------------------------- GRÁFICAS NATIVAS DE EXCEL --------------------------------------
+# En vez del PNG, una gráfica de Excel (openpyxl.chart) que apunta a celdas del libro: no pasa por
+# matplotlib, el archivo queda mucho más liviano y la gráfica sigue a los datos si se editan.
+# Si la espec trae origen, la gráfica apunta a la tabla que ya está en la hoja; si no (tablas
+# pivoteadas que no se escriben en ninguna hoja), sus datos se escriben en una hoja oculta.
+HOJA_DATOS_GRAFICAS = "DATOS GRÁFICAS"
+
+
+def _hex(color):
+    return to_hex(color)[1:].upper()
+
+
+def _colores_nativos(opciones, n):
+    if opciones.get('mapa') is not None:
+        return [_hex(c) for c in colores_mapa(opciones['mapa'], n)]
+    if opciones.get('colores'):
+        return [_hex(c) for c in islice(cycle(opciones['colores']), n)]
+    return []
+
+
+def grafico_nativo(espec, origen):
+    opciones = espec.opciones
+    if espec.tipo == 'pastel':
+        grafico = PieChart()
+        grafico.dataLabels = DataLabelList(showPercent=True)  # como autopct='%1.1f%%'
+    elif espec.tipo == 'pasteles':
+        # Excel no arma grillas de tortas: una barra 100 % apilada por fila, cada columna en su color
+        grafico = BarChart()
+        grafico.type = 'bar'
+        grafico.grouping = 'percentStacked'
+        grafico.overlap = 100
+        grafico.x_axis.delete = False
+        grafico.y_axis.delete = False
+    else:
+        grafico = BarChart()
+        grafico.type = 'col'
+        grafico.grouping = 'clustered'
+        grafico.x_axis.title = opciones.get('xlabel')
+        grafico.y_axis.title = opciones.get('ylabel')
+        # openpyxl 3.1 marca los ejes como borrados por defecto
+        grafico.x_axis.delete = False
+        grafico.y_axis.delete = False
+        if espec.tipo == 'barras_agrupadas' or opciones.get('etiquetas'):
+            grafico.dataLabels = DataLabelList(showVal=True)
+    grafico.title = opciones.get('titulo')
+    grafico.legend.position = 'r'
+    grafico.visible_cells_only = False  # los datos pueden estar en la hoja oculta
+
+    grafico.add_data(Reference(range_string=origen.valores()), titles_from_data=True)
+    # Varias columnas de categorías (p. ej. NOTIFICADOR y ESTADO_INFORME) = categorías de varios niveles
+    if origen.columnas_categoria > 1:
+        categorias = AxDataSource(multiLvlStrRef=MultiLevelStrRef(f=origen.categorias()))
+    else:
+        categorias = AxDataSource(strRef=StrRef(f=origen.categorias()))
+    for serie in grafico.series:
+        serie.cat = categorias
+
+    if espec.tipo == 'pastel':
+        serie = grafico.series[0]
+        for i, color in enumerate(_colores_nativos(opciones, origen.filas)):
+            punto = DataPoint(idx=i)
+            punto.graphicalProperties.solidFill = color
+            serie.dPt.append(punto)
+    else:
+        for serie, color in zip(grafico.series, _colores_nativos(opciones, len(grafico.series))):
+            serie.graphicalProperties.solidFill = color
+            serie.graphicalProperties.line.solidFill = color
+
+    # Mismo tamaño que el PNG (figsize en pulgadas; openpyxl usa cm)
+    if espec.tipo == 'pasteles':
+        ancho, alto = 12, max(4, origen.filas * 0.6)
+    else:
+        ancho, alto = opciones.get('figsize') or (max(15, origen.filas * 0.4), 6)
+    grafico.width, grafico.height = ancho * 2.54, alto * 2.54
+    return grafico
+
+
+def _crear_hoja_datos(libro, nombre):
+    if nombre in libro.sheetnames:
+        del libro[nombre]
+    hoja = libro.create_sheet(nombre)
+    hoja.sheet_state = 'hidden'
+    return hoja
+
+
+def _escribir_datos(hoja_datos, fila, espec):
+    # Con append, para que sirva también en libros write-only; una fila vacía entre tabla y tabla
+    datos = espec.datos
+    tabla = datos.reset_index()
+    for valores in dataframe_to_rows(tabla, index=False, header=True):
+        hoja_datos.append(valores)
+    hoja_datos.append([])
+    origen = OrigenDatos(hoja_datos.title, fila, 1, len(tabla),
+                         columnas_categoria=datos.index.nlevels,
+                         columnas_valor=tabla.shape[1] - datos.index.nlevels)
+    return origen, fila + len(tabla) + 2
+
+
+def insertar_nativos(pendientes, nombre_hoja_datos=HOJA_DATOS_GRAFICAS):
+    hojas_datos = {}  # libro → [hoja de datos, siguiente fila libre]
+    for hoja, celda, espec in pendientes:
+        origen = espec.origen
+        if origen is None:
+            libro = hoja.parent
+            if id(libro) not in hojas_datos:
+                hojas_datos[id(libro)] = [_crear_hoja_datos(libro, nombre_hoja_datos), 1]
+            hoja_datos, fila = hojas_datos[id(libro)]
+            origen, hojas_datos[id(libro)][1] = _escribir_datos(hoja_datos, fila, espec)
+        hoja.add_chart(grafico_nativo(espec, origen), celda)
+
+
+# Junta las gráficas de todas las hojas para renderizarlas de una vez y luego insertarlas.
+# nativos: gráficas de Excel en lugar de PNG (por defecto, NOTIF_GRAFICOS_NATIVOS).
+# hoja_datos: nombre de la hoja oculta de las gráficas nativas (otro si el libro se va a unir con uno que ya la tiene).
+class LoteGraficos:
+    def __init__(self, trabajadores=None, nativos=None, hoja_datos=HOJA_DATOS_GRAFICAS):
+        self.trabajadores = trabajadores
+        self.nativos = GRAFICOS_NATIVOS if nativos is None else nativos
+        self.hoja_datos = hoja_datos
+        self._pendientes = []
+
+    def agregar(self, hoja, celda, espec):
+        self._pendientes.append((hoja, celda, espec))
+
+    def insertar(self):
+        # Las hojas que se borraron y se volvieron a crear ya no están en el libro: no se renderizan
+        vigentes = [
+            (hoja, celda, espec) for hoja, celda, espec in self._pendientes
+            if hoja.title in hoja.parent.sheetnames and hoja.parent[hoja.title] is hoja
+        ]
+        self._pendientes = []
+        if self.nativos:
+            insertar_nativos(vigentes, self.hoja_datos)
+            return
+
+        pngs = renderizar_lote([espec for _, _, espec in vigentes], self.trabajadores)
+        for (hoja, celda, _), png in zip(vigentes, pngs):
+            hoja.add_image(imagen_excel(png), celda)
+
+
+def insertar_grafico(hoja, celda, espec, lote=None):
+    if lote is None:
+        hoja.add_image(imagen_excel(renderizar(espec)), celda)
+    else:
+        lote.agregar(hoja, celda, espec)
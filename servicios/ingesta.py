@@ -0,0 +1,312 @@
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from servicios.config import MOTOR_EXCEL
+
+try:
+    import pyarrow  # noqa: F401  (opcional: lector de CSV multihilo)
+    MOTOR_CSV = 'pyarrow'
+except ImportError:
+    MOTOR_CSV = 'c'
+
+try:
+    import python_calamine  # noqa: F401  (opcional: lector de xlsx en Rust, varias veces más rápido)
+except ImportError:
+    python_calamine = None
+
+MOTORES_EXCEL = ('calamine', 'openpyxl')
+
+
+HOJAS = ('DTO', 'PCL')
+COLUMNAS_REQUERIDAS = ('FECHA_VISADO', 'NOTIFICADOR', 'ESTADO_INFORME')
+# Claves de agrupación con pocos valores distintos: se guardan como category
+COLUMNAS_CATEGORIA = ('HOJA_ORIGEN', 'NOTIFICADOR', 'ESTADO_INFORME')
+
+
+# ---------------------------------------------------------------------- MOTOR DE LECTURA --------------------------------------
+# 'auto' usa calamine si está instalado y si no openpyxl, que es el de siempre.
+def motor_excel(preferido=None):
+    preferido = (preferido or MOTOR_EXCEL).strip().lower()
+    if preferido == 'auto':
+        return 'calamine' if python_calamine is not None else 'openpyxl'
+    if preferido not in MOTORES_EXCEL:
+        raise ValueError(f"Motor de lectura no válido: '{preferido}' (use auto, {' o '.join(MOTORES_EXCEL)})")
+    if preferido == 'calamine' and python_calamine is None:
+        print("⚠️ python-calamine no está instalado: el libro se lee con openpyxl")
+        return 'openpyxl'
+    return preferido
+
+
+# ---------------------------------------------------------------------- VALIDACIÓN --------------------------------------
+# Solo mira nombres de hojas y encabezados (nrows=0): un archivo malo se rechaza
+# sin parsear las filas de datos.
+def validar_libro(xls, columnas_requeridas=COLUMNAS_REQUERIDAS):
+    errores = []
+
+    for hoja in HOJAS:
+        if hoja not in xls.sheet_names:
+            errores.append(f"La hoja '{hoja}' no se encuentra en el archivo.")
+            continue
+
+        encabezado = pd.read_excel(xls, sheet_name=hoja, nrows=0).columns
+        faltantes = [c for c in columnas_requeridas if c not in encabezado]
+        if faltantes:
+            errores.append(f"La hoja '{hoja}' no tiene las columnas: {', '.join(faltantes)}.")
+
+    if errores:
+        raise ValueError("\n".join(errores))
+
+
+# ---------------------------------------------------------------------- LECTURA --------------------------------------
+def leer_libro(datos, columnas_requeridas=COLUMNAS_REQUERIDAS, columnas_fecha=('FECHA_VISADO',), motor=None):
+    motor = motor_excel(motor)
+    try:
+        return _leer_libro(datos, columnas_requeridas, columnas_fecha, motor)
+    except ValueError:
+        raise  # hojas o columnas faltantes: el archivo está mal, no el motor
+    except Exception as e:
+        if motor == 'openpyxl':
+            raise
+        print(f"⚠️ {motor} no pudo leer el libro ({e}); se reintenta con openpyxl")
+        return _leer_libro(datos, columnas_requeridas, columnas_fecha, 'openpyxl')
+
+
+def _leer_libro(datos, columnas_requeridas, columnas_fecha, motor):
+    # Un solo ExcelFile para validar y leer ambas hojas
+    with pd.ExcelFile(BytesIO(datos), engine=motor) as xls:
+        validar_libro(xls, columnas_requeridas)
+
+        frames = []
+        columnas_hoja = {}
+        for hoja in HOJAS:
+            df = pd.read_excel(xls, sheet_name=hoja)
+            # Las fechas se convierten aquí y no con parse_dates: así quedan iguales con cualquier
+            # motor (celdas de fecha o texto, mismo tipo y resolución). Las celdas de texto se leen
+            # mes/día/año, como lo hacía read_excel(parse_dates=...)
+            for columna in columnas_fecha:
+                if columna in df.columns:
+                    df[columna] = _parsear_fechas(df[columna], dia_primero=False)
+            columnas_hoja[hoja] = df.dtypes.to_dict()
+            df['HOJA_ORIGEN'] = hoja
+            frames.append(df)
+
+    df_total = pd.concat(frames, ignore_index=True)
+    # Columnas (y tipos) originales de cada hoja: el concat agrega NaN en las columnas que
+    # solo tiene la otra hoja y puede pasar enteros a float
+    df_total.attrs['COLUMNAS_HOJA'] = columnas_hoja
+    return normalizar(df_total)
+
+
+# dia_primero: cómo leer el texto que no es ISO. Los CSV se exportan día/mes/año (03/04/2025 = 3 de abril);
+# en el xlsx se mantiene el mes/día/año que siempre dio read_excel (03/04/2025 = 4 de marzo)
+def _parsear_fechas(valores, dia_primero):
+    if not pd.api.types.is_datetime64_any_dtype(valores):
+        # Primero ISO (2025-02-03); el resto según dia_primero
+        fechas = pd.to_datetime(valores, format='ISO8601', errors='coerce')
+        faltan = fechas.isna() & valores.notna()
+        if faltan.any():
+            fechas[faltan] = pd.to_datetime(valores[faltan], dayfirst=dia_primero, errors='coerce')
+        valores = fechas
+    # Resolución fija: cada motor (y cada versión de pandas) puede devolver otra
+    return valores.astype('datetime64[us]')
+
+
+# ---------------------------------------------------------------------- NORMALIZACIÓN --------------------------------------
+# Se hace una sola vez al cargar: claves como category, año y mes como enteros chicos. Así nadie
+# más tiene que recalcular FECHA_VISADO.dt.month. Los valores no se tocan: las hojas de datos salen
+# tal cual vinieron; los espacios sobrantes de las claves se quitan solo al agrupar (construir_cubo).
+def normalizar(df, columnas_categoria=COLUMNAS_CATEGORIA, reportar=True):
+    antes = df.memory_usage(deep=True).sum()
+
+    _claves_como_categoria(df, columnas_categoria)
+
+    if 'FECHA_VISADO' in df.columns and pd.api.types.is_datetime64_any_dtype(df['FECHA_VISADO']):
+        # Nullable: las fechas vacías quedan como <NA> y los groupby las descartan
+        df['ANIO'] = df['FECHA_VISADO'].dt.year.astype('Int16')
+        df['MES'] = df['FECHA_VISADO'].dt.month.astype('Int8')
+
+    if reportar:
+        despues = df.memory_usage(deep=True).sum()
+        print(f"📦 Memoria del DataFrame: {antes / 1e6:.1f} MB → {despues / 1e6:.1f} MB ({len(df)} filas)")
+    return df
+
+
+def _claves_como_categoria(df, columnas_categoria=COLUMNAS_CATEGORIA):
+    for columna in columnas_categoria:
+        if columna in df.columns:
+            df[columna] = df[columna].astype('category')
+    return df
+
+
+# ---------------------------------------------------------------------- CSV --------------------------------------
+# Un CSV con columna HOJA_ORIGEN (DTO/PCL) o un par de CSV cuyos nombres dicen DTO y PCL.
+# Mucho más rápido de parsear que el xlsx equivalente; el resultado es el mismo DataFrame que leer_libro.
+def _encabezado_csv(datos):
+    return pd.read_csv(BytesIO(datos), nrows=0).columns
+
+
+def _leer_un_csv(datos, encabezado, columnas_fecha):
+    # Las claves se leen ya como category
+    tipos = {c: 'category' for c in COLUMNAS_CATEGORIA if c in encabezado}
+    df = pd.read_csv(BytesIO(datos), engine=MOTOR_CSV, dtype=tipos)
+    for columna in columnas_fecha:
+        if columna in df.columns:
+            df[columna] = _parsear_fechas(df[columna], dia_primero=True)
+    return df
+
+
+def leer_csv(archivos, columnas_requeridas=COLUMNAS_REQUERIDAS, columnas_fecha=('FECHA_VISADO',)):
+    # archivos: lista de (nombre, bytes)
+    errores = []
+
+    if len(archivos) == 1:
+        nombre, datos = archivos[0]
+        encabezado = _encabezado_csv(datos)
+        faltantes = [c for c in ('HOJA_ORIGEN',) + tuple(columnas_requeridas) if c not in encabezado]
+        if faltantes:
+            raise ValueError(f"El archivo '{nombre}' no tiene las columnas: {', '.join(faltantes)}.")
+
+        df_total = _leer_un_csv(datos, encabezado, columnas_fecha)
+        df_total['HOJA_ORIGEN'] = df_total['HOJA_ORIGEN'].astype(str).str.strip().str.upper()
+        otras = sorted(set(df_total['HOJA_ORIGEN'].unique()) - set(HOJAS))
+        if otras:
+            raise ValueError(f"La columna HOJA_ORIGEN solo puede valer {' o '.join(HOJAS)}; también trae: {', '.join(otras)}.")
+        tipos = df_total.drop(columns='HOJA_ORIGEN').dtypes.to_dict()
+        columnas_hoja = {hoja: tipos for hoja in HOJAS}
+
+    else:
+        por_hoja = {}
+        for nombre, datos in archivos:
+            hojas = [hoja for hoja in HOJAS if hoja in nombre.upper()]
+            if len(hojas) != 1:
+                errores.append(f"No se sabe si '{nombre}' es DTO o PCL: el nombre debe contener solo uno de los dos.")
+            elif hojas[0] in por_hoja:
+                errores.append(f"Hay más de un archivo para {hojas[0]}.")
+            else:
+                por_hoja[hojas[0]] = (nombre, datos)
+        errores += [f"Falta el archivo de {hoja}." for hoja in HOJAS if hoja not in por_hoja]
+
+        encabezados = {}
+        for hoja, (nombre, datos) in por_hoja.items():
+            encabezados[hoja] = _encabezado_csv(datos)
+            faltantes = [c for c in columnas_requeridas if c not in encabezados[hoja]]
+            if faltantes:
+                errores.append(f"El archivo '{nombre}' ({hoja}) no tiene las columnas: {', '.join(faltantes)}.")
+        if errores:
+            raise ValueError("\n".join(errores))
+
+        frames = []
+        columnas_hoja = {}
+        for hoja in HOJAS:
+            df = _leer_un_csv(por_hoja[hoja][1], encabezados[hoja], columnas_fecha)
+            columnas_hoja[hoja] = df.dtypes.to_dict()
+            df['HOJA_ORIGEN'] = hoja
+            frames.append(df)
+        df_total = pd.concat(frames, ignore_index=True)
+
+    df_total.attrs['COLUMNAS_HOJA'] = columnas_hoja
+    return normalizar(df_total)
+
+
+def separar_hojas(df_total):
+    columnas_hoja = df_total.attrs.get('COLUMNAS_HOJA', {})
+    hojas = {}
+    for hoja in HOJAS:
+        df = df_total[df_total['HOJA_ORIGEN'] == hoja]
+        tipos = columnas_hoja.get(hoja)
+        if tipos is None:
+            hojas[hoja] = df.drop(columns=['HOJA_ORIGEN', 'ANIO', 'MES'], errors='ignore').reset_index(drop=True)
+        else:
+            # Las claves normalizadas se quedan como category; el resto vuelve a su tipo original
+            restaurar = {c: t for c, t in tipos.items() if c not in COLUMNAS_CATEGORIA}
+            hojas[hoja] = df[list(tipos)].astype(restaurar).reset_index(drop=True)
+    return hojas
+
+
+# ---------------------------------------------------------------------- LECTURA POR BLOQUES --------------------------------------
+# Para archivos muy grandes: en vez de un DataFrame con todo el archivo, bloques de `filas` filas
+# (CSV con chunksize, xlsx con el iterador read-only de openpyxl). Todos los bloques traen las mismas
+# columnas, en el orden en que quedarían tras el concat de leer_libro, sin filas vacías y con las
+# claves como category. La memoria depende del tamaño del bloque y no del archivo.
+def leer_bloques(archivo, tipo, columnas_requeridas=COLUMNAS_REQUERIDAS, filas=50000):
+    # archivo: ruta o archivo abierto. Devuelve (columnas, generador de bloques); los encabezados
+    # se validan aquí mismo, antes de leer una sola fila de datos
+    if tipo == "xlsx":
+        return _bloques_xlsx(archivo, columnas_requeridas, filas)
+    if tipo == "csv":
+        return _bloques_csv(archivo, columnas_requeridas, filas)
+    raise ValueError(f"Tipo de archivo no soportado: {tipo}")
+
+
+def _preparar_bloque(bloque):
+    bloque = bloque.dropna(how='all')
+    return _claves_como_categoria(bloque.reset_index(drop=True))
+
+
+def _bloques_csv(archivo, columnas_requeridas, filas):
+    encabezado = pd.read_csv(archivo, nrows=0, delimiter=",").columns
+    faltantes = [c for c in columnas_requeridas if c not in encabezado]
+    if faltantes:
+        raise ValueError(f"El archivo no tiene las columnas: {', '.join(faltantes)}.")
+    if hasattr(archivo, 'seek'):
+        archivo.seek(0)
+
+    def bloques():
+        # 'skip' ignora las líneas mal formadas, igual que la lectura completa
+        with pd.read_csv(archivo, on_bad_lines='skip', delimiter=",", chunksize=filas) as lector:
+            for bloque in lector:
+                yield _preparar_bloque(bloque)
+
+    return list(encabezado), bloques()
+
+
+def _encabezado_hoja(hoja):
+    primera = list(next(hoja.iter_rows(max_row=1, values_only=True), ()))
+    while primera and primera[-1] is None:  # columnas vacías al final de la hoja
+        primera.pop()
+    return [f"Unnamed: {i}" if v is None else v for i, v in enumerate(primera)]
+
+
+def _bloques_xlsx(archivo, columnas_requeridas, filas):
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        errores = []
+        encabezados = {}
+        for hoja in HOJAS:
+            if hoja not in libro.sheetnames:
+                errores.append(f"La hoja '{hoja}' no se encuentra en el archivo.")
+                continue
+            encabezados[hoja] = _encabezado_hoja(libro[hoja])
+            faltantes = [c for c in columnas_requeridas if c not in encabezados[hoja]]
+            if faltantes:
+                errores.append(f"La hoja '{hoja}' no tiene las columnas: {', '.join(faltantes)}.")
+        if errores:
+            raise ValueError("\n".join(errores))
+    except Exception:
+        libro.close()
+        raise
+
+    columnas = list(dict.fromkeys(c for hoja in HOJAS for c in encabezados[hoja]))
+
+    def bloques():
+        try:
+            for hoja in HOJAS:
+                # Posición de cada columna de la hoja dentro de las columnas comunes
+                posiciones = [columnas.index(c) for c in encabezados[hoja]]
+                pendientes = []
+                for valores in libro[hoja].iter_rows(min_row=2, values_only=True):
+                    fila = [None] * len(columnas)
+                    for posicion, valor in zip(posiciones, valores):
+                        fila[posicion] = valor
+                    pendientes.append(fila)
+                    if len(pendientes) == filas:
+                        yield _preparar_bloque(pd.DataFrame(pendientes, columns=columnas))
+                        pendientes = []
+                if pendientes:
+                    yield _preparar_bloque(pd.DataFrame(pendientes, columns=columnas))
+        finally:
+            libro.close()
+
+    return columnas, bloques()
@@ -0,0 +1,145 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+try:
+    import psutil
+except ImportError:  # opcional: sin psutil se lee /proc (Linux) o el pico del proceso
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# ---------------------------------------------------------------------- MEMORIA --------------------------------------
+_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_mb():
+    # Memoria residente actual del proceso, en MB (None si no hay forma de medirla)
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1e6
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGINA / 1e6
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # Solo el pico histórico: en Linux viene en KB, en macOS en bytes
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 1e6 if sys.platform == 'darwin' else pico / 1e3
+    return None
+
+
+# Un hilo que mira la RSS cada pocos ms mientras dura la etapa: más barato que tracemalloc,
+# que frena mucho a pandas, y ve también la memoria de numpy y de openpyxl
+class _Muestreo(threading.Thread):
+    def __init__(self, intervalo=0.02):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.pico = rss_mb()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            actual = rss_mb()
+            if actual is not None and (self.pico is None or actual > self.pico):
+                self.pico = actual
+
+    def detener(self):
+        self._parar.set()
+        self.join()
+        actual = rss_mb()
+        if actual is not None and (self.pico is None or actual > self.pico):
+            self.pico = actual
+        return self.pico
+
+
+# ---------------------------------------------------------------------- ETAPAS --------------------------------------
+# Registra tiempo, pico de memoria y filas de cada etapa del informe. Cada etapa terminada sale
+# enseguida como una línea JSON (para el recolector de logs) aunque el informe no llegue a terminar;
+# al final, cerrar() emite una línea con el resumen del informe y lo que agregue quien lo corre.
+# en_curso y previstas sirven para mostrar el avance desde otro hilo (servicios/trabajos.py).
+class Instrumentacion:
+    def __init__(self, proceso, emitir_json=True):
+        self.proceso = proceso
+        self.emitir_json = emitir_json
+        self.etapas = []
+        self.en_curso = None
+        self.previstas = 0  # etapas que el plan anunció que va a ejecutar
+        self.extras = {}  # datos del informe completo (p. ej. aciertos de la cache de gráficas)
+
+    def prever(self, etapas):
+        self.previstas += etapas
+
+    @contextmanager
+    def etapa(self, nombre, filas=None):
+        registro = {'filas': filas}  # quien mide puede completar las filas dentro del with
+        anterior, self.en_curso = self.en_curso, nombre
+        inicial = rss_mb()
+        muestreo = _Muestreo()
+        muestreo.start()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            yield registro
+            ok = True
+        finally:
+            segundos = time.perf_counter() - t0
+            pico = muestreo.detener()
+            self.en_curso = anterior
+            self._registrar({
+                'etapa': nombre,
+                'segundos': round(segundos, 4),
+                'rss_inicial_mb': None if inicial is None else round(inicial, 1),
+                'pico_mb': None if pico is None else round(pico, 1),
+                'filas': registro.get('filas'),
+                'ok': ok,
+            })
+
+    def _registrar(self, datos):
+        self.etapas.append(datos)
+        self._emitir('etapa_informe', datos)
+
+    def cerrar(self, **extras):
+        self.extras = extras
+        self._emitir('informe', {**self.resumen(), **extras})
+
+    def _emitir(self, evento, datos):
+        if self.emitir_json:
+            linea = {
+                'evento': evento,
+                'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                'proceso': self.proceso,
+                'pid': os.getpid(),
+                **datos,
+            }
+            print(json.dumps(linea, ensure_ascii=False), flush=True)
+
+    def resumen(self):
+        return {
+            'proceso': self.proceso,
+            'segundos': round(sum(e['segundos'] for e in self.etapas), 4),
+            'pico_mb': max((e['pico_mb'] for e in self.etapas if e['pico_mb'] is not None), default=None),
+            'etapas': len(self.etapas),
+        }
+
+
+def medir(instrumentacion, nombre, filas=None):
+    # Para funciones que reciben la instrumentación como opcional
+    if instrumentacion is None:
+        return nullcontext({'filas': filas})
+    return instrumentacion.etapa(nombre, filas)
+
+
+def contar_filas(resultado):
+    # Filas de lo que devuelve un paso, si es una tabla
+    if hasattr(resultado, 'shape') and hasattr(resultado, 'index'):
+        return len(resultado)
+    return None
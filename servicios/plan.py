@@ -0,0 +1,62 @@
+import time
+from dataclasses import dataclass
+
+from servicios.instrumentacion import contar_filas, medir
+
+
+# ---------------------------------------------------------------------- PLAN DEL INFORME --------------------------------------
+# El informe se describe como una lista de pasos (hojas, gráficas, datos intermedios) con sus dependencias.
+# Cada paso se identifica por su clave: si dos pasos tienen la misma clave hacen lo mismo,
+# así que el segundo no se vuelve a ejecutar y recibe el resultado del primero.
+@dataclass
+class Paso:
+    clave: tuple
+    funcion: object
+    requiere: tuple = ()  # claves de los pasos cuyos resultados recibe como argumentos, en ese orden
+
+    @property
+    def nombre(self):
+        return " · ".join(str(parte) for parte in self.clave)
+
+
+class Plan:
+    def __init__(self, nombre="informe", instrumentacion=None):
+        self.nombre = nombre
+        self.instrumentacion = instrumentacion  # si viene, cada paso registra tiempo, memoria y filas
+        self.pasos = []
+        self.tiempos = []  # (clave del paso, segundos) de la última ejecución
+
+    def agregar(self, clave, funcion, requiere=()):
+        if not isinstance(clave, tuple):
+            clave = (clave,)
+        requiere = tuple(c if isinstance(c, tuple) else (c,) for c in requiere)
+        self.pasos.append(Paso(clave, funcion, requiere))
+        return clave
+
+    def ejecutar(self):
+        resultados = {}
+        tiempos = []
+        inicio = time.perf_counter()
+        if self.instrumentacion is not None:
+            self.instrumentacion.prever(len(self.pasos))
+
+        for paso in self.pasos:
+            if paso.clave in resultados:
+                print(f"↩️ [{self.nombre}] {paso.nombre}: ya ejecutado, se omite")
+                continue
+
+            faltantes = [c for c in paso.requiere if c not in resultados]
+            if faltantes:
+                raise ValueError(f"El paso '{paso.nombre}' depende de pasos que no se ejecutaron: {faltantes}")
+
+            t0 = time.perf_counter()
+            with medir(self.instrumentacion, paso.nombre) as etapa:
+                resultados[paso.clave] = paso.funcion(*[resultados[c] for c in paso.requiere])
+                etapa['filas'] = contar_filas(resultados[paso.clave])
+            duracion = time.perf_counter() - t0
+            tiempos.append((paso.clave, duracion))
+            print(f"⏱️ [{self.nombre}] {paso.nombre}: {duracion * 1000:.0f} ms")
+
+        print(f"✅ [{self.nombre}] {len(tiempos)} pasos en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        self.tiempos = tiempos
+        return resultados
@@ -0,0 +1,151 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from servicios.cache import CacheLRU
+from servicios.config import MAX_MB_RESULTADOS, MAX_RESULTADOS, MAX_TRABAJOS, TTL_RESULTADOS
+from servicios.graficos import estadisticas_cache_graficos
+from servicios.instrumentacion import Instrumentacion
+
+
+# ---------------------------------------------------------------------- ETAPAS DE AVANCE --------------------------------------
+# Las etapas que registra la instrumentación (leer archivo, cada paso del plan, guardar libro, ...)
+# agrupadas en las cinco que muestra la barra de progreso
+ETAPAS_AVANCE = ('Lectura', 'Agregados', 'Gráficas', 'Escritura', 'Guardado')
+
+
+def etapa_avance(nombre):
+    if nombre == 'leer archivo':
+        return 'Lectura'
+    if nombre in ('gráficas', 'hojas anuales') or nombre.startswith('hoja · Distribución'):
+        return 'Gráficas'
+    if nombre in ('hojas', 'cubo', 'conteo', 'tabla') or nombre.startswith(('cubo ·', 'meses ·')):
+        return 'Agregados'
+    if nombre.startswith(('guardar', 'unir')):
+        return 'Guardado'
+    return 'Escritura'
+
+
+# ---------------------------------------------------------------------- TRABAJOS --------------------------------------
+# Un informe que se genera en segundo plano. La función recibe la instrumentación del trabajo y devuelve
+# los bytes del archivo; el script de Streamlit solo consulta el estado y el avance.
+class Trabajo:
+    def __init__(self, clave, proceso, funcion, extras=2):
+        self.clave = clave
+        self.funcion = funcion
+        self.instrumentacion = Instrumentacion(proceso)
+        self.extras = extras  # etapas fuera del plan (leer, guardar, ...), para estimar el avance
+        self.resultado = None
+        self.error = None
+        self.detalle = None
+        self.creado = time.time()
+        self.empezado = None
+        self.terminado = None
+        self._listo = threading.Event()
+
+    @property
+    def listo(self):
+        return self._listo.is_set()
+
+    def esperar(self, segundos=None):
+        return self._listo.wait(segundos)
+
+    def estado(self):
+        if self.listo:
+            return 'error' if self.error is not None else 'listo'
+        return 'en cola' if self.empezado is None else 'en curso'
+
+    def avance(self):
+        # Fracción de etapas terminadas; no llega a 1 hasta que el trabajo termina
+        if self.listo:
+            return 1.0
+        total = self.instrumentacion.previstas + self.extras
+        return min(len(self.instrumentacion.etapas) / total, 0.99) if total else 0.0
+
+    def etapas(self):
+        # ETAPAS_AVANCE → 'hecha', 'en curso' o 'pendiente'
+        hechas = {etapa_avance(e['etapa']) for e in self.instrumentacion.etapas}
+        en_curso = self.instrumentacion.en_curso
+        actual = etapa_avance(en_curso) if en_curso is not None else None
+        return {
+            etapa: 'en curso' if etapa == actual else 'hecha' if etapa in hechas or self.listo else 'pendiente'
+            for etapa in ETAPAS_AVANCE
+        }
+
+    def _ejecutar(self):
+        self.empezado = time.time()
+        # Aciertos de la cache de gráficas durante el informe (los contadores son de todo el servidor:
+        # si corren otros informes a la vez, sus búsquedas también suman)
+        cache_antes = estadisticas_cache_graficos()
+        try:
+            self.resultado = self.funcion(self.instrumentacion)
+        except Exception as e:
+            self.error = e
+            self.detalle = traceback.format_exc()
+            print(f"❌ [{self.instrumentacion.proceso}] El informe falló: {e}")
+        finally:
+            self.funcion = None  # suelta lo que capturó (archivo subido, DataFrames)
+            self.terminado = time.time()
+            self.instrumentacion.cerrar(cache_graficos=estadisticas_cache_graficos(desde=cache_antes))
+            self._listo.set()
+
+
+# ---------------------------------------------------------------------- COLA --------------------------------------
+# Un pool de hilos para todo el servidor, con a lo sumo MAX_TRABAJOS informes a la vez: los demás esperan
+# en cola. Hilos y no procesos, para compartir las caches de archivos y de partes del informe; las
+# gráficas igual se renderizan en el pool de procesos de servicios/graficos.py.
+# Los trabajos se identifican por una clave (contenido del archivo + opciones): el mismo pedido, desde
+# otra sesión o después de recargar la página, recibe el trabajo en curso o el resultado guardado.
+# Los terminados bien pasan a _resultados, acotada por cantidad y por bytes; los vencidos (TTL_RESULTADOS)
+# se descartan al enviar, al terminar cada trabajo y al consultar la cola.
+def _tamano_resultado(trabajo):
+    return len(trabajo.resultado) if isinstance(trabajo.resultado, (bytes, bytearray)) else 0
+
+
+_trabajos = {}  # clave → Trabajo en cola o en curso
+_resultados = CacheLRU(MAX_RESULTADOS, MAX_MB_RESULTADOS * 1024 * 1024, tamano=_tamano_resultado)
+_pool = None
+_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=max(1, MAX_TRABAJOS), thread_name_prefix='informe')
+    return _pool
+
+
+def _descartar_vencidos():
+    limite = time.time() - TTL_RESULTADOS * 60
+    _resultados.quitar_si(lambda trabajo: trabajo.terminado < limite)
+
+
+def _correr(trabajo):
+    trabajo._ejecutar()
+    with _lock:
+        if _trabajos.get(trabajo.clave) is trabajo:
+            del _trabajos[trabajo.clave]
+        # Los que fallaron no se guardan: el próximo pedido los vuelve a intentar
+        if trabajo.error is None:
+            _resultados.guardar(trabajo.clave, trabajo)
+        _descartar_vencidos()
+
+
+def enviar(clave, proceso, funcion, extras=2):
+    with _lock:
+        _descartar_vencidos()
+        trabajo = _trabajos.get(clave) or _resultados.obtener(clave)
+        # Los que fallaron se vuelven a intentar; los demás (en cola, en curso o listos) se reusan
+        if trabajo is None or trabajo.estado() == 'error':
+            trabajo = Trabajo(clave, proceso, funcion, extras)
+            _trabajos[clave] = trabajo
+            _obtener_pool().submit(_correr, trabajo)
+        return trabajo
+
+
+def antes_en_cola(trabajo):
+    # Cuántos trabajos que esperan turno se enviaron antes que este
+    with _lock:
+        _descartar_vencidos()
+        return sum(1 for t in _trabajos.values() if t.empezado is None and t.creado < trabajo.creado)
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicios.agregados import construir_cubo, rebanar
+from servicios.almacen import AlmacenAgregados, cubo_con_almacen
+from servicios.ingesta import normalizar
+
+
+def _datos(fechas, notificador='UTMDL', conjunto='informe.xlsx'):
+    df = normalizar(pd.DataFrame({
+        'FECHA_VISADO': pd.to_datetime(fechas),
+        'NOTIFICADOR': notificador,
+        'ESTADO_INFORME': 'NOTIFICADO',
+        'HOJA_ORIGEN': 'DTO',
+    }), reportar=False)
+    df.attrs['CONJUNTO'] = conjunto
+    return df
+
+
+def test_conjuntos_no_se_mezclan(tmp_path):
+    almacen = AlmacenAgregados(str(tmp_path / 'almacen.db'))
+    uno = _datos(['2025-01-10', '2025-02-10'], 'UTMDL', 'uno.xlsx')
+    otro = _datos(['2025-01-11'] * 3, 'BELISARIO', 'otro.xlsx')
+    cubo_con_almacen(uno, almacen)
+    cubo = cubo_con_almacen(otro, almacen)
+    assert cubo.to_dict() == construir_cubo(otro).to_dict()
+
+
+def test_carga_incremental_y_solo_los_anios_del_archivo(tmp_path):
+    almacen = AlmacenAgregados(str(tmp_path / 'almacen.db'))
+    cubo_con_almacen(_datos(['2024-02-10', '2025-01-10']), almacen)
+
+    # Llega febrero de 2025: enero se conserva, 2024 no se devuelve porque el archivo ya no lo trae
+    resumen_antes = almacen.actualizar(_datos(['2025-01-10', '2025-02-10']), 'informe.xlsx')
+    assert resumen_antes == {'nuevas': 1, 'eliminadas': 0, 'particiones': 1}
+    cubo = almacen.cubo('informe.xlsx', [2025])
+    assert set(cubo.index.get_level_values('ANIO')) == {2025}
+    assert rebanar(cubo, MES=1).sum() == 1 and rebanar(cubo, MES=2).sum() == 1
+
+    # Una fila corregida se descuenta de su partición
+    resumen = almacen.actualizar(_datos(['2025-01-10', '2025-02-10'], 'BELISARIO'), 'informe.xlsx')
+    assert resumen == {'nuevas': 2, 'eliminadas': 2, 'particiones': 2}
+    cubo = almacen.cubo('informe.xlsx', [2025])
+    assert set(cubo.index.get_level_values('NOTIFICADOR')) == {'BELISARIO'}
+
+
+def test_sin_conjunto_no_usa_el_almacen(tmp_path):
+    almacen = AlmacenAgregados(str(tmp_path / 'almacen.db'))
+    df = _datos(['2025-01-10'])
+    del df.attrs['CONJUNTO']
+    cubo_con_almacen(df, almacen)
+    assert almacen.cubo('informe.xlsx', [2025]).empty
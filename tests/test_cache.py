@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicios.cache import CacheLRU, tamano_dataframe
+from views import proceso1
+
+
+def _df(filas):
+    return pd.DataFrame({'NOTIFICADOR': ['UTMDL'] * filas, 'TOTAL': range(filas)})
+
+
+def test_acotada_por_memoria_de_los_dataframes():
+    chico = tamano_dataframe(_df(1000))
+    cache = CacheLRU(10, int(chico * 2.5), tamano=tamano_dataframe)
+    for clave in 'abc':
+        cache.guardar(clave, _df(1000))
+    assert 'a' not in cache and len(cache) == 2
+    assert cache.estadisticas()['bytes'] == 2 * chico
+
+
+class _Subido:
+    def __init__(self, datos):
+        self._datos = datos
+
+    def getvalue(self):
+        return self._datos
+
+
+def test_lo_entregado_no_cambia_lo_guardado(monkeypatch):
+    guardado = _df(3)
+    monkeypatch.setattr(proceso1, 'leer_libro', lambda datos: guardado)
+    monkeypatch.setattr(proceso1, '_cache_archivos', CacheLRU(2))
+    df, _ = proceso1.cargar_libro(_Subido(b'libro'))
+    df.attrs['CONJUNTO'] = 'x'
+    df['MES'] = 2
+    df.loc[0, 'TOTAL'] = 99
+
+    otra, _ = proceso1.cargar_libro(_Subido(b'libro'))
+    assert otra is not df and 'CONJUNTO' not in otra.attrs and 'MES' not in otra.columns
+    assert otra.loc[0, 'TOTAL'] == 0
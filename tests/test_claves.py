@@ -0,0 +1,50 @@
+import os
+import sys
+from io import BytesIO
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicios.agregados import ConteoPorBloques, construir_cubo, sumar
+from servicios.ingesta import normalizar
+from views.proceso2 import conteo_estado_notificador, leer_base
+
+
+# ' X ' y 'X' son el mismo notificador al agrupar, pero las hojas de datos conservan el valor original
+def _base():
+    return pd.DataFrame({
+        'NOTIFICADOR': [' BELISARIO ', 'BELISARIO', 'UTMDL', None],
+        'ESTADO_INFORME': ['NOTIFICADO', ' NOTIFICADO', 'DEVUELTO ', 'DEVUELTO'],
+    })
+
+
+def test_normalizar_no_toca_los_valores():
+    df = normalizar(_base(), reportar=False)
+    assert list(df['NOTIFICADOR'].astype(object)[:3]) == [' BELISARIO ', 'BELISARIO', 'UTMDL']
+    assert df['NOTIFICADOR'].isna().iloc[3]
+    assert list(df['ESTADO_INFORME'].astype(object)) == ['NOTIFICADO', ' NOTIFICADO', 'DEVUELTO ', 'DEVUELTO']
+
+
+def test_cubo_agrupa_sin_espacios():
+    conteo = sumar(construir_cubo(normalizar(_base(), reportar=False)), ['NOTIFICADOR', 'ESTADO_INFORME'])
+    assert conteo.to_dict() == {('BELISARIO', 'NOTIFICADO'): 2, ('UTMDL', 'DEVUELTO'): 1}
+
+
+def test_tabla_procesada_une_claves_con_espacios():
+    archivo = BytesIO(_base().to_csv(index=False).encode())
+    df_base = leer_base(archivo, 'csv')
+    conteo = conteo_estado_notificador(df_base)
+    assert list(conteo.columns) == ['BELISARIO', 'UTMDL']
+    assert conteo.loc['NOTIFICADO', 'BELISARIO'] == 2
+    # La hoja BASE sale del DataFrame sin limpiar
+    assert ' BELISARIO ' in set(df_base['NOTIFICADOR'].astype(object))
+
+
+def test_conteo_por_bloques_igual_al_cubo():
+    df = normalizar(_base(), reportar=False)
+    por_bloques = ConteoPorBloques(['ESTADO_INFORME', 'NOTIFICADOR'])
+    por_bloques.agregar(df.iloc[:2])
+    por_bloques.agregar(df.iloc[2:])
+    esperado = sumar(construir_cubo(df), ['ESTADO_INFORME', 'NOTIFICADOR'])
+    assert por_bloques.resultado().to_dict() == esperado.to_dict()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli import buscar_archivos
+
+
+def test_pares_dto_pcl_de_csv_van_juntos_a_proceso_1(tmp_path, capsys):
+    for nombre in ('enero_DTO.csv', 'enero_PCL.csv', 'febrero_dto.csv', 'total.csv', 'libro.xlsx'):
+        (tmp_path / nombre).write_bytes(b'')
+    ruta = lambda nombre: str(tmp_path / nombre)
+
+    trabajos = buscar_archivos(str(tmp_path), '1')
+    assert sorted(trabajos, key=str) == sorted([
+        ((ruta('enero_DTO.csv'), ruta('enero_PCL.csv')), '1'),
+        (ruta('libro.xlsx'), '1'),
+        (ruta('total.csv'), '1'),
+    ], key=str)
+    assert "febrero_dto.csv: falta febrero_PCL.csv" in capsys.readouterr().out
+
+    # Proceso 2 sigue tomando cada archivo por separado
+    assert len(buscar_archivos(str(tmp_path), '2')) == 5
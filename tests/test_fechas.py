@@ -0,0 +1,45 @@
+import os
+import sys
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicios.ingesta import leer_csv, leer_libro
+
+
+def _libro(fechas):
+    libro = Workbook()
+    libro.remove(libro.active)
+    for hoja in ('DTO', 'PCL'):
+        sheet = libro.create_sheet(hoja)
+        sheet.append(['FECHA_VISADO', 'NOTIFICADOR', 'ESTADO_INFORME'])
+        for fecha in fechas:
+            sheet.append([fecha, 'UTMDL', 'NOTIFICADO'])
+    buffer = BytesIO()
+    libro.save(buffer)
+    return buffer.getvalue()
+
+
+def test_xlsx_texto_ambiguo_como_read_excel():
+    # 03/04/2025 escrito como texto en el xlsx: 4 de marzo, igual que read_excel(parse_dates=...)
+    datos = _libro(['03/04/2025', '05/06/2025'])
+    df = leer_libro(datos, motor='openpyxl')
+    antes = pd.read_excel(BytesIO(datos), sheet_name='DTO', parse_dates=['FECHA_VISADO'])['FECHA_VISADO']
+    dto = df.loc[df['HOJA_ORIGEN'] == 'DTO', 'FECHA_VISADO'].reset_index(drop=True)
+    assert list(dto) == list(antes) == [pd.Timestamp(2025, 3, 4), pd.Timestamp(2025, 5, 6)]
+    assert list(df['MES'].unique()) == [3, 5]
+
+
+def test_xlsx_celdas_de_fecha_e_iso():
+    df = leer_libro(_libro([datetime(2025, 2, 10), '2025-03-04']), motor='openpyxl')
+    assert list(df['FECHA_VISADO'][:2]) == [pd.Timestamp(2025, 2, 10), pd.Timestamp(2025, 3, 4)]
+
+
+def test_csv_texto_ambiguo_dia_primero():
+    datos = b"HOJA_ORIGEN,FECHA_VISADO,NOTIFICADOR,ESTADO_INFORME\nDTO,03/04/2025,UTMDL,NOTIFICADO\n"
+    df = leer_csv([('informe.csv', datos)])
+    assert df['FECHA_VISADO'][0] == pd.Timestamp(2025, 4, 3)
@@ -0,0 +1,80 @@
+import os
+import re
+import sys
+import zipfile
+from datetime import datetime
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicios.fusion import FechasIncompatibles, HojasRepetidas, LibroNoFusionable, fusionar_libros
+
+APP_EXCEL = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties" '
+    'xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">'
+    '<Application>Microsoft Excel</Application>'
+    '<HeadingPairs><vt:vector size="4" baseType="variant">'
+    '<vt:variant><vt:lpstr>Hojas de cálculo</vt:lpstr></vt:variant><vt:variant><vt:i4>2</vt:i4></vt:variant>'
+    '<vt:variant><vt:lpstr>Rangos con nombre</vt:lpstr></vt:variant><vt:variant><vt:i4>1</vt:i4></vt:variant>'
+    '</vt:vector></HeadingPairs>'
+    '<TitlesOfParts><vt:vector size="3" baseType="lpstr">'
+    '<vt:lpstr>DTO</vt:lpstr><vt:lpstr>PCL</vt:lpstr><vt:lpstr>DTO!Print_Area</vt:lpstr>'
+    '</vt:vector></TitlesOfParts></Properties>'
+)
+
+
+def _libro(*hojas, fechas_1904=False, app=None):
+    libro = Workbook()
+    libro.remove(libro.active)
+    if fechas_1904:
+        libro.epoch = datetime(1904, 1, 1)
+    for nombre in hojas:
+        libro.create_sheet(nombre).append([nombre, datetime(2025, 2, 10)])
+    buffer = BytesIO()
+    libro.save(buffer)
+    if app is None:
+        return buffer.getvalue()
+    # Como lo deja Excel: app.xml con la lista de hojas
+    salida = BytesIO()
+    with zipfile.ZipFile(buffer) as entrada, zipfile.ZipFile(salida, 'w') as zip_salida:
+        for info in entrada.infolist():
+            zip_salida.writestr(info, app.encode('utf-8') if info.filename == 'docProps/app.xml' else entrada.read(info))
+    return salida.getvalue()
+
+
+def _app(datos):
+    with zipfile.ZipFile(BytesIO(datos)) as zip_:
+        return zip_.read('docProps/app.xml').decode('utf-8')
+
+
+def test_app_agrega_las_hojas_nuevas():
+    unido = fusionar_libros(_libro('DTO', 'PCL', app=APP_EXCEL), _libro('DTO TABLA MES'))
+    app = _app(unido)
+    assert re.findall(r'<vt:lpstr>([^<]*)</vt:lpstr>', app) == [
+        'Hojas de cálculo', 'Rangos con nombre', 'DTO', 'PCL', 'DTO TABLA MES', 'DTO!Print_Area']
+    assert re.findall(r'<vt:i4>(\d+)</vt:i4>', app) == ['3', '1']
+    assert '<vt:vector size="4" baseType="lpstr">' in app
+    assert load_workbook(BytesIO(unido)).sheetnames == ['DTO', 'PCL', 'DTO TABLA MES']
+
+
+def test_app_sin_grupo_de_hojas_se_quitan_las_listas():
+    app = APP_EXCEL.replace('<vt:lpstr>PCL</vt:lpstr>', '<vt:lpstr>OTRA</vt:lpstr>')
+    unido = _app(fusionar_libros(_libro('DTO', 'PCL', app=app), _libro('DTO TABLA MES')))
+    assert 'TitlesOfParts' not in unido and 'HeadingPairs' not in unido
+    assert '<Application>Microsoft Excel</Application>' in unido
+
+
+def test_solo_se_copian_las_partes_de_las_hojas():
+    with zipfile.ZipFile(BytesIO(fusionar_libros(_libro('DTO'), _libro('DTO TABLA MES')))) as zip_:
+        nombres = zip_.namelist()
+    assert [n for n in nombres if 'informe' in n] == ['xl/worksheets/informe_sheet1.xml']
+
+
+def test_fechas_1904():
+    with pytest.raises(FechasIncompatibles):
+        fusionar_libros(_libro('DTO', fechas_1904=True), _libro('DTO TABLA MES'))
+    assert issubclass(FechasIncompatibles, LibroNoFusionable) and issubclass(HojasRepetidas, LibroNoFusionable)
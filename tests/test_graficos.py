@@ -0,0 +1,37 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicios import graficos
+from servicios.graficos import EspecGrafico
+from views import proceso2
+
+
+# Versión chica de benchmarks/concurrencia.py: pocas gráficas, dibujadas desde varios hilos a la vez,
+# tienen que salir idénticas byte a byte a las de la corrida en serie
+def _especs():
+    conteo = pd.DataFrame({'UTMDL': [5, 3, 0], 'SERVIENTREGA': [2, 4, 1]},
+                          index=['ENTREGADO', 'DEVUELTO', 'PENDIENTE'])
+    df_base = pd.DataFrame({'ESTADO_INFORME': ['ENTREGADO', 'DEVUELTO', 'ENTREGADO', 'PENDIENTE'],
+                            'NOTIFICADOR': ['UTMDL', 'UTMDL', 'SERVIENTREGA', 'SERVIENTREGA']})
+    return [
+        proceso2.espec_grafica_barras(proceso2.conteo_estado_notificador(df_base)),
+        EspecGrafico('pastel', conteo['UTMDL'], {'figsize': (3, 3), 'leyenda': {}, 'mapa': 'tab20'}),
+        EspecGrafico('pasteles', conteo.T, {'mapa': 'tab20', 'leyenda': {}, 'columnas': 2, 'lado': 2}),
+    ]
+
+
+def test_graficas_identicas_desde_varios_hilos():
+    especs = _especs()
+    referencia = [graficos._dibujar(espec) for espec in especs]
+
+    orden = [i for _ in range(4) for i in range(len(especs))]
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        pngs = list(pool.map(lambda i: graficos._dibujar(especs[i]), orden))
+
+    assert all(png.startswith(b'\x89PNG') for png in referencia)
+    assert [i for i, png in zip(orden, pngs) if png != referencia[i]] == []
@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servicios import graficos, trabajos
+from servicios.cache import CacheLRU
+
+
+def _enviar(clave, datos=b'x'):
+    trabajo = trabajos.enviar(clave, 'Prueba', lambda instrumentacion: datos)
+    trabajo.esperar(10)
+    return trabajo
+
+
+def _usar_resultados(monkeypatch, max_entradas=None, max_bytes=None):
+    resultados = CacheLRU(max_entradas, max_bytes, tamano=trabajos._tamano_resultado)
+    monkeypatch.setattr(trabajos, '_resultados', resultados)
+    return resultados
+
+
+def _esperar_guardado(resultados, clave):
+    # _correr guarda el resultado justo después de marcar el trabajo como listo
+    for _ in range(1000):
+        if clave in resultados:
+            return
+        trabajos.time.sleep(0.001)
+
+
+def test_resultados_acotados_por_cantidad_y_bytes(monkeypatch):
+    resultados = _usar_resultados(monkeypatch, max_entradas=2, max_bytes=100)
+    for clave in ('a', 'b', 'c'):
+        _esperar_guardado(resultados, _enviar(clave).clave)
+    assert 'a' not in resultados and len(resultados) == 2
+
+    _esperar_guardado(resultados, _enviar('grande', b'x' * 100).clave)
+    assert len(resultados) == 1 and 'grande' in resultados
+    assert not trabajos._trabajos
+
+
+def test_resultado_guardado_se_reusa_y_vence(monkeypatch):
+    resultados = _usar_resultados(monkeypatch, max_entradas=5)
+    primero = _enviar('r')
+    _esperar_guardado(resultados, 'r')
+    assert trabajos.enviar('r', 'Prueba', None) is primero
+
+    monkeypatch.setattr(trabajos, 'TTL_RESULTADOS', 0)
+    trabajos.antes_en_cola(primero)
+    assert 'r' not in resultados
+
+
+def test_los_que_fallan_no_se_guardan(monkeypatch):
+    resultados = _usar_resultados(monkeypatch, max_entradas=5)
+
+    def fallar(instrumentacion):
+        raise ValueError("sin datos")
+
+    trabajo = trabajos.enviar('f', 'Prueba', fallar)
+    trabajo.esperar(10)
+    assert trabajo.estado() == 'error' and 'f' not in resultados
+    assert _enviar('f') is not trabajo
+
+
+
+def test_el_informe_registra_la_cache_de_graficas(monkeypatch, capsys):
+    _usar_resultados(monkeypatch, max_entradas=5)
+    monkeypatch.setattr(graficos, '_cache_memoria', CacheLRU(max_bytes=1024 * 1024))
+    monkeypatch.setattr(graficos, '_cache_disco', None)
+    espec = graficos.EspecGrafico('barras', pd.DataFrame({'A': [1, 2]}, index=['x', 'y']), {
+        'figsize': (2, 2), 'colores': None, 'xlabel': '', 'ylabel': '', 'leyenda': {}, 'etiquetas': {'fontsize': 6}})
+
+    def informe(instrumentacion):
+        graficos.renderizar_lote([espec], trabajadores=1)
+        return b'x'
+
+    _enviar('primero', b'x')  # sin gráficas
+    primero = trabajos.enviar('con gráfica', 'Prueba', informe)
+    primero.esperar(10)
+    segundo = trabajos.enviar('otra vez', 'Prueba', informe)
+    segundo.esperar(10)
+
+    assert primero.instrumentacion.extras['cache_graficos']['memoria']['fallos'] == 1
+    cache = segundo.instrumentacion.extras['cache_graficos']['memoria']
+    assert (cache['aciertos'], cache['fallos']) == (1, 0)
+    lineas = [json.loads(linea) for linea in capsys.readouterr().out.splitlines() if linea.startswith('{')]
+    assert [linea['cache_graficos']['memoria']['aciertos'] for linea in lineas if linea['evento'] == 'informe'] == [0, 0, 1]
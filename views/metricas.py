@@ -0,0 +1,71 @@
+import pandas as pd
+import streamlit as st
+
+from servicios.graficos import estadisticas_cache_graficos
+from servicios.trabajos import antes_en_cola
+
+
+# ---------------------------------------------------------------------- PANEL DE TIEMPOS --------------------------------------
+# Tiempo, pico de memoria y filas de cada etapa del último informe, en la barra lateral
+def mostrar_instrumentacion(instrumentacion):
+    if not instrumentacion.etapas:
+        return
+
+    resumen = instrumentacion.resumen()
+    with st.sidebar.expander(f"⏱️ {resumen['proceso']}: {resumen['segundos']:.1f} s", expanded=False):
+        tabla = pd.DataFrame(instrumentacion.etapas)[['etapa', 'segundos', 'pico_mb', 'filas', 'ok']]
+        tabla = tabla.rename(columns={'etapa': 'Etapa', 'segundos': 'Segundos', 'pico_mb': 'Pico MB',
+                                      'filas': 'Filas', 'ok': 'OK'})
+        st.dataframe(tabla, hide_index=True)
+        if resumen['pico_mb'] is not None:
+            st.caption(f"Pico de memoria del proceso: {resumen['pico_mb']:.0f} MB")
+        mostrar_cache_graficos(instrumentacion.extras.get('cache_graficos'))
+
+
+# Aciertos y fallos de la cache de gráficas (memoria y disco): en este informe, si se midieron, y en
+# todo el servidor
+def _aciertos(valores):
+    total = valores['aciertos'] + valores['fallos']
+    porcentaje = f" ({valores['aciertos'] / total:.0%})" if total else ""
+    return f"{valores['aciertos']} aciertos, {valores['fallos']} fallos{porcentaje}"
+
+
+def mostrar_cache_graficos(del_informe=None):
+    servidor = estadisticas_cache_graficos()
+    for nivel, valores in servidor.items():
+        partes = []
+        if del_informe and nivel in del_informe:
+            partes.append(f"este informe: {_aciertos(del_informe[nivel])}")
+        texto = f"servidor: {_aciertos(valores)}"
+        if 'entradas' in valores:
+            texto += f", {valores['entradas']} gráficas, {valores['bytes'] / 1e6:.1f} MB"
+        partes.append(texto)
+        st.caption(f"🖼️ Cache de gráficas ({nivel}) · " + " · ".join(partes))
+
+
+# ---------------------------------------------------------------------- AVANCE DE UN TRABAJO --------------------------------------
+# Barra de progreso y etapas de un informe en segundo plano, hasta que termina. Si el usuario toca algo,
+# Streamlit corta este script; el trabajo sigue y la próxima ejecución lo vuelve a encontrar por su clave.
+MARCAS_ETAPA = {'hecha': '✅', 'en curso': '⏳', 'pendiente': '▫️'}
+
+
+def _pintar_avance(trabajo, barra, etapas):
+    estado = trabajo.estado()
+    if estado == 'en cola':
+        antes = antes_en_cola(trabajo)
+        texto = f"En cola: {antes} informe(s) antes" if antes else "En cola"
+    else:
+        en_curso = trabajo.instrumentacion.en_curso
+        texto = f"{trabajo.avance():.0%} · {en_curso}" if en_curso else f"{trabajo.avance():.0%}"
+    barra.progress(trabajo.avance(), text=texto)
+    etapas.caption("  →  ".join(f"{MARCAS_ETAPA[e]} {nombre}" for nombre, e in trabajo.etapas().items()))
+
+
+def seguir_trabajo(trabajo, intervalo=0.5):
+    if not trabajo.listo:
+        barra, etapas = st.empty(), st.empty()
+        while not trabajo.esperar(intervalo):
+            _pintar_avance(trabajo, barra, etapas)
+        barra.empty()
+        etapas.empty()
+    return trabajo
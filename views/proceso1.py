@@ -2,12 +2,28 @@ import streamlit as st
 import pandas as pd
 from io import BytesIO
 from openpyxl import Workbook, load_workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
 import calendar
 from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
-import matplotlib.pyplot as plt
-from openpyxl.drawing.image import Image
+from openpyxl.utils.cell import coordinate_to_tuple
 import csv
+from servicios.cache import CacheLRU, hash_bytes, tamano_dataframe
+from servicios.config import (
+    GRAFICOS_NATIVOS,
+    MAX_ARCHIVOS_CACHE,
+    MAX_PANELES_NOTIFICADOR,
+    MB_ARCHIVOS_CACHE,
+    RUTA_ALMACEN_AGREGADOS,
+)
+from servicios.ingesta import leer_csv, leer_libro, separar_hojas
+from servicios.graficos import HOJA_DATOS_GRAFICAS, EspecGrafico, LoteGraficos, OrigenDatos, insertar_grafico
+from servicios.escritura import EstiloTabla, escribir_tabla, volcar_dataframe
+from servicios.agregados import construir_cubo, huella_cubo, rebanar, sumar
+from servicios.plan import Plan
+from servicios.almacen import AlmacenAgregados, cubo_con_almacen
+from servicios.instrumentacion import medir
+from servicios.trabajos import enviar
+from servicios.fusion import LibroNoFusionable, fusionar_libros
+from views.metricas import mostrar_instrumentacion, seguir_trabajo
 
 
 # Colores 
@@ -18,118 +34,137 @@ meses_en_espanol = {
     7: 'Julio', 8: 'Agosto', 9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
 }
 
+# Opción del selector que genera las hojas de todos los meses en una sola corrida
+TODOS_LOS_MESES = "Todos los meses"
+
+# Contenido del archivo descargado
+SALIDA_COMPLETA = "Hojas DTO y PCL + informe"
+SALIDA_SOLO_INFORME = "Solo las hojas del informe"
+
+# Notificadores que se comparan en las hojas COMPARATIVA AÑO
+notificadores_comparativa = ['BELISARIO 397', 'GESTAR INNOVACION']
+
+# Estilos de tablas (se registran como NamedStyle una vez por libro)
+borde_negro = Border(
+    left=Side(style='thin', color='000000'),
+    right=Side(style='thin', color='000000'),
+    top=Side(style='thin', color='000000'),
+    bottom=Side(style='thin', color='000000')
+)
+borde_fino = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+relleno_gris = PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid')
+
+estilo_comparativa = EstiloTabla(
+    'Comparativa',
+    encabezado={'border': borde_fino, 'alignment': Alignment(horizontal="center"), 'font': Font(bold=True)},
+    cuerpo={'border': borde_fino, 'alignment': Alignment(horizontal="center")},
+)
+estilo_resumen_mes = EstiloTabla(
+    'Resumen mes',
+    encabezado={'border': borde_negro, 'fill': relleno_gris, 'font': Font(bold=True)},
+    cuerpo={'border': borde_negro},
+)
+estilo_tabla_mes = EstiloTabla(
+    'Tabla mes',
+    encabezado={'border': borde_negro, 'fill': relleno_gris, 'font': Font(bold=True),
+                'alignment': Alignment(horizontal='center', vertical='center')},
+    cuerpo={'border': borde_negro, 'alignment': Alignment(horizontal='center', vertical='center')},
+)
+
 # -------------------------------------------------------------------------------------------------------------------------------------------------------------------
 # ---------------------------------------------------------------------- COMPARATIVAS POR AÑO - HOJA: COMPARATIVA AÑO DTO/PCL  --------------------------------------
 # -------------------------------------------------------------------------------------------------------------------------------------------------------------------
-def graficas_barras_tabla_mes_comparativa(df, nombre_hoja):
+def graficas_barras_tabla_mes_comparativa(cubo, nombre_hoja):
     # Filtrar solo los datos de BELISARIO397 y GESTAR INNOVACION
-    df_comparativa = df[df['NOTIFICADOR'].isin(['BELISARIO 397', 'GESTAR INNOVACION'])]
-    
-    conteo = df_comparativa.groupby(['MES', 'NOTIFICADOR']).size().unstack(fill_value=0)
+    cubo_comparativa = rebanar(cubo, NOTIFICADOR=notificadores_comparativa)
+
+    conteo = sumar(cubo_comparativa, ['MES', 'NOTIFICADOR']).unstack(fill_value=0)
     conteo.index = conteo.index.map(lambda m: meses_en_espanol[m].capitalize())
 
-    # Crear la gráfica de barras
-    fig, ax = plt.subplots(figsize=(12, 8))
-    conteo.plot(kind='bar', ax=ax, color=colores)
-    ax.set_xlabel('Mes')
-    ax.set_ylabel('Número de Datos')
-    ax.legend(title='Notificadores', bbox_to_anchor=(1.2, 1), loc='upper left', fontsize=10)
-
-    for p in ax.patches:
-        ax.annotate(f'{p.get_height()}', 
-                    (p.get_x() + p.get_width() / 2., p.get_height()), 
-                    xytext=(0, 5),
-                    textcoords='offset points',
-                    ha='center', va='bottom', fontsize=10, color='black')
-
-    grafico_path = f"{nombre_hoja}_grafico_barras_comparativa.png"
-    plt.tight_layout()
-    plt.savefig(grafico_path, transparent=True, bbox_inches="tight")
-    return grafico_path
-
-def graficapastel_comparativa_ano(df, nombre_hoja):
+    # Especificación de la gráfica de barras (se renderiza después, junto con las demás)
+    return EspecGrafico('barras', conteo, {
+        'figsize': (12, 8),
+        'colores': colores,
+        'xlabel': 'Mes',
+        'ylabel': 'Número de Datos',
+        'leyenda': {'title': 'Notificadores', 'bbox_to_anchor': (1.2, 1), 'fontsize': 10},
+        'etiquetas': {'desplazamiento': 5, 'fontsize': 10},
+    })
+
+def graficapastel_comparativa_ano(cubo, nombre_hoja):
     # Filtrar solo los datos de BELISARIO397 y GESTAR INNOVACION
-    df_comparativa = df[df['NOTIFICADOR'].isin(['BELISARIO 397', 'GESTAR INNOVACION'])]
-    
+    cubo_comparativa = rebanar(cubo, NOTIFICADOR=notificadores_comparativa)
+
     # Crear gráfico de pastel comparativo por notificadores
-    conteo = df_comparativa.groupby('NOTIFICADOR').size()
-    
-    fig, ax = plt.subplots(figsize=(8, 8))
-    ax.pie(conteo, labels=None, autopct='%1.1f%%', startangle=90, colors=colores)
-    ax.legend(labels=conteo.index, title='Notificadores', loc='center left', bbox_to_anchor=(1.05, 0.5), fontsize=10)
-
-    # Guardar el gráfico en un archivo
-    grafico_path = f"{nombre_hoja}_grafico_pastel_ano.png"
-    plt.tight_layout()
-    plt.savefig(grafico_path, transparent=True, bbox_inches="tight")
-    return grafico_path
+    conteo = sumar(cubo_comparativa, 'NOTIFICADOR')
+
+    return EspecGrafico('pastel', conteo, {
+        'figsize': (8, 8),
+        'colores': colores,
+        'leyenda': {'title': 'Notificadores', 'bbox_to_anchor': (1.05, 0.5), 'fontsize': 10},
+    })
 # ---------------------------------------------------------------------- TABLAS  --------------------------------------
 
-def tabla_comparativa_por_mes(df, hoja):
+def tabla_comparativa_por_mes(cubo, hoja):
     # Filtrar solo los datos de interés
-    df_comparativa = df[df['NOTIFICADOR'].isin(['BELISARIO 397', 'GESTAR INNOVACION'])]
+    cubo_comparativa = rebanar(cubo, NOTIFICADOR=notificadores_comparativa)
 
-    # Agrupar y pivotear
-    conteo = df_comparativa.groupby(['MES', 'NOTIFICADOR']).size().unstack(fill_value=0)
+    # Sumar y pivotear
+    conteo = sumar(cubo_comparativa, ['MES', 'NOTIFICADOR']).unstack(fill_value=0)
     conteo.index = conteo.index.map(lambda m: meses_en_espanol[m].capitalize())
     conteo.index.name = "MES"
 
-    # Preparar estilos
-    borde_fino = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-
-    for r_idx, fila in enumerate(dataframe_to_rows(conteo.reset_index(), index=False, header=True), start=1):
-        for c_idx, valor in enumerate(fila, start=1):
-            celda = hoja.cell(row=r_idx, column=c_idx, value=valor)
+    # Centrado con borde fino; encabezados en negrita
+    escribir_tabla(hoja, conteo.reset_index(), estilo_comparativa)
 
-            # Estilo general
-            celda.alignment = Alignment(horizontal="center")
-            celda.border = borde_fino
 
-            # Negrita para headers
-            if r_idx == 1:
-                celda.font = Font(bold=True)
+# La tabla tiene el mismo pivote que la gráfica de barras (MES × NOTIFICADOR): la gráfica nativa apunta a ella
+def origen_tabla_comparativa(conteo, nombre_hoja):
+    return OrigenDatos(nombre_hoja, 1, 1, len(conteo), columnas_valor=len(conteo.columns))
 
 # ---------------------------------------------------------------------- Hojas  --------------------------------------
 
-def crear_comparativa_ano_dto(libro, df_dto):
+def crear_comparativa_ano_dto(libro, cubo_dto, lote=None):
     if "COMPARATIVA AÑO DTO" in libro.sheetnames:
         del libro["COMPARATIVA AÑO DTO"]
     hoja = libro.create_sheet("COMPARATIVA AÑO DTO")
 
-    df_comparativa = df_dto[df_dto['NOTIFICADOR'].isin(['BELISARIO 397', 'GESTAR INNOVACION'])]
+    cubo_comparativa = rebanar(cubo_dto, NOTIFICADOR=notificadores_comparativa)
 
     # 👉 Primero la tabla
-    tabla_comparativa_por_mes(df_comparativa, hoja)
+    tabla_comparativa_por_mes(cubo_comparativa, hoja)
 
     # Luego los gráficos (en posiciones fijas que no pisen la tabla)
-    grafico_barras_comparativa_path = graficas_barras_tabla_mes_comparativa(df_comparativa, "COMPARATIVA AÑO DTO")
-    hoja.add_image(Image(grafico_barras_comparativa_path), 'I4')
+    grafico_barras_comparativa = graficas_barras_tabla_mes_comparativa(cubo_comparativa, "COMPARATIVA AÑO DTO")
+    grafico_barras_comparativa.origen = origen_tabla_comparativa(grafico_barras_comparativa.datos, hoja.title)
+    insertar_grafico(hoja, 'I4', grafico_barras_comparativa, lote)
 
-    grafico_pastel_comparativa_path = graficapastel_comparativa_ano(df_comparativa, "COMPARATIVA AÑO DTO")
-    hoja.add_image(Image(grafico_pastel_comparativa_path), 'I4')
+    grafico_pastel_comparativa = graficapastel_comparativa_ano(cubo_comparativa, "COMPARATIVA AÑO DTO")
+    insertar_grafico(hoja, 'I4', grafico_pastel_comparativa, lote)
 
 # Hoja "COMPARATIVA AÑO PCL"
-def crear_comparativa_ano_pcl(libro, df_pcl):
+def crear_comparativa_ano_pcl(libro, cubo_pcl, lote=None):
     if "COMPARATIVA AÑO PCL" in libro.sheetnames:
         del libro["COMPARATIVA AÑO PCL"]
     hoja = libro.create_sheet("COMPARATIVA AÑO PCL")
 
-    df_comparativa = df_pcl[df_pcl['NOTIFICADOR'].isin(['BELISARIO 397', 'GESTAR INNOVACION'])]
+    cubo_comparativa = rebanar(cubo_pcl, NOTIFICADOR=notificadores_comparativa)
 
     # 👉 Primero la tabla
-    tabla_comparativa_por_mes(df_comparativa, hoja)
+    tabla_comparativa_por_mes(cubo_comparativa, hoja)
 
     # Luego los gráficos en otra parte de la hoja
-    grafico_barras_comparativa_path = graficas_barras_tabla_mes_comparativa(df_comparativa, "COMPARATIVA AÑO PCL")
-    hoja.add_image(Image(grafico_barras_comparativa_path), 'I4')
+    grafico_barras_comparativa = graficas_barras_tabla_mes_comparativa(cubo_comparativa, "COMPARATIVA AÑO PCL")
+    grafico_barras_comparativa.origen = origen_tabla_comparativa(grafico_barras_comparativa.datos, hoja.title)
+    insertar_grafico(hoja, 'I4', grafico_barras_comparativa, lote)
 
-    grafico_pastel_comparativa_path = graficapastel_comparativa_ano(df_comparativa, "COMPARATIVA AÑO PCL")
-    hoja.add_image(Image(grafico_pastel_comparativa_path), 'I4')
+    grafico_pastel_comparativa = graficapastel_comparativa_ano(cubo_comparativa, "COMPARATIVA AÑO PCL")
+    insertar_grafico(hoja, 'I4', grafico_pastel_comparativa, lote)
 
 
 
@@ -139,78 +174,49 @@ def crear_comparativa_ano_pcl(libro, df_pcl):
 # -------------------------------------------------------------------------------------------------------------------------------------------------------------------
 # ---------------------- GRAFICOS ----------------------
 
-def graficas_barras_hojames(df, nombre_hoja, mes):
-    df_filtrado = df[df['MES'] == mes]
-    conteo = df_filtrado.groupby(['NOTIFICADOR', 'ESTADO_INFORME']).size().unstack(fill_value=0)
-
-    fig, ax = plt.subplots(figsize=(14, 8))
-    conteo.plot(kind='bar', ax=ax, color=colores[:len(conteo.columns)])
-    ax.set_xlabel('Notificador')
-    ax.set_ylabel('Cantidad')
-    ax.legend(title='Estado Informe', bbox_to_anchor=(1.2, 1), loc='upper left', fontsize=10)
-
-    for p in ax.patches:
-        height = p.get_height()
-        if height > 0:
-            ax.annotate(f'{int(height)}',
-                        (p.get_x() + p.get_width() / 2., height),
-                        xytext=(0, 5),
-                        textcoords='offset points',
-                        ha='center', va='bottom', fontsize=9, color='black')
-
-    grafico_path = f"{nombre_hoja}_grafico_barras_hojames_{mes}.png"
-    plt.tight_layout()
-    plt.savefig(grafico_path, transparent=True, bbox_inches="tight")
-    plt.close(fig)
-    return grafico_path
-
-def graficas_pastel_hoja_mes(df, nombre_hoja, mes):
-    if 'MES' not in df.columns:
-        df['MES'] = df['FECHA_VISADO'].dt.month
-
-    df_mes = df[df['MES'] == mes]
+def graficas_barras_hojames(cubo, nombre_hoja, mes):
+    conteo = sumar(rebanar(cubo, MES=mes), ['NOTIFICADOR', 'ESTADO_INFORME']).unstack(fill_value=0)
+
+    return EspecGrafico('barras', conteo, {
+        'figsize': (14, 8),
+        'colores': colores[:len(conteo.columns)],
+        'xlabel': 'Notificador',
+        'ylabel': 'Cantidad',
+        'leyenda': {'title': 'Estado Informe', 'bbox_to_anchor': (1.2, 1), 'fontsize': 10},
+        'etiquetas': {'desplazamiento': 5, 'fontsize': 9, 'omitir_ceros': True, 'enteros': True},
+    })
+
+def graficas_pastel_hoja_mes(cubo, nombre_hoja, mes):
     conteo = (
-        df_mes
-        .groupby(['NOTIFICADOR', 'ESTADO_INFORME'])
-        .size()
+        sumar(rebanar(cubo, MES=mes), ['NOTIFICADOR', 'ESTADO_INFORME'])
         .reset_index(name='CUENTA')
     )
 
-    conteo['ETIQUETA'] = conteo['NOTIFICADOR'] + " – " + conteo['ESTADO_INFORME']
-    fig, ax = plt.subplots(figsize=(10, 8))
-    cmap = plt.cm.get_cmap('tab20', len(conteo))
+    conteo['ETIQUETA'] = conteo['NOTIFICADOR'].astype(str) + " – " + conteo['ESTADO_INFORME'].astype(str)
 
-    wedges, _, _ = ax.pie(
-        conteo['CUENTA'],
-        labels=None,
-        autopct='%1.1f%%',
-        startangle=140,
-        colors=[cmap(i) for i in range(len(conteo))]
-    )
+    return EspecGrafico('pastel', conteo.set_index('ETIQUETA')['CUENTA'], {
+        'figsize': (10, 8),
+        'mapa': 'tab20',
+        'startangle': 140,
+        'eje_igual': True,
+        'leyenda': {'title': "Notificador – Estado", 'bbox_to_anchor': (1, 0.5), 'fontsize': 9},
+    })
+# ---------------------- HOJA SOLO DATOS ----------------------
 
-    ax.axis('equal')
-    ax.legend(
-        wedges,
-        conteo['ETIQUETA'],
-        title="Notificador – Estado",
-        loc='center left',
-        bbox_to_anchor=(1, 0.5),
-        fontsize=9
-    )
+def particionar_por_mes(df):
+    # Un solo groupby por hoja; cada mes se saca después con get_group, sin volver a filtrar todo
+    return df.groupby(df['FECHA_VISADO'].dt.month, sort=True)
 
-    path = f"{nombre_hoja}_pastel_notificador_estado_{mes}.png"
-    plt.tight_layout()
-    plt.savefig(path, transparent=True, bbox_inches="tight")
-    plt.close(fig)
-    return path
-# ---------------------- HOJA SOLO DATOS ----------------------
 
-def crear_hoja_datos_mes(libro, df, tipo, mes):
+def crear_hoja_datos_mes(libro, df, tipo, mes, particion=None):
     mes_nombre = meses_en_espanol.get(mes, f"Mes{mes}")
     nombre_hoja = f"{tipo}_{mes_nombre}"
 
-    # Filtrar por mes de FECHA_VISADO
-    df_filtrado = df[df['FECHA_VISADO'].dt.month == mes].copy()
+    # Filtrar por mes de FECHA_VISADO (o tomarlo de la partición ya hecha)
+    if particion is not None:
+        df_filtrado = particion.get_group(mes) if mes in particion.groups else df.iloc[0:0]
+    else:
+        df_filtrado = df[df['FECHA_VISADO'].dt.month == mes].copy()
 
     if df_filtrado.empty:
         print(f"⚠️ No hay datos para {nombre_hoja}, no se crea hoja.")
@@ -220,74 +226,51 @@ def crear_hoja_datos_mes(libro, df, tipo, mes):
         del libro[nombre_hoja]
     hoja = libro.create_sheet(nombre_hoja)
 
-    for r, fila in enumerate(dataframe_to_rows(df_filtrado, index=False, header=True), start=1):
-        for c, valor in enumerate(fila, start=1):
-            hoja.cell(row=r, column=c, value=valor)
+    volcar_dataframe(hoja, df_filtrado)
 
     return nombre_hoja
 
 
 # ---------------------- HOJA CON GRAFICOS + TABLA ----------------------
-def resumen_notificador_estado(df, mes):
-    df_mes = df[df['MES'] == mes]
+def resumen_notificador_estado(cubo, mes):
     resumen = (
-        df_mes
-        .groupby(['NOTIFICADOR', 'ESTADO_INFORME'])
-        .size()
-        .reset_index(name='TOTAL')  
+        sumar(rebanar(cubo, MES=mes), ['NOTIFICADOR', 'ESTADO_INFORME'])
+        .reset_index(name='TOTAL')
         .sort_values(by=['NOTIFICADOR', 'ESTADO_INFORME'])
     )
     return resumen
 
 
-def tabla_hojames(libro, df_mes, tipo, mes, pos_tabla='A1', pos_barras='H5', pos_pastel='H35'):
+def tabla_hojames(libro, cubo, tipo, mes, pos_tabla='A1', pos_barras='H5', pos_pastel='H35', lote=None):
     mes_nombre = meses_en_espanol.get(mes, f"Mes{mes}")
     nombre_hoja = f"{tipo}_{mes_nombre}_tabla_graficos"
 
-    if 'MES' not in df_mes.columns:
-        df_mes['MES'] = df_mes['FECHA_VISADO'].dt.month
-
     if nombre_hoja in libro.sheetnames:
         del libro[nombre_hoja]
     hoja = libro.create_sheet(nombre_hoja)
 
     # 🧮 Crear resumen de datos
-    resumen = resumen_notificador_estado(df_mes, mes)
+    resumen = resumen_notificador_estado(cubo, mes)
 
     # 💾 Volcar tabla resumida con estilos
-    rows = list(dataframe_to_rows(resumen, index=False, header=True))
-
-    # 🎨 Definir estilo
-    borde = Border(
-        left=Side(style='thin', color='000000'),
-        right=Side(style='thin', color='000000'),
-        top=Side(style='thin', color='000000'),
-        bottom=Side(style='thin', color='000000')
-    )
-    fill_gris = PatternFill("solid", fgColor="D9D9D9")
-    font_bold = Font(bold=True)
-
-    for r_idx, fila in enumerate(rows, start=1):
-        for c_idx, valor in enumerate(fila, start=1):
-            celda = hoja.cell(row=r_idx, column=c_idx, value=valor)
-            celda.border = borde
-            if r_idx == 1:
-                celda.fill = fill_gris
-                celda.font = font_bold
+    escribir_tabla(hoja, resumen, estilo_resumen_mes, celda=pos_tabla)
 
     # 📊 Agregar gráficos
-    barra_path = graficas_barras_hojames(df_mes, nombre_hoja, mes)
-    hoja.add_image(Image(barra_path), pos_barras)
+    barras = graficas_barras_hojames(cubo, nombre_hoja, mes)
+    insertar_grafico(hoja, pos_barras, barras, lote)
 
-    pastel_path = graficas_pastel_hoja_mes(df_mes, nombre_hoja, mes)
-    hoja.add_image(Image(pastel_path), pos_pastel)
+    pastel = graficas_pastel_hoja_mes(cubo, nombre_hoja, mes)
+    # Nativa: NOTIFICADOR y ESTADO_INFORME del resumen como categorías, TOTAL como valores
+    fila_tabla, columna_tabla = coordinate_to_tuple(pos_tabla)
+    pastel.origen = OrigenDatos(nombre_hoja, fila_tabla, columna_tabla, len(resumen), columnas_categoria=2)
+    insertar_grafico(hoja, pos_pastel, pastel, lote)
 
     return nombre_hoja
 
 
 # ---------------------- CREA AMBAS HOJAS DTO/PCL ----------------------
 
-def crear_hojas_dto_pcl_tabla(libro, df_total, mes):
+def crear_hojas_dto_pcl_tabla(libro, df_total, mes, lote=None):
     if 'MES' not in df_total.columns:
         df_total['MES'] = df_total['FECHA_VISADO'].dt.month
 
@@ -295,17 +278,19 @@ def crear_hojas_dto_pcl_tabla(libro, df_total, mes):
         raise ValueError("Falta la columna HOJA_ORIGEN (debe valer 'DTO' o 'PCL').")
 
     filtros = {
-        'PCL': df_total[(df_total['HOJA_ORIGEN'] == 'PCL') & (df_total['MES'] == mes)],
-        'DTO': df_total[(df_total['HOJA_ORIGEN'] == 'DTO') & (df_total['MES'] == mes)]
+        'PCL': df_total[(df_total['HOJA_ORIGEN'] == 'PCL') & df_total['MES'].isin([mes])],
+        'DTO': df_total[(df_total['HOJA_ORIGEN'] == 'DTO') & df_total['MES'].isin([mes])]
     }
 
+    cubo = construir_cubo(df_total)
+
     for tipo, df_mes in filtros.items():
         if df_mes.empty:
             print(f"⚠️ Nada para {tipo} en el mes {mes}, se salta la hoja.")
             continue
 
         crear_hoja_datos_mes(libro, df_mes, tipo, mes)   
-        tabla_hojames(libro, df_mes, tipo, mes)          
+        tabla_hojames(libro, rebanar(cubo, HOJA_ORIGEN=tipo), tipo, mes, lote=lote)
 
     print("✅ Hojas DTO/PCL del mes creadas: datos + gráficos 🎉")
 
@@ -320,125 +305,72 @@ def _mes_a_nombre(m):
         return m.capitalize()
     return meses_en_espanol[int(m)].capitalize()
 
-def graficas_barras_tabla_mes(df, nombre_hoja):
-    if 'MES' not in df.columns:
-        df['MES'] = df['FECHA_VISADO'].dt.month
-    df['MES_NOMBRE'] = df['MES'].apply(_mes_a_nombre)
-
-    # Agrupar por MES_NOMBRE y NOTIFICADOR → contar casos
-    conteo = df.groupby(['MES_NOMBRE', 'NOTIFICADOR']).size().reset_index(name='TOTAL')
-
-    # Pivot sin inventar meses
-    tabla = conteo.pivot(index='MES_NOMBRE', columns='NOTIFICADOR', values='TOTAL').fillna(0)
+def graficas_barras_tabla_mes(cubo, nombre_hoja):
+    # Casos por MES y NOTIFICADOR, pivoteado sin inventar meses
+    tabla = sumar(cubo, ['MES', 'NOTIFICADOR']).unstack().fillna(0)
 
     # Ordenar meses sin crear filas nuevas
     orden_meses = [_mes_a_nombre(i) for i in range(1, 13)]
-    tabla.index = pd.CategoricalIndex(tabla.index, categories=orden_meses, ordered=True)
+    tabla.index = pd.CategoricalIndex(tabla.index.map(_mes_a_nombre), categories=orden_meses, ordered=True)
     tabla = tabla.sort_index()
 
-    # 📊 Plot
-    fig, ax = plt.subplots(figsize=(12, 6))
-    barras = tabla.plot(kind='bar', ax=ax, color=colores)
-
-    # Etiquetas de datos
-    for p in ax.patches:
-        altura = p.get_height()
-        if altura > 0:  # Evitar etiquetas en barras vacías
-            ax.text(
-                p.get_x() + p.get_width() / 2,  # posición x centrada
-                altura,                        # posición y arriba de la barra
-                int(altura),                   # valor entero
-                ha='center', va='bottom', fontsize=8
-            )
-
-    ax.set_xlabel("Mes")
-    ax.set_ylabel("Cantidad")
-    plt.xticks(rotation=45, ha='right')
-    ax.legend(title='Notificador', bbox_to_anchor=(1.05, 1), loc='upper left')
-
-    path = f"{nombre_hoja}_grafico_barras_mensual.png"
-    plt.tight_layout()
-    plt.savefig(path, transparent=True, bbox_inches="tight")
-    plt.close(fig)
-    return path
-
-
-
-def graficas_pastel_tabla_mes(df, nombre_hoja):
-    if 'MES' not in df.columns:
-        df['MES'] = df['FECHA_VISADO'].dt.month
-
-    # Convertir al vuelo sin tocar df
-    conteo = (
-        df.groupby('MES').size()
-          .rename(index=_mes_a_nombre)
-    )
-
-    fig, ax = plt.subplots(figsize=(8, 8))
-    cmap = plt.cm.get_cmap('Pastel1', len(conteo))
-    ax.pie(conteo, labels=None, autopct='%1.1f%%',
-           startangle=90, colors=[cmap(i) for i in range(len(conteo))])
-    ax.legend(labels=conteo.index, title='Meses', loc='center left',
-              bbox_to_anchor=(1.05, 0.5), fontsize=10)
-
-    path = f"{nombre_hoja}_grafico_pastel.png"
-    plt.tight_layout(); plt.savefig(path, transparent=True,
-                                    bbox_inches="tight"); plt.close(fig)
-    return path
-
-def grafica_pastel_tabla_mes_porproveedor(df, nombre_hoja):
-    # Limpiar nombres de notificador (espacios raros, nulos, etc.)
-    df = df.copy()
-    df['NOTIFICADOR'] = df['NOTIFICADOR'].astype(str).str.strip()
-
-    # Obtener notificadores únicos (sin excluir los que tengan 0 en ESTADO_INFORME)
-    proveedores = df['NOTIFICADOR'].unique()
-    rutas = []
-
-    for proveedor in proveedores:
-        df_prov = df[df['NOTIFICADOR'] == proveedor]
-        
-        # ⚠️ Aseguramos que la columna existe y no esté toda vacía
-        if 'ESTADO_INFORME' not in df_prov.columns or df_prov['ESTADO_INFORME'].dropna().empty:
-            continue
-
-        conteo = df_prov['ESTADO_INFORME'].value_counts()
-
-        if conteo.empty:
-            continue  # Nada que graficar
-
-        fig, ax = plt.subplots(figsize=(8, 8))
-        cmap = plt.cm.get_cmap('Pastel2', len(conteo))
-        ax.pie(
-            conteo,
-            labels=None,
-            autopct='%1.1f%%',
-            startangle=90,
-            colors=[cmap(i) for i in range(len(conteo))]
-        )
-
-        ax.set_title(f"{proveedor}", fontsize=12)
-        ax.legend(labels=conteo.index, title='Estado Informe',
-                  loc='center left', bbox_to_anchor=(1.05, 0.5), fontsize=10)
-
-        # Limpiar el nombre para el archivo
-        safe_name = proveedor.strip().replace(' ', '_').replace('/', '-')
-        filename = f"{nombre_hoja}_pastel_{safe_name}.png"
-        plt.tight_layout()
-        plt.savefig(filename, transparent=True, bbox_inches="tight")
-        plt.close(fig)
-
-        rutas.append(filename)
-
-    return rutas
+    # 📊 Especificación de la gráfica
+    return EspecGrafico('barras', tabla, {
+        'figsize': (12, 6),
+        'colores': colores,
+        'xlabel': "Mes",
+        'ylabel': "Cantidad",
+        'rotacion_x': 45,
+        'leyenda': {'title': 'Notificador', 'bbox_to_anchor': (1.05, 1)},
+        'etiquetas': {'fontsize': 8, 'omitir_ceros': True, 'enteros': True},
+    })
+
+
+
+def graficas_pastel_tabla_mes(cubo, nombre_hoja):
+    conteo = sumar(cubo, 'MES').rename(index=_mes_a_nombre)
+
+    return EspecGrafico('pastel', conteo, {
+        'figsize': (8, 8),
+        'mapa': 'Pastel1',
+        'leyenda': {'title': 'Meses', 'bbox_to_anchor': (1.05, 0.5), 'fontsize': 10},
+    })
+
+# Una torta por notificador, todas en una misma imagen (None si no hay nada que graficar).
+# max_paneles: tope de tortas (por defecto NOTIF_MAX_PANELES_NOTIFICADOR); quedan los de más casos.
+def grafica_pastel_tabla_mes_porproveedor(cubo, nombre_hoja, max_paneles=None):
+    if max_paneles is None:
+        max_paneles = MAX_PANELES_NOTIFICADOR
+
+    # Los nombres ya vienen sin espacios desde la ingesta; los nulos se grafican como 'nan'
+    notificadores = cubo.index.get_level_values('NOTIFICADOR').astype(str)
+    estados = cubo.index.get_level_values('ESTADO_INFORME')
+    # Una sola agrupación: notificador × estado (descarta ESTADO_INFORME vacío)
+    tabla = cubo.groupby([notificadores, estados]).sum().unstack(fill_value=0)
+    tabla = tabla[tabla.sum(axis=1) > 0]
+    if tabla.empty:
+        return None  # ⚠️ Sin ningún ESTADO_INFORME no hay nada que graficar
+
+    # Estados de más a menos casos: mismo orden y color en todas las tortas y en la leyenda
+    tabla = tabla[tabla.sum().sort_values(ascending=False, kind='stable').index]
+
+    titulo = None
+    if max_paneles and len(tabla) > max_paneles:
+        omitidos = len(tabla) - max_paneles
+        tabla = tabla.loc[tabla.sum(axis=1).nlargest(max_paneles, keep='first').index].sort_index()
+        titulo = f"Los {max_paneles} notificadores con más casos ({omitidos} más sin graficar)"
+
+    return EspecGrafico('pasteles', tabla, {
+        'mapa': 'Pastel2',
+        'titulo': titulo,
+        'leyenda': {'title': 'Estado Informe', 'fontsize': 10},
+    })
 
 
 # ------------------------------------------------------------------------------- GENERAR TABLAS PARA DTO Y PCL: TABLA MES -------------------------------------------------------------
-def generar_tablas_dto_y_pcl(libro, df_dto, df_pcl):
-    def crear_hoja(nombre_hoja, df):
-        df['MES'] = df['FECHA_VISADO'].dt.month
-
-        conteo = df.groupby('MES').size().reset_index(name='TOTAL')
+def generar_tablas_dto_y_pcl(libro, cubo_dto, cubo_pcl, lote=None):
+    def crear_hoja(nombre_hoja, cubo):
+        conteo = sumar(cubo, 'MES').reset_index(name='TOTAL')
         conteo['MES'] = conteo['MES'].map(lambda m: meses_en_espanol[m].capitalize())
 
         total_general = conteo['TOTAL'].sum()
@@ -460,52 +392,25 @@ def generar_tablas_dto_y_pcl(libro, df_dto, df_pcl):
             del libro[nombre_hoja]
         hoja = libro.create_sheet(nombre_hoja)
 
-        # Definir estilos
-        borde_oscuro = Border(
-            left=Side(style='thin', color='000000'),
-            right=Side(style='thin', color='000000'),
-            top=Side(style='thin', color='000000'),
-            bottom=Side(style='thin', color='000000')
-        )
-
-        relleno_encabezado = PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid')
-        alineacion_centrada = Alignment(horizontal='center', vertical='center')
-        fuente_negrita = Font(bold=True)
-
-        # Escribir encabezados con estilo
-        for c_idx, col_name in enumerate(tabla_final.columns, 1):
-            celda = hoja.cell(row=1, column=c_idx, value=col_name)
-            celda.fill = relleno_encabezado
-            celda.border = borde_oscuro
-            celda.alignment = alineacion_centrada
-            celda.font = fuente_negrita
-
-        # Escribir datos con bordes
-        for r_idx, row in tabla_final.iterrows():
-            for c_idx, value in enumerate(row, 1):
-                celda = hoja.cell(row=r_idx+2, column=c_idx, value=value)
-                celda.border = borde_oscuro
-                celda.alignment = alineacion_centrada
+        # Encabezados en gris y negrita, datos con bordes; todo centrado
+        escribir_tabla(hoja, tabla_final, estilo_tabla_mes)
 
         # Gráficos
-        grafico_barras_path = graficas_barras_tabla_mes(df, nombre_hoja)
-        hoja.add_image(Image(grafico_barras_path), 'E5')
+        grafico_barras = graficas_barras_tabla_mes(cubo, nombre_hoja)
+        insertar_grafico(hoja, 'E5', grafico_barras, lote)
 
-        grafico_pastel_path = graficas_pastel_tabla_mes(df, nombre_hoja)
-        hoja.add_image(Image(grafico_pastel_path), 'E20')
+        grafico_pastel = graficas_pastel_tabla_mes(cubo, nombre_hoja)
+        # Nativa: MES y TOTAL de la tabla, sin la fila de total general
+        grafico_pastel.origen = OrigenDatos(nombre_hoja, 1, 1, len(conteo))
+        insertar_grafico(hoja, 'E20', grafico_pastel, lote)
 
-        grafico_pastel_proveedor_paths = grafica_pastel_tabla_mes_porproveedor(df, nombre_hoja)
+        # Una sola imagen con una torta por notificador, sin importar cuántos sean
+        grafico_pastel_proveedor = grafica_pastel_tabla_mes_porproveedor(cubo, nombre_hoja)
+        if grafico_pastel_proveedor is not None:
+            insertar_grafico(hoja, 'E35', grafico_pastel_proveedor, lote)
 
-        fila = 35  # Empezamos a insertar desde esta fila
-        for path in grafico_pastel_proveedor_paths:
-            try:
-                hoja.add_image(Image(path), f'E{fila}')
-                fila += 20  # Ajusta esto según el tamaño de las imágenes
-            except Exception as e:
-                print(f"Error al insertar {path}: {e}")
-
-    crear_hoja("DTO TABLA MES", df_dto)
-    crear_hoja("PCL TABLA MES", df_pcl)
+    crear_hoja("DTO TABLA MES", cubo_dto)
+    crear_hoja("PCL TABLA MES", cubo_pcl)
 
 
 
@@ -523,89 +428,351 @@ def descargar_archivo(output, nombre="archivo_procesado.xlsx"):
 
 
 
-def subir_archivo():
-    archivo = st.file_uploader("Sube un archivo (.xlsx o .csv)", type=["xlsx", "csv"])
-
-    if archivo is not None:
-        try:
-            nombre_archivo = archivo.name.lower()
-
-            if nombre_archivo.endswith(".xlsx"):
-                xls = pd.ExcelFile(archivo)
-                hojas = xls.sheet_names
-
-                if "DTO" in hojas and "PCL" in hojas:
-                    st.success("¡Archivo Excel válido! Se encontraron las hojas DTO y PCL.")
-                    return archivo, "xlsx"
-                else:
-                    if "DTO" not in hojas:
-                        st.error("La hoja 'DTO' no se encuentra en el archivo.")
-                    if "PCL" not in hojas:
-                        st.error("La hoja 'PCL' no se encuentra en el archivo.")
-                    return None, None
-
-            elif nombre_archivo.endswith(".csv"):
-                df = pd.read_csv(archivo)
-                if "DTO" in df.columns and "PCL" in df.columns:
-                    st.success("¡Archivo CSV válido! Se encontraron las columnas DTO y PCL.")
-                    return archivo, "csv"
-                else:
-                    st.warning("El archivo CSV no contiene columnas llamadas 'DTO' y 'PCL'.")
-                    return None, None
-
-        except Exception as e:
-            st.error(f"Error al procesar el archivo: {e}")
-            return None, None
+# ---------------------- CACHE DE ARCHIVOS SUBIDOS ----------------------
+# clave: hash del contenido → DataFrame DTO+PCL con HOJA_ORIGEN. Acotada por cantidad y por memoria.
+# Se entrega una copia superficial (copy(deep=False)): columnas y attrs propios sin duplicar los datos; con
+# copy-on-write, lo que el informe agregue o cambie (MES, attrs['CONJUNTO']) no toca lo guardado.
+_cache_archivos = CacheLRU(MAX_ARCHIVOS_CACHE, MB_ARCHIVOS_CACHE * 1024 * 1024, tamano=tamano_dataframe)
 
-    return None, None
+# Agregados acumulados de cargas anteriores (opcional): las hojas anuales salen de aquí
+_almacen = AlmacenAgregados(RUTA_ALMACEN_AGREGADOS) if RUTA_ALMACEN_AGREGADOS else None
 
-# ------------------------------------------------------------------------------- FLUJO ---------------------------------------------------------------------------------
-def procesar_archivos():
-    archivo, tipo = subir_archivo()
+def cargar_libro(archivo):
+    datos = archivo.getvalue()
+    clave = hash_bytes(datos)
 
-    if archivo and tipo == "xlsx":
-        # Mostrar el selector de mes con los meses en español
-        mes_seleccionado = st.selectbox("Selecciona el mes", list(meses_en_espanol.values()))  # Ahora muestra los meses en español
+    df_total = _cache_archivos.obtener(clave)
+    if df_total is None:
+        # Valida hojas y encabezados antes de leer filas; lanza ValueError si el archivo no sirve
+        df_total = leer_libro(datos)
+        _cache_archivos.guardar(clave, df_total)
 
-        # Leer las hojas DTO y PCL
-        df_dto = pd.read_excel(archivo, sheet_name='DTO', parse_dates=['FECHA_VISADO'])
-        df_pcl = pd.read_excel(archivo, sheet_name='PCL', parse_dates=['FECHA_VISADO'])
+    # El libro original no se carga con openpyxl: sus bytes se unen al informe al final (generar_informe_xlsx)
+    return df_total.copy(deep=False), datos
 
-        # Crear archivo con los datos filtrados por el mes seleccionado
-        archivo.seek(0)
-        archivo_bytes = BytesIO(archivo.read())
-        libro = load_workbook(archivo_bytes)
 
-        # Convertir el mes seleccionado a número usando el diccionario
-        mes_num = list(meses_en_espanol.values()).index(mes_seleccionado) + 1  # Obtiene el índice del mes (1-12)
-        # 👇🏽 AÑADE ESTO AQUÍ
-        df_dto_mes = df_dto[df_dto['FECHA_VISADO'].dt.month == mes_num]
-        df_pcl_mes = df_pcl[df_pcl['FECHA_VISADO'].dt.month == mes_num]
+def subir_archivo():
+    archivos = st.file_uploader(
+        "Sube un archivo .xlsx (hojas DTO y PCL), un .csv con columna HOJA_ORIGEN o dos .csv (DTO y PCL)",
+        type=["xlsx", "csv"],
+        accept_multiple_files=True,
+    )
 
+    if archivos:
+        nombres = [a.name.lower() for a in archivos]
 
-        # Llamar a la función para generar las hojas con el mes seleccionado    
-        crear_hoja_datos_mes(libro, df_dto, "DTO", mes_num)
-        tabla_hojames(libro, df_dto, "DTO", mes_num)
-        crear_hoja_datos_mes(libro, df_pcl, "PCL", mes_num)
-        tabla_hojames(libro, df_pcl, "PCL", mes_num)
+        if len(archivos) == 1 and nombres[0].endswith(".xlsx"):
+            # Las hojas y columnas se validan al leer el archivo (cargar_libro)
+            return archivos[0], "xlsx"
 
+        elif all(n.endswith(".csv") for n in nombres) and len(archivos) <= 2:
+            # Columnas y HOJA_ORIGEN se validan al leer (cargar_csv)
+            return archivos, "csv"
 
-        # Llamar a la función para generar las tablas de DTO y PCL
-        generar_tablas_dto_y_pcl(libro, df_dto, df_pcl)
+        else:
+            st.warning("Sube un solo .xlsx, o uno o dos .csv.")
+            return None, None
 
-        # Llamar a la función para crear la hoja de comparativa de año
-        crear_comparativa_ano_dto(libro, df_dto)
-        crear_comparativa_ano_pcl(libro, df_pcl)
-        
-        # Llamar a la función para crear las tablas de HOJA MES
-        tabla_hojames(libro, df_dto_mes, 'DTO', mes_num)
-        tabla_hojames(libro, df_pcl_mes, 'PCL', mes_num)
+    return None, None
 
 
-        output = BytesIO()
+def clave_csv(contenidos):
+    return ('csv',) + tuple(sorted((nombre, hash_bytes(datos)) for nombre, datos in contenidos))
+
+
+def clave_subida(archivo, tipo):
+    # Identifica lo subido por contenido: un .xlsx, o uno o dos .csv
+    if tipo == "xlsx":
+        return hash_bytes(archivo.getvalue())
+    return clave_csv([(a.name, a.getvalue()) for a in archivo])
+
+
+def cargar_csv(archivos):
+    contenidos = [(a.name, a.getvalue()) for a in archivos]
+    clave = clave_csv(contenidos)
+
+    df_total = _cache_archivos.obtener(clave)
+    if df_total is None:
+        # Valida columnas antes de leer filas; lanza ValueError si los archivos no sirven
+        df_total = leer_csv(contenidos)
+        _cache_archivos.guardar(clave, df_total)
+
+    # No hay libro original: el informe se arma por partes (generar_informe_csv); la clave identifica
+    # al archivo para la cache de sus hojas DTO y PCL
+    return df_total.copy(deep=False), clave
+
+
+# ---------------------- PLAN DEL INFORME ----------------------
+# Qué hojas se generan y de qué datos depende cada una. Cada hoja aparece una sola vez:
+# antes las hojas del mes se armaban dos veces (con el DataFrame completo y con el del mes)
+# y la segunda pisaba a la primera. El orden de los pasos es el orden de las hojas en el libro.
+# meses: un número de mes, o None para "todos los meses" (los que traen datos en cada hoja).
+# hojas_base: escribir también las hojas DTO y PCL con los datos (cuando el libro es nuevo, p. ej. desde CSV).
+# libro_graficos, parte_anual: para armar el informe por partes (generar_partes_informe); las hojas de
+# gráficas del mes van a libro_graficos y las anuales las da parte_anual(cubo_dto, cubo_pcl) ya guardadas.
+def plan_informe_mes(df_total, libro, meses, lote=None, instrumentacion=None, hojas_base=False,
+                     libro_graficos=None, parte_anual=None):
+    plan = Plan("Proceso 1", instrumentacion)
+    if libro_graficos is None:
+        libro_graficos = libro
+
+    if meses is None:
+        presentes = df_total[['HOJA_ORIGEN', 'MES']].dropna().drop_duplicates()
+        meses_tipo = {
+            tipo: sorted(int(m) for m in presentes.loc[presentes['HOJA_ORIGEN'] == tipo, 'MES'])
+            for tipo in ('DTO', 'PCL')
+        }
+    else:
+        meses_tipo = {'DTO': [meses], 'PCL': [meses]}
+    todos = sorted(set(meses_tipo['DTO']) | set(meses_tipo['PCL']))
+
+    # Datos
+    plan.agregar('hojas', lambda: separar_hojas(df_total))
+    plan.agregar('cubo', lambda: cubo_con_almacen(df_total, _almacen))
+    for tipo in ('DTO', 'PCL'):
+        plan.agregar(('cubo', tipo), lambda cubo, tipo=tipo: rebanar(cubo, HOJA_ORIGEN=tipo), requiere=['cubo'])
+        plan.agregar(('meses', tipo), lambda hojas, tipo=tipo: particionar_por_mes(hojas[tipo]), requiere=['hojas'])
+
+    # Hojas DTO y PCL completas, primero en el libro como en el xlsx original
+    if hojas_base:
+        for tipo in ('DTO', 'PCL'):
+            plan.agregar(('hoja base', tipo),
+                         lambda hojas, tipo=tipo: volcar_dataframe(libro.create_sheet(tipo), hojas[tipo]),
+                         requiere=['hojas'])
+
+    # Hojas con los datos de cada mes
+    for mes in todos:
+        for tipo in ('DTO', 'PCL'):
+            if mes in meses_tipo[tipo]:
+                plan.agregar(('datos mes', tipo, mes),
+                             lambda hojas, particion, tipo=tipo, mes=mes:
+                                 crear_hoja_datos_mes(libro, hojas[tipo], tipo, mes, particion),
+                             requiere=['hojas', ('meses', tipo)])
+
+    # TABLA MES y COMPARATIVA AÑO (no dependen del mes)
+    if parte_anual is not None:
+        plan.agregar('hojas anuales', parte_anual, requiere=[('cubo', 'DTO'), ('cubo', 'PCL')])
+    else:
+        plan.agregar('tabla mes',
+                     lambda cubo_dto, cubo_pcl: generar_tablas_dto_y_pcl(libro, cubo_dto, cubo_pcl, lote=lote),
+                     requiere=[('cubo', 'DTO'), ('cubo', 'PCL')])
+        plan.agregar(('comparativa año', 'DTO'), lambda cubo: crear_comparativa_ano_dto(libro, cubo, lote=lote),
+                     requiere=[('cubo', 'DTO')])
+        plan.agregar(('comparativa año', 'PCL'), lambda cubo: crear_comparativa_ano_pcl(libro, cubo, lote=lote),
+                     requiere=[('cubo', 'PCL')])
+
+    # Tabla + gráficas de cada mes
+    for mes in todos:
+        for tipo in ('DTO', 'PCL'):
+            if mes in meses_tipo[tipo]:
+                plan.agregar(('tabla gráficos mes', tipo, mes),
+                             lambda cubo, tipo=tipo, mes=mes: tabla_hojames(libro_graficos, cubo, tipo, mes, lote=lote),
+                             requiere=[('cubo', tipo)])
+
+    # Renderizar todas las gráficas (en paralelo si hay más de un núcleo) e insertarlas
+    if lote is not None:
+        plan.agregar('gráficas', lote.insertar)
+
+    return plan
+
+
+# Sin Streamlit: también lo usa la línea de comandos (cli.py)
+def generar_informe(df_total, libro, mes_num, lote=None, instrumentacion=None, hojas_base=False):
+    plan_informe_mes(df_total, libro, mes_num, lote, instrumentacion, hojas_base).ejecutar()
+
+    output = BytesIO()
+    with medir(instrumentacion, 'guardar libro'):
         libro.save(output)
-        output.seek(0)
-        descargar_archivo(output, nombre="informe_dto_pcl_mes.xlsx")
+    output.seek(0)
+    return output
+
+
+# ---------------------- INFORME POR PARTES ----------------------
+# Las hojas anuales (TABLA MES, COMPARATIVA AÑO) no dependen del mes elegido: se arman una vez en su
+# propio libro y sus bytes quedan en cache, por contenido del cubo (así también cuentan los agregados
+# acumulados del almacén). Al cambiar de mes solo se arman las hojas del mes y el informe se une a nivel
+# de zip (servicios/fusion.py): datos del mes + hojas anuales + gráficas del mes, en ese orden.
+# clave → bytes de un .xlsx (hojas anuales, u hojas DTO y PCL de un CSV)
+_cache_partes = CacheLRU(2 * MAX_ARCHIVOS_CACHE)
+
+
+def _guardar(libro):
+    output = BytesIO()
+    libro.save(output)
+    return output.getvalue()
+
+
+def hojas_anuales_xlsx(cubo_dto, cubo_pcl, lote=None):
+    nativos = lote.nativos if lote is not None else False
+    clave = ('anuales', huella_cubo(cubo_dto), huella_cubo(cubo_pcl), nativos)
+    parte = _cache_partes.obtener(clave)
+    if parte is not None:
+        print("♻️ Hojas anuales tomadas de la cache")
+        return parte
+
+    # Lote propio (se renderiza aquí, antes de guardar) y otra hoja de datos para las gráficas nativas,
+    # que no choque con la del libro de las hojas del mes
+    libro = Workbook(write_only=True)
+    lote_anual = None
+    if lote is not None:
+        lote_anual = LoteGraficos(lote.trabajadores, lote.nativos, hoja_datos=f"{lote.hoja_datos} AÑO")
+    generar_tablas_dto_y_pcl(libro, cubo_dto, cubo_pcl, lote=lote_anual)
+    crear_comparativa_ano_dto(libro, cubo_dto, lote=lote_anual)
+    crear_comparativa_ano_pcl(libro, cubo_pcl, lote=lote_anual)
+    if lote_anual is not None:
+        lote_anual.insertar()
+
+    parte = _guardar(libro)
+    _cache_partes.guardar(clave, parte)
+    return parte
+
+
+def hojas_base_xlsx(df_total, clave):
+    # Hojas DTO y PCL completas de un CSV: dependen solo del archivo
+    parte = _cache_partes.obtener(('base', clave))
+    if parte is None:
+        libro = Workbook(write_only=True)
+        hojas = separar_hojas(df_total)
+        for tipo in ('DTO', 'PCL'):
+            volcar_dataframe(libro.create_sheet(tipo), hojas[tipo])
+        parte = _guardar(libro)
+        _cache_partes.guardar(('base', clave), parte)
+    return parte
+
+
+def generar_partes_informe(df_total, mes_num, lote=None, instrumentacion=None):
+    # [datos del mes, hojas anuales, gráficas del mes] como bytes de .xlsx; sin los libros que quedan vacíos
+    libro_datos, libro_graficos = Workbook(write_only=True), Workbook(write_only=True)
+    plan = plan_informe_mes(df_total, libro_datos, mes_num, lote, instrumentacion,
+                            libro_graficos=libro_graficos,
+                            parte_anual=lambda cubo_dto, cubo_pcl: hojas_anuales_xlsx(cubo_dto, cubo_pcl, lote))
+    resultados = plan.ejecutar()
+
+    with medir(instrumentacion, 'guardar libro'):
+        partes = [
+            _guardar(libro_datos) if libro_datos.sheetnames else None,
+            resultados[('hojas anuales',)],
+            _guardar(libro_graficos) if libro_graficos.sheetnames else None,
+        ]
+    return [parte for parte in partes if parte is not None]
+
+
+def unir_partes(partes, instrumentacion=None):
+    with medir(instrumentacion, 'unir partes'):
+        return BytesIO(fusionar_libros(*partes))
+
+
+# Para un .xlsx subido: las partes del informe se unen al original a nivel de zip, sin que openpyxl
+# lea ni vuelva a escribir las hojas DTO y PCL. solo_informe: entregar únicamente las hojas generadas.
+def generar_informe_xlsx(df_total, datos, mes_num, lote=None, instrumentacion=None, solo_informe=False):
+    partes = generar_partes_informe(df_total, mes_num, lote, instrumentacion)
+    if solo_informe:
+        return unir_partes(partes, instrumentacion)
+    try:
+        with medir(instrumentacion, 'unir con el original'):
+            return BytesIO(fusionar_libros(datos, *partes))
+    except LibroNoFusionable as e:
+        # El archivo ya trae hojas con esos nombres (p. ej. un informe anterior) o usa fechas de 1904:
+        # el informe se arma como siempre, sobre el libro completo cargado con openpyxl
+        print(f"↩️ {e}: el informe se arma sobre el libro completo")
+        lote = LoteGraficos(lote.trabajadores, lote.nativos) if lote is not None else None
+        libro = load_workbook(BytesIO(datos))
+        # Las hojas ocultas de datos de gráficas nativas de ese informe se vuelven a generar
+        for nombre in libro.sheetnames:
+            if nombre.startswith(HOJA_DATOS_GRAFICAS):
+                del libro[nombre]
+        return generar_informe(df_total, libro, mes_num, lote, instrumentacion)
+
+
+# Para CSV: no hay original; las hojas DTO y PCL (si se piden) son una parte más, también en cache
+def generar_informe_csv(df_total, clave, mes_num, lote=None, instrumentacion=None, solo_informe=False):
+    partes = []
+    if not solo_informe:
+        with medir(instrumentacion, 'hojas base'):
+            partes.append(hojas_base_xlsx(df_total, clave))
+    partes += generar_partes_informe(df_total, mes_num, lote, instrumentacion)
+    return unir_partes(partes, instrumentacion)
+
+
+# Lo que corre como trabajo en segundo plano: leer (desde la cache si el archivo no cambió) y armar el informe.
+# Devuelve los bytes del .xlsx; los errores de lectura salen como ValueError.
+# conjunto: nombre con el que el archivo acumula sus agregados en el almacén (None = no se usa el almacén)
+def generar_informe_subido(archivo, tipo, mes_num, solo_informe=False, nativos=False, instrumentacion=None,
+                           conjunto=None):
+    with medir(instrumentacion, 'leer archivo') as etapa:
+        if tipo == "xlsx":
+            df_total, datos = cargar_libro(archivo)
+        else:
+            df_total, clave = cargar_csv(archivo)
+        etapa['filas'] = len(df_total)
+    if conjunto:
+        df_total.attrs['CONJUNTO'] = conjunto
+
+    # Las hojas registran sus gráficas en el lote; se renderizan todas juntas al final
+    lote = LoteGraficos(nativos=nativos)
+    if tipo == "xlsx":
+        output = generar_informe_xlsx(df_total, datos, mes_num, lote, instrumentacion, solo_informe)
+    else:
+        output = generar_informe_csv(df_total, clave, mes_num, lote, instrumentacion, solo_informe)
+    return output.getvalue()
+
+
+# ------------------------------------------------------------------------------- FLUJO ---------------------------------------------------------------------------------
+def procesar_archivos():
+    archivo, tipo = subir_archivo()
+
+    if archivo and tipo in ("xlsx", "csv"):
+        # Mostrar el selector de mes con los meses en español (o todos de una vez)
+        mes_seleccionado = st.selectbox("Selecciona el mes", list(meses_en_espanol.values()) + [TODOS_LOS_MESES])  # Ahora muestra los meses en español
+
+        # Hojas de datos + informe, o solo las hojas que genera el informe
+        salida = st.radio("Contenido del archivo", [SALIDA_COMPLETA, SALIDA_SOLO_INFORME], horizontal=True)
+        solo_informe = salida == SALIDA_SOLO_INFORME
+
+        # Gráficas de Excel que apuntan a las tablas, en vez de imágenes
+        nativos = st.checkbox("Gráficas nativas de Excel", value=GRAFICOS_NATIVOS,
+                              help="Archivo más liviano y gráficas editables que siguen a los datos de las tablas.")
+
+        # Almacén de agregados (si el servidor lo tiene): solo con un conjunto elegido a propósito. El
+        # almacén es uno para todo el servidor, así que el mismo nombre de conjunto junta las cargas de
+        # cualquier usuario; sin nombre, el informe sale solo de este archivo
+        conjunto = None
+        if _almacen is not None:
+            conjunto = st.text_input(
+                "Conjunto de datos para acumular (opcional)",
+                help="Las hojas anuales suman lo cargado antes con este mismo nombre, por cualquier usuario "
+                     "del servidor. Use un nombre propio (p. ej. región y responsable). Vacío: solo este archivo.",
+            ).strip() or None
+
+        # Convertir el mes seleccionado a número usando el diccionario (None = todos los meses)
+        if mes_seleccionado == TODOS_LOS_MESES:
+            mes_num = None
+        else:
+            mes_num = list(meses_en_espanol.values()).index(mes_seleccionado) + 1  # Obtiene el índice del mes (1-12)
+
+        # El informe se genera en segundo plano: mismo archivo y mismas opciones = mismo trabajo, así que
+        # un rerun o una recarga de la página sigue el que ya está en curso o entrega el ya terminado
+        clave = ('Proceso 1', clave_subida(archivo, tipo), mes_num, solo_informe, nativos, conjunto)
+        trabajo = seguir_trabajo(enviar(
+            clave, "Proceso 1",
+            lambda instrumentacion: generar_informe_subido(archivo, tipo, mes_num, solo_informe, nativos,
+                                                           instrumentacion, conjunto),
+            extras=3,
+        ))
+
+        # También si algo falla: el panel muestra hasta dónde llegó
+        mostrar_instrumentacion(trabajo.instrumentacion)
+        if isinstance(trabajo.error, ValueError):
+            for mensaje in str(trabajo.error).splitlines():
+                st.error(mensaje)
+            return
+        if trabajo.error is not None:
+            st.error(f"Error al generar el informe: {trabajo.error}")
+            return
+        if tipo == "xlsx":
+            st.success("¡Archivo Excel válido! Se encontraron las hojas DTO y PCL.")
+        else:
+            st.success("¡CSV válido! Se encontraron los datos de DTO y PCL.")
+
+        descargar_archivo(trabajo.resultado, nombre="informe_dto_pcl_mes.xlsx")
         st.success("✅ Archivo generado con éxito.")
-    elif archivo and tipo == "csv":
-        st.warning("Actualmente el procesamiento está disponible solo para archivos .xlsx con hojas DTO y PCL.")
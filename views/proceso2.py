@@ -1,76 +1,110 @@
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import numpy as np
-from itertools import cycle, islice
 from io import BytesIO
 from openpyxl import Workbook
-from openpyxl.drawing.image import Image as ExcelImage
-from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import Border, Side, PatternFill
+from servicios.cache import CacheLRU, hash_bytes, tamano_dataframe
+from servicios.config import (
+    FILAS_POR_BLOQUE,
+    GRAFICOS_NATIVOS,
+    MAX_ARCHIVOS_CACHE,
+    MB_ARCHIVOS_CACHE,
+    MB_LECTURA_POR_BLOQUES,
+)
+from servicios.ingesta import leer_bloques, leer_libro, normalizar
+from servicios.graficos import EspecGrafico, OrigenDatos, grafico_nativo, renderizar, imagen_excel
+from servicios.escritura import EstiloTabla, escribir_tabla, volcar_dataframe
+from servicios.agregados import ConteoPorBloques, construir_cubo, sumar
+from servicios.plan import Plan
+from servicios.instrumentacion import medir
+from servicios.trabajos import enviar
+from views.metricas import mostrar_instrumentacion, seguir_trabajo
+
+_borde = Border(
+    left=Side(style="thin", color="000000"),
+    right=Side(style="thin", color="000000"),
+    top=Side(style="thin", color="000000"),
+    bottom=Side(style="thin", color="000000"),
+)
+estilo_estado_informe = EstiloTabla(
+    'Estado informe',
+    encabezado={'border': _borde, 'fill': PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")},
+    cuerpo={'border': _borde},
+    total={'border': _borde, 'fill': PatternFill(start_color="A6A6A6", end_color="A6A6A6", fill_type="solid")},
+)
+
+# Estas funciones corren en el hilo del trabajo (servicios/trabajos.py): los errores se lanzan como
+# ValueError y la página los muestra con st.error cuando el trabajo termina
+COLUMNAS_FALTANTES = "El archivo no contiene las columnas necesarias: 'ESTADO_INFORME' y 'NOTIFICADOR'."
+
+# clave: (hash del contenido, tipo) → DataFrame base ya limpio. Acotada por cantidad y por memoria; se
+# entrega una copia superficial, sin duplicar los datos (ver la cache de archivos de proceso1.py)
+_cache_archivos = CacheLRU(MAX_ARCHIVOS_CACHE, MB_ARCHIVOS_CACHE * 1024 * 1024, tamano=tamano_dataframe)
 
 def cargar_archivo(archivo, tipo):
-    try:
-        if tipo == "xlsx":
-            # Cargar ambas hojas (DTO y PCL)
-            df_dto = pd.read_excel(archivo, sheet_name='DTO')
-            df_pcl = pd.read_excel(archivo, sheet_name='PCL')
-
-            # Unir ambas hojas en un solo DataFrame
-            df_base = pd.concat([df_dto, df_pcl], ignore_index=True)
-
-        elif tipo == "csv":
-            df_base = pd.read_csv(archivo, on_bad_lines='skip', delimiter=",")  # 'skip' ignora las líneas mal formadas
-
-        # Limpiar posibles filas con datos inconsistentes
-        df_base.dropna(how='all', inplace=True)  # Eliminar filas vacías
-        df_base = df_base.reset_index(drop=True)  # Resetear el índice
-
-        return df_base
-    except Exception as e:
-        st.error(f"Error al procesar el archivo {tipo}: {e}")
-        return None
-
-def grafica_barras(df_base, workbook):
-    # Verificar columnas necesarias
-    if 'ESTADO_INFORME' not in df_base.columns or 'NOTIFICADOR' not in df_base.columns:
-        st.error("El archivo no contiene las columnas necesarias: 'ESTADO_INFORME' y 'NOTIFICADOR'.")
-        return workbook
+    datos = archivo.getvalue()
+    clave = (hash_bytes(datos), tipo)
+
+    df_base = _cache_archivos.obtener(clave)
+    if df_base is None:
+        df_base = leer_base(BytesIO(datos), tipo)
+        _cache_archivos.guardar(clave, df_base)
+
+    return df_base.copy(deep=False)
+
+def leer_base(archivo, tipo, motor=None):
+    if tipo == "xlsx":
+        # Ambas hojas (DTO y PCL) en una sola lectura, validando encabezados primero
+        df_base = leer_libro(
+            archivo.getvalue(),
+            columnas_requeridas=('ESTADO_INFORME', 'NOTIFICADOR'),
+            columnas_fecha=(),
+            motor=motor,
+        )
+        # La hoja BASE conserva solo las columnas originales
+        df_base = df_base.drop(columns=['HOJA_ORIGEN', 'ANIO', 'MES'], errors='ignore')
+
+    elif tipo == "csv":
+        df_base = pd.read_csv(archivo, on_bad_lines='skip', delimiter=",")  # 'skip' ignora las líneas mal formadas
+        df_base = normalizar(df_base)
+
+    else:
+        raise ValueError(f"Tipo de archivo no soportado: {tipo}")
 
-    # Agrupar datos
-    conteo = df_base.groupby(['ESTADO_INFORME', 'NOTIFICADOR']).size().unstack(fill_value=0)
+    # Limpiar posibles filas con datos inconsistentes
+    df_base.dropna(how='all', inplace=True)  # Eliminar filas vacías
+    df_base = df_base.reset_index(drop=True)  # Resetear el índice
 
-    estados = conteo.index
-    notificadores = conteo.columns
-    x = np.arange(len(estados))
+    return df_base
 
-    colores = ['#809bce', '#95b8d1', "#79cbd1", '#B8E6A7', '#4C9A2A']
-    colores_usar = list(islice(cycle(colores), len(notificadores)))
 
-    total_width = 0.8
-    bar_width = total_width / len(notificadores)
+def conteo_estado_notificador(df_base):
+    # ESTADO_INFORME × NOTIFICADOR, sacado del cubo de conteos
+    return sumar(construir_cubo(df_base), ['ESTADO_INFORME', 'NOTIFICADOR']).unstack(fill_value=0)
 
-    fig, ax = plt.subplots(figsize=(max(15, len(estados) * 0.4), 6))
 
-    for i, notificador in enumerate(notificadores):
-        bars = ax.bar(x + i * bar_width, conteo[notificador], width=bar_width, label=notificador, color=colores_usar[i])
-        for bar in bars:
-            yval = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width() / 2, yval, int(yval), ha='center', va='bottom', fontsize=8)
+def espec_grafica_barras(conteo):
+    return EspecGrafico('barras_agrupadas', conteo, {
+        'colores': ['#809bce', '#95b8d1', "#79cbd1", '#B8E6A7', '#4C9A2A'],
+        'titulo': 'Distribución de Notificadores por Estado de Informe',
+        'xlabel': 'Estado de Informe',
+        'ylabel': 'Cantidad',
+        'leyenda_titulo': 'Notificadores',
+        'dpi': 200,
+        'bbox_inches': None,
+    }, origen=OrigenDatos("Tabla Procesada", 1, 1, len(conteo), columnas_valor=len(conteo.columns)))
 
-    ax.set_xticks(x + total_width / 2 - bar_width / 2)
-    ax.set_xticklabels(estados, rotation=90, ha='center', fontsize=7)
-    ax.set_xlabel('Estado de Informe')
-    ax.set_ylabel('Cantidad')
-    ax.set_title('Distribución de Notificadores por Estado de Informe')
-    ax.legend(title='Notificadores', bbox_to_anchor=(1.02, 1), loc='upper left')
-    plt.tight_layout()
 
-    # Guardar la figura como imagen con fondo transparente
-    imgdata = BytesIO()
-    plt.savefig(imgdata, format='png', dpi=200, transparent=True)  # <- AQUÍ el cambio
-    plt.close()
-    imgdata.seek(0)
+# nativos: gráfica de Excel que apunta a la hoja "Tabla Procesada" (mismo pivote) en vez del PNG
+def grafica_barras(df_base, workbook, conteo=None, nativos=False):
+    # Agrupar datos (si no vienen ya agrupados; en la lectura por bloques no hay df_base)
+    if conteo is None:
+        # Verificar columnas necesarias
+        if 'ESTADO_INFORME' not in df_base.columns or 'NOTIFICADOR' not in df_base.columns:
+            raise ValueError(COLUMNAS_FALTANTES)
+        conteo = conteo_estado_notificador(df_base)
+
+    espec = espec_grafica_barras(conteo)
 
     # Crear hoja nueva
     if 'Distribución de Notificadores' in [s.title for s in workbook.worksheets]:
@@ -78,8 +112,12 @@ def grafica_barras(df_base, workbook):
     else:
         sheet = workbook.create_sheet('Distribución de Notificadores')
 
-    # Insertar la imagen usando openpyxl
-    imagen = ExcelImage(imgdata)
+    if nativos:
+        sheet.add_chart(grafico_nativo(espec, espec.origen), 'A1')
+        return workbook
+
+    # Renderizar la gráfica como imagen PNG con fondo transparente e insertarla usando openpyxl
+    imagen = imagen_excel(renderizar(espec))
     imagen.anchor = 'A1'
     sheet.add_image(imagen)
 
@@ -87,119 +125,97 @@ def grafica_barras(df_base, workbook):
 
 
 # -------------------------- FUNCIONES DE PROCESAMIENTO Y GENERACIÓN DE TABLAS ---------------------------
-def generar_tablas_estado_informe(archivo, tipo):
-    df_base = cargar_archivo(archivo, tipo)
-
-    if df_base is not None:
-        # ‑‑‑ Agrupar por ESTADO_INFORME y NOTIFICADOR
-        if {"ESTADO_INFORME", "NOTIFICADOR"}.issubset(df_base.columns):
-            conteo = (
-                df_base.groupby(["ESTADO_INFORME", "NOTIFICADOR"])
-                .size()
-                .unstack(fill_value=0)
-            )
-            # Sólo TOTAL GENERAL 😎
-            conteo["TOTAL GENERAL"] = conteo.sum(axis=1)
-
-            # ‑‑‑ Preparar libro de Excel
-            libro = Workbook()
-            hoja_procesada = libro.active
-            hoja_procesada.title = "Tabla Procesada"
-
-            # Encabezados
-            hoja_procesada.cell(row=1, column=1, value="ESTADO INFORME")
-            for col_idx, notificador in enumerate(conteo.columns[:-1], start=2):
-                hoja_procesada.cell(row=1, column=col_idx, value=notificador)
-            hoja_procesada.cell(
-                row=1, column=len(conteo.columns), value="TOTAL GENERAL"
-            )
-
-            # Datos
-            row_start = 2
-            for estado, valores in conteo.iterrows():
-                hoja_procesada.cell(row=row_start, column=1, value=estado)
-                for col_idx, notificador in enumerate(conteo.columns[:-1], start=2):
-                    hoja_procesada.cell(
-                        row=row_start,
-                        column=col_idx,
-                        value=valores.get(notificador, 0),
-                    )
-                hoja_procesada.cell(
-                    row=row_start,
-                    column=len(conteo.columns),
-                    value=valores.get("TOTAL GENERAL", 0),
-                )
-                row_start += 1
-
-            # Fila de totales
-            hoja_procesada.cell(row=row_start, column=1, value="TOTAL GENERAL")
-            for col_idx in range(2, len(conteo.columns) + 1):
-                hoja_procesada.cell(
-                    row=row_start,
-                    column=col_idx,
-                    value=conteo.iloc[:, col_idx - 2].sum(),
-                )
-
-            # ‑‑‑ Hoja BASE
-            hoja_base = libro.create_sheet("BASE")
-            for r_idx, row in enumerate(
-                dataframe_to_rows(df_base, index=False, header=True), 1
-            ):
-                for c_idx, value in enumerate(row, 1):
-                    hoja_base.cell(row=r_idx, column=c_idx, value=value)
-
-            # ‑‑‑ Estilos (se quedan igual)
-            borde = Border(
-                left=Side(style="thin", color="000000"),
-                right=Side(style="thin", color="000000"),
-                top=Side(style="thin", color="000000"),
-                bottom=Side(style="thin", color="000000"),
-            )
-            fondo_gris = PatternFill(
-                start_color="D9D9D9", end_color="D9D9D9", fill_type="solid"
-            )
-            fondo_gris_total = PatternFill(
-                start_color="A6A6A6", end_color="A6A6A6", fill_type="solid"
-            )
-
-            for cell in hoja_procesada["1:1"]:
-                cell.border = borde
-                cell.fill = fondo_gris
-            for cell in hoja_procesada[row_start]:
-                cell.fill = fondo_gris_total
-                cell.border = borde
-            for row in hoja_procesada.iter_rows(
-                min_row=2,
-                max_row=row_start,
-                min_col=1,
-                max_col=len(conteo.columns),
-            ):
-                for cell in row:
-                    cell.border = borde
-
-            # Ajustar anchos
-            for col in hoja_procesada.columns:
-                max_length = max(
-                    (len(str(cell.value)) for cell in col if cell.value), default=0
-                )
-                hoja_procesada.column_dimensions[col[0].column_letter].width = (
-                    max_length + 2
-                )
-
-            # Agregar gráfica de barras (tu función sigue igual)
-            libro = grafica_barras(df_base, libro)
-
-            # Entregar archivo en memoria
-            output = BytesIO()
-            libro.save(output)
-            output.seek(0)
-            return output
-
-        else:
-            st.error(
-                "El archivo no contiene las columnas necesarias: 'ESTADO_INFORME' y 'NOTIFICADOR'."
-            )
-            return None
+def tabla_estado_informe(conteo):
+    # Sólo TOTAL GENERAL 😎
+    conteo = conteo.copy()
+    conteo["TOTAL GENERAL"] = conteo.sum(axis=1)
+
+    # ‑‑‑ Tabla con encabezado y fila de totales
+    tabla = conteo.reset_index().rename(columns={"ESTADO_INFORME": "ESTADO INFORME"})
+    tabla.columns.name = None
+    fila_total = ["TOTAL GENERAL"] + conteo.sum().tolist()
+    tabla.loc[len(tabla)] = fila_total
+    return tabla
+
+
+def plan_estado_informe(df_base, libro, instrumentacion=None, nativos=False):
+    plan = Plan("Proceso 2", instrumentacion)
+    plan.agregar('conteo', lambda: conteo_estado_notificador(df_base))
+    plan.agregar('tabla', tabla_estado_informe, requiere=['conteo'])
+
+    # ‑‑‑ Hojas en el orden en que quedan en el libro
+    plan.agregar(('hoja', 'Tabla Procesada'),
+                 lambda tabla: escribir_tabla(libro.create_sheet("Tabla Procesada"), tabla, estilo_estado_informe,
+                                              fila_total=True, ajustar_anchos=True),
+                 requiere=['tabla'])
+    plan.agregar(('hoja', 'BASE'), lambda: volcar_dataframe(libro.create_sheet("BASE"), df_base))
+    plan.agregar(('hoja', 'Distribución de Notificadores'),
+                 lambda conteo: grafica_barras(df_base, libro, conteo, nativos),
+                 requiere=['conteo'])
+    return plan
+
+
+def generar_tablas_estado_informe(df_base, instrumentacion=None, nativos=False):
+    # ‑‑‑ Agrupar por ESTADO_INFORME y NOTIFICADOR
+    if not {"ESTADO_INFORME", "NOTIFICADOR"}.issubset(df_base.columns):
+        raise ValueError(COLUMNAS_FALTANTES)
+
+    # ‑‑‑ Libro write-only: las hojas se escriben fila por fila y no quedan en memoria
+    libro = Workbook(write_only=True)
+    plan_estado_informe(df_base, libro, instrumentacion, nativos).ejecutar()
+    return guardar_libro(libro, instrumentacion)
+
+
+def guardar_libro(libro, instrumentacion=None):
+    # Entregar archivo en memoria
+    output = BytesIO()
+    with medir(instrumentacion, 'guardar libro'):
+        libro.save(output)
+    output.seek(0)
+    return output
+
+
+# ---------------------------- LECTURA POR BLOQUES --------------------------
+# Para archivos muy grandes: el archivo nunca está entero en un DataFrame. Los conteos se acumulan
+# bloque a bloque y, si se pide la hoja BASE, cada bloque se copia a ella apenas se lee.
+def plan_estado_informe_por_bloques(archivo, tipo, libro, incluir_base=True, instrumentacion=None, nativos=False):
+    # Los encabezados se validan aquí: un archivo malo falla antes de crear el plan
+    columnas, bloques = leer_bloques(archivo, tipo, columnas_requeridas=('ESTADO_INFORME', 'NOTIFICADOR'),
+                                     filas=FILAS_POR_BLOQUE)
+
+    # Hojas creadas ya en su orden final: en un libro write-only cada hoja se escribe por separado,
+    # así BASE se llena durante la lectura y la tabla (que necesita todos los conteos) al final
+    hoja_tabla = libro.create_sheet("Tabla Procesada")
+    hoja_base = libro.create_sheet("BASE") if incluir_base else None
+
+    def leer_y_contar():
+        conteo = ConteoPorBloques(['ESTADO_INFORME', 'NOTIFICADOR'])
+        if hoja_base is not None:
+            hoja_base.append(columnas)
+        for bloque in bloques:
+            conteo.agregar(bloque)
+            if hoja_base is not None:
+                volcar_dataframe(hoja_base, bloque, encabezado=False)
+        print(f"🧮 Lectura por bloques: {conteo.filas} filas en bloques de {FILAS_POR_BLOQUE}")
+        return conteo.resultado().unstack(fill_value=0)
+
+    plan = Plan("Proceso 2", instrumentacion)
+    plan.agregar('conteo', leer_y_contar)
+    plan.agregar('tabla', tabla_estado_informe, requiere=['conteo'])
+    plan.agregar(('hoja', 'Tabla Procesada'),
+                 lambda tabla: escribir_tabla(hoja_tabla, tabla, estilo_estado_informe,
+                                              fila_total=True, ajustar_anchos=True),
+                 requiere=['tabla'])
+    plan.agregar(('hoja', 'Distribución de Notificadores'),
+                 lambda conteo: grafica_barras(None, libro, conteo, nativos),
+                 requiere=['conteo'])
+    return plan
+
+
+def generar_tablas_estado_informe_por_bloques(archivo, tipo, incluir_base=True, instrumentacion=None, nativos=False):
+    libro = Workbook(write_only=True)
+    plan_estado_informe_por_bloques(archivo, tipo, libro, incluir_base, instrumentacion, nativos).ejecutar()
+    return guardar_libro(libro, instrumentacion)
 
 
 
@@ -239,6 +255,21 @@ def subir_archivo2():
     return None, None
 
 
+# Lo que corre como trabajo en segundo plano: devuelve los bytes del .xlsx o lanza con el motivo
+def generar_estado_informe_subido(archivo, tipo, por_bloques=False, incluir_base=True, nativos=False,
+                                  instrumentacion=None):
+    if por_bloques:
+        archivo.seek(0)
+        output = generar_tablas_estado_informe_por_bloques(archivo, tipo, incluir_base, instrumentacion, nativos)
+        return output.getvalue()
+
+    # Cargar el archivo una sola vez; tablas, BASE y gráfica salen del mismo DataFrame
+    with medir(instrumentacion, 'leer archivo') as etapa:
+        df_base = cargar_archivo(archivo, tipo)
+        etapa['filas'] = len(df_base)
+    return generar_tablas_estado_informe(df_base, instrumentacion, nativos).getvalue()
+
+
 # ---------------------------- FLUJO  --------------------------
 
 # Función para procesar el archivo y generar la tabla
@@ -246,24 +277,34 @@ def procesar_archivos2():
     archivo, tipo = subir_archivo2()
 
     if archivo and tipo in ["xlsx", "csv"]:
-        # Cargar y procesar el archivo
-        df_base = cargar_archivo(archivo, tipo)
-        
-        if df_base is not None:
-            # Generar las tablas
-            output = generar_tablas_estado_informe(archivo, tipo)
-
-            # Crear el libro de trabajo (workbook) vacío
-            libro = Workbook()
-
-            # Llamar a la función de la gráfica
-            libro = grafica_barras(df_base, libro)
-
-            if output:
-                # Descarga el archivo generado
-                descargar_excel(output, nombre="informe_estado_informe.xlsx")
-                st.success("✅ Archivo generado con éxito con el gráfico.")
-        else:
-            st.error("El archivo no contiene datos válidos para procesar.")
+        # Gráfica de Excel que apunta a la tabla, en vez de una imagen
+        nativos = st.checkbox("Gráfica nativa de Excel", value=GRAFICOS_NATIVOS,
+                              help="Archivo más liviano y una gráfica editable que sigue a los datos de la tabla.")
+
+        # Archivos muy grandes: se propone leer por bloques en vez de cargar todo en un DataFrame
+        por_bloques = st.checkbox(
+            "Leer por bloques (archivos muy grandes)",
+            value=archivo.size > MB_LECTURA_POR_BLOQUES * 1e6,
+            help="Cuenta el archivo por partes sin cargarlo entero en memoria.",
+        )
+        incluir_base = st.checkbox("Incluir la hoja BASE", value=True) if por_bloques else True
+
+        # El informe se genera en segundo plano (ver servicios/trabajos.py); un rerun sigue el mismo trabajo
+        clave = ('Proceso 2', hash_bytes(archivo.getvalue()), tipo, por_bloques, incluir_base, nativos)
+        trabajo = seguir_trabajo(enviar(
+            clave, "Proceso 2",
+            lambda instrumentacion: generar_estado_informe_subido(archivo, tipo, por_bloques, incluir_base, nativos,
+                                                                  instrumentacion),
+        ))
+
+        # También si algo falla: el panel muestra hasta dónde llegó
+        mostrar_instrumentacion(trabajo.instrumentacion)
+        if trabajo.error is not None:
+            st.error(f"Error al procesar el archivo {tipo}: {trabajo.error}")
+            return
+
+        # Descarga el archivo generado
+        descargar_excel(trabajo.resultado, nombre="informe_estado_informe.xlsx")
+        st.success("✅ Archivo generado con éxito con el gráfico.")
     else:
         st.error("No se ha cargado un archivo válido.")